@@ -0,0 +1,39 @@
+"""
+Сравнение вычисления формулы по строкам датафрейма
+и над его столбцами (Interpreter.apply).
+
+python -m noofa.benchmarks.apply
+"""
+import time
+
+from noofa.core.dataframes.panda_builder import pd
+from noofa.core.func import Interpreter
+
+
+_FORMULA = 'if(row["qty"] > 0, row["price"] * row["qty"] + 1, 0)'
+
+
+def run_benchmark(n=100000):
+    df = pd.DataFrame({
+        'price': [i * 0.5 for i in range(n)],
+        'qty': [i % 7 - 3 for i in range(n)],
+    })
+    interpreter = Interpreter()
+
+    start = time.perf_counter()
+    interpreter.apply(df, _FORMULA, vectorize=False)
+    rows = time.perf_counter() - start
+
+    start = time.perf_counter()
+    interpreter.apply(df, _FORMULA)
+    columns = time.perf_counter() - start
+
+    results = {'rows': rows, 'columns': columns}
+    for name, seconds in results.items():
+        print(f'{name}: {seconds:.3f} с. на {n} строк')
+    print(f'ускорение: {rows / columns:.1f}x')
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
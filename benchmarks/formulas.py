@@ -0,0 +1,39 @@
+"""
+Сравнение вычисления формулы обходом синтаксического дерева (Interpreter._eval)
+и скомпилированной функцией (Interpreter.compile).
+
+python -m noofa.benchmarks.formulas
+"""
+import time
+
+from noofa.core.func import Interpreter
+
+
+_FORMULA = 'round((x * 2 + 3) / 4 - x, 2) + len(concat("ab", "c")) * 1.5;'
+
+
+def run_benchmark(n=20000):
+    interpreter = Interpreter(x=7)
+    stree = interpreter._get_tree(_FORMULA)
+    formula = interpreter.compile(_FORMULA)
+    context = interpreter._context
+
+    start = time.perf_counter()
+    for _ in range(n):
+        interpreter._eval(stree)()
+    interpreted = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        formula(context)
+    compiled = time.perf_counter() - start
+
+    results = {'interpreted': interpreted, 'compiled': compiled}
+    for name, seconds in results.items():
+        print(f'{name}: {seconds:.3f} с. на {n} вычислений')
+    print(f'ускорение: {interpreted / compiled:.1f}x')
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,37 @@
+"""
+Сравнение лексеров формул: посимвольного (RuleLexer)
+и на одном регулярном выражении (FormulaLexer).
+
+python -m noofa.benchmarks.lexer
+"""
+import time
+
+from noofa.core.func.parser import FormulaLexer, RuleLexer
+
+
+def _formula(n):
+    conditions = ', '.join(
+        f'sql_where("tracks", "Milliseconds", ">=", {i * 1000}, "and")'
+        for i in range(n)
+    )
+    return f'sql_select("tracks", sql_join("tracks", "albums", "inner", sql_on("AlbumId", "==", "AlbumId")), {conditions});'
+
+
+def run_benchmark(n=200, repeat=20):
+    formula = _formula(n)
+    results = {}
+    for lexer_cls in (RuleLexer, FormulaLexer):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            tokens = [tok for tok in lexer_cls(formula).lex()]
+        results[lexer_cls.__name__] = time.perf_counter() - start
+
+    print(f'формула: {len(formula)} символов, {len(tokens)} токенов')
+    for name, seconds in results.items():
+        print(f'{name}: {seconds / repeat * 1000:.2f} мс.')
+    print(f'ускорение: {results["RuleLexer"] / results["FormulaLexer"]:.1f}x')
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,25 @@
+"""
+Время разбора длинных цепочек операторов в зависимости от их длины
+(операторы упорядочиваются по приоритету при разборе - время линейно).
+
+python -m noofa.benchmarks.parser
+"""
+import time
+
+from noofa.core.func.parser import parse
+
+
+def run_benchmark(lengths=(100, 200, 400, 800), repeat=10):
+    results = {}
+    for n in lengths:
+        formula = ' + '.join(f'{i} * 2 - x' for i in range(n)) + ';'
+        start = time.perf_counter()
+        for _ in range(repeat):
+            parse(formula)
+        results[n] = (time.perf_counter() - start) / repeat
+        print(f'{n * 3} операторов: {results[n] * 1000:.2f} мс.')
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
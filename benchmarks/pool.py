@@ -0,0 +1,37 @@
+"""
+Замер времени выполнения запросов к источнику с пулом соединений и без него.
+Используется демонстрационная база chinook.
+
+python -m noofa.benchmarks.pool
+"""
+import time
+
+from noofa.core.sources.conn import SqliteSource
+from noofa.core.sources.pool import pools_stats, close_pools
+from noofa.examples.examples import _chinook_db_file
+
+
+def run_queries(source, n=1000):
+    start = time.perf_counter()
+    for _ in range(n):
+        with source:
+            source.get_tables()
+    return time.perf_counter() - start
+
+
+def run_benchmark(n=1000):
+    close_pools()
+    pooled = SqliteSource(dbname=_chinook_db_file)
+    not_pooled = SqliteSource(dbname=_chinook_db_file, pooled=False)
+    results = {
+        'pooled': run_queries(pooled, n),
+        'not_pooled': run_queries(not_pooled, n),
+    }
+    for name, seconds in results.items():
+        print(f'{name}: {seconds:.3f} с. на {n} запросов')
+    print(pools_stats())
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
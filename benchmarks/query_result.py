@@ -0,0 +1,66 @@
+"""
+Сравнение построения датафрейма по результату запроса в виде списка словарей
+и по строкам-кортежам (ColumnarQueryResult).
+Используется демонстрационная база chinook.
+
+python -m noofa.benchmarks.query_result
+"""
+import time
+
+from noofa.core import Qbuilder, collect_tables
+from noofa.core.sources.conn import SqliteSource, DataQueryResult
+from noofa.core.dataframes import panda_builder
+from noofa.examples.examples import _chinook_db_file
+
+
+_TRACKS_QUERY = {
+    'base': 'tracks',
+    'tables': ['tracks', 'albums', 'artists'],
+    'joins': [
+        {'l': 'tracks', 'r': 'albums', 'j': 'inner', 'on': {'l': 'AlbumId', 'r': 'AlbumId'}},
+        {'l': 'albums', 'r': 'artists', 'j': 'inner', 'on': {'l': 'ArtistId', 'r': 'ArtistId'}},
+    ],
+}
+
+
+def _tracks_query(source):
+    tables = source.get_table_multiple(collect_tables(_TRACKS_QUERY))
+    return Qbuilder(tables, _TRACKS_QUERY, source.wildcard).parse_query()
+
+
+def _as_dicts(result):
+    #  прежний способ: список словарей, собираемый в двойном цикле
+    data = []
+    for row in result.rows:
+        datapiece = {}
+        for n, i in enumerate(row):
+            datapiece[result.columns[n]] = i
+        data.append(datapiece)
+    return DataQueryResult(data, result.columns)
+
+
+def run_benchmark(n=20):
+    source = SqliteSource(dbname=_chinook_db_file)
+    with source:
+        query = _tracks_query(source)
+        result = source.get_data(query=query)
+    rows, cols = len(result.rows), len(result.columns)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        panda_builder.from_result(_as_dicts(result))
+    dicts = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(n):
+        panda_builder.from_result(result)
+    columnar = time.perf_counter() - start
+
+    results = {'dicts': dicts, 'columnar': columnar}
+    for name, seconds in results.items():
+        print(f'{name}: {seconds:.3f} с. на {n} построений ({rows} x {cols})')
+    return results
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -2,7 +2,11 @@
 Инструменты построения отчётов.
 """
 import json
+import asyncio
+import threading
+from copy import copy, deepcopy
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from datetime import (
     date as dt_date,
     time as dt_time,
@@ -14,14 +18,22 @@ from ..core.func import Interpreter
 from ..components.dataschema import DataSchema
 from ..components.components import ComponentsSchema
 from ..core.dataframes import panda_builder
+from ..core.sources.file_sources import FileSource
+from ..core.sources.exceptions import NoSuchFieldError
+from ..core.sources.result_cache import ResultCache, get_result_cache
+from ..core.sources.trace import QueryTrace
+from ..components.exceptions import SchemaComponentNotFound
 from .exceptions import RecursiveDataframeBuildError
+from . import optimizer
 
 
 class ReportBuilder:
     """
     Формирователь отчётов.
     """
-    def __init__(self, data_config=None, components_config=None, values=None, set_evaluator=True, *args, **kwargs):
+    def __init__(self, data_config=None, components_config=None, values=None, set_evaluator=True,
+        fetch_batch_size=None, prefetch=False, optimize=False, result_cache=None, trace=None,
+        *args, **kwargs):
         data_config = data_config or {}
         components_config = components_config or {}
         values = values or {}
@@ -35,6 +47,39 @@ class ReportBuilder:
         self._results = {}  #  результаты запросов (полученные данные)
         self._df_stack = []  #  стэк id строящихся датафреймов
 
+        #  кэш результатов по содержимому запросов: одинаковые запросы выполняются
+        #  один раз; по умолчанию - в пределах отчёта, при result_cache=True -
+        #  общий для процесса (см. get_result_cache), либо экземпляр ResultCache
+        if result_cache is True:
+            result_cache = get_result_cache()
+        self._result_cache = result_cache or ResultCache()
+
+        #  трассировка выполняемых при построении отчёта запросов (время этапов,
+        #  количество строк и т.д., см. QueryTrace); при trace=True создаётся
+        #  трассировка с параметрами по умолчанию, либо передаётся экземпляр QueryTrace
+        if trace is True:
+            trace = QueryTrace()
+        self.trace = trace or None
+
+        #  при заданном размере части результаты запросов для датафреймов
+        #  получаются потоково, частями по fetch_batch_size строк
+        self._fetch_batch_size = fetch_batch_size
+
+        #  при prefetch=True перед построением первого датафрейма
+        #  запросы датафреймов выполняются параллельно (см. prefetch)
+        self._prefetch_pending = prefetch
+
+        #  при optimize=True по конфигурации определяются используемые столбцы
+        #  датафреймов, и из источников (в т.ч. в sql-запросах) читаются только они,
+        #  а фильтры датафреймов по возможности выполняются в sql-запросах
+        self._optimizer = None
+        if optimize:
+            self._optimizer = optimizer.UsageAnalyzer(
+                deepcopy(data_config),
+                deepcopy(components_config),
+                deepcopy(values),
+            )
+
         sources_conf = data_config.get('sources', {})
         queries_config = data_config.get('queries', {})
         dataframes_config = data_config.get('dataframes', {})
@@ -73,6 +118,11 @@ class ReportBuilder:
                 'build_from': q['from'], 'query_src': q['value']
             }
             self._dataschema.add_query(**opts)
+            query = self._dataschema.get_query(q['id'])
+            query.result_cache = self._result_cache
+            query.trace = self.trace
+            if self._optimizer is not None:
+                query.used_columns = self._optimizer.query_columns(q['id'])
 
         # добавление датафреймов в схему
         for df in dataframes_config.values():
@@ -153,15 +203,170 @@ class ReportBuilder:
         if query_id in self._results:
             return self._results[query_id]
         query = self.get_query(query_id)
+        self._prepare_query(query)
+        data = query.execute()
+        self._compiled_queries[query.id] = query._compiled
+        self._results[query.id] = data
+        return data
+
+    def iter_data(self, query_id, batch_size=None):
+        """
+        Потоковое получение данных по запросу частями по batch_size строк.
+        Полученные данные не сохраняются в self._results.
+        """
+        query = self.get_query(query_id)
+        self._prepare_query(query)
+        yield from query.iter_execute(batch_size=batch_size)
+        self._compiled_queries[query.id] = query._compiled
+
+    def prefetch(self, query_ids=None, max_workers=4, per_source=2):
+        """
+        Параллельное выполнение запросов до построения датафреймов.
+        Результаты запросов вносятся в self._results.
+
+        query_ids - список id запросов (по умолчанию - запросы, по которым строятся датафреймы),
+        max_workers - макс. количество одновременно выполняемых запросов,
+        per_source - макс. количество одновременно выполняемых запросов к одному источнику.
+
+        Запросы, которые не удалось выполнить, пропускаются - они будут выполнены
+        (и вызовут соответствующую ошибку) при построении датафреймов.
+        Возвращается список id выполненных запросов.
+        """
+        queries = self._queries_to_prefetch(query_ids)
+        if not queries:
+            return []
+
+        limits = {
+            query._source.id: threading.BoundedSemaphore(per_source)
+            for query in queries
+        }
+
+        def execute(query):
+            #  каждый запрос выполняется с отдельной копией источника
+            forked = query.fork()
+            with limits[query._source.id]:
+                data = forked.execute()
+            return forked._compiled, data
+
+        fetched = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(query, executor.submit(execute, query)) for query in queries]
+            for query, future in futures:
+                try:
+                    compiled, data = future.result()
+                except Exception:
+                    continue
+                self._compiled_queries[query.id] = compiled
+                self._results[query.id] = data
+                fetched.append(query.id)
+        return fetched
+
+    async def aprefetch(self, query_ids=None, per_source=2):
+        """
+        Асинхронный аналог prefetch: запросы выполняются конкурентно
+        в цикле событий (см. SchemaQuery.aexecute).
+        """
+        queries = self._queries_to_prefetch(query_ids)
+        if not queries:
+            return []
+
+        limits = {
+            query._source.id: asyncio.Semaphore(per_source)
+            for query in queries
+        }
+
+        async def execute(query):
+            forked = query.fork()
+            async with limits[query._source.id]:
+                data = await forked.aexecute()
+            return forked._compiled, data
+
+        results = await asyncio.gather(
+            *[execute(query) for query in queries],
+            return_exceptions=True,
+        )
+        fetched = []
+        for query, result in zip(queries, results):
+            if isinstance(result, Exception):
+                continue
+            compiled, data = result
+            self._compiled_queries[query.id] = compiled
+            self._results[query.id] = data
+            fetched.append(query.id)
+        return fetched
+
+    async def abuild(self, components=None, per_source=2):
+        """
+        Асинхронное построение отчёта: запросы датафреймов выполняются
+        конкурентно, после чего компоненты строятся в пуле потоков цикла событий.
+
+        components - список id компонентов (по умолчанию - все компоненты),
+        per_source - макс. количество одновременно выполняемых запросов к одному источнику.
+
+        Возвращается словарь построенных компонентов.
+        """
+        self._prefetch_pending = False
+        await self.aprefetch(per_source=per_source)
+        if components is None:
+            components = [
+                *self._components_schema._tables,
+                *self._components_schema._figures,
+            ]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._build_components, components)
+
+    def _build_components(self, components):
+        return {
+            component_id: self.build_component(component_id)
+            for component_id in components
+        }
+
+    def _queries_to_prefetch(self, query_ids=None):
+        """
+        Подготовленные для выполнения запросы, результатов которых ещё нет.
+        Подготовка выполняется последовательно, т.к. для
+        запросов из выражений используется интерпретатор.
+        """
+        if query_ids is None:
+            #  запросы с фильтрами датафреймов выполняются при построении
+            query_ids = [
+                df._query.id for df in self.dataframes.values()
+                if df.build_type == 'query' and not self._safe_pushdown_filters(df)
+            ]
+
+        queries = []
+        for query_id in dict.fromkeys(query_ids):
+            if not self._needs_fetch(query_id):
+                continue
+            query = self.get_query(query_id)
+            try:
+                self._prepare_query(query)
+            except Exception:
+                continue
+            queries.append(query)
+        return queries
+
+    def _safe_pushdown_filters(self, schema_df):
+        try:
+            return self._pushdown_filters(schema_df)
+        except Exception:
+            return []
+
+    def _needs_fetch(self, query_id):
+        """
+        Требуется ли выполнение запроса при предварительном получении данных.
+        """
+        return query_id not in self._results
+
+    def _prepare_query(self, query):
+        """
+        Формирование запроса в виде словаря из конфигурации запроса.
+        """
         qf = query.build_from
         if qf == 'json':
             query.query = query.query_src
         elif qf == 'expression':
             query.query = self.evaluate(query.query_src).q_part
-        data = query.execute()
-        self._compiled_queries[query.id] = query._compiled
-        self._results[query.id] = data
-        return data
 
     def get_or_build_dataframe(self, dataframe_id):
         """
@@ -199,20 +404,164 @@ class ReportBuilder:
         df = self.get_dataframe(dataframe_id)
         build_type = df.build_type
         if build_type == 'query':
-            res = self.get_data(df._query.id)
-            dataframe = panda_builder.new(res.data, res.columns)
+            query_id = df._query.id
+            filters = self._pushdown_filters(df)
+            if filters:
+                dataframe = self._build_filtered_base(query_id, filters)
+            elif self._fetch_batch_size and query_id not in self._results:
+                chunks = self.iter_data(query_id, self._fetch_batch_size)
+                dataframe = panda_builder.from_chunks(chunks)
+            else:
+                res = self.get_data(query_id)
+                dataframe = panda_builder.from_result(res)
         elif build_type == 'expression':
             dataframe = self.evaluate(df.build_from)
         elif build_type == 'source':
-            dataframe = df.get_data()
+            dataframe = df.get_data(**self._read_options(df))
         return dataframe
 
+    def _pushdown_filters(self, schema_df):
+        """
+        Фильтры датафрейма, переведённые в фильтры его sql-запроса
+        (при включённой оптимизации). Фильтры датафрейма применяются
+        и после получения данных, поэтому результат не меняется.
+        """
+        source = schema_df._source
+        if self._optimizer is None or source is None or not source.is_sql:
+            return []
+        query = self.get_query(schema_df._query.id)
+        self._prepare_query(query)
+        return optimizer.query_filters(query.query, optimizer.pushable_filters(schema_df))
+
+    def _build_filtered_base(self, query_id, filters):
+        """
+        Построение основы датафрейма по запросу с добавленными фильтрами.
+        Результат хранится в self._results под отдельным ключом, т.к.
+        запрос может использоваться и другими датафреймами.
+        """
+        key = optimizer.filtered_key(query_id, filters)
+        if key in self._results:
+            return panda_builder.from_result(self._results[key])
+
+        query = copy(self.get_query(query_id))
+        query.query = optimizer.add_query_filters(query.query, filters)
+        try:
+            if self._fetch_batch_size:
+                chunks = query.iter_execute(batch_size=self._fetch_batch_size)
+                dataframe = panda_builder.from_chunks(chunks)
+            else:
+                res = query.execute()
+                self._results[key] = res
+                dataframe = panda_builder.from_result(res)
+        except NoSuchFieldError:
+            #  столбец фильтра не является полем таблицы -
+            #  фильтрация выполняется только в датафрейме
+            return panda_builder.from_result(self.get_data(query_id))
+        self._compiled_queries[key] = query._compiled
+        return dataframe
+
+    def aggregate(self, dataframe_id, groupby, aggregates):
+        """
+        Группировка данных датафрейма, выполняемая в sql-запросе
+        (при включённой оптимизации), - для компонентов с агрегацией.
+
+        dataframe_id - id либо имя датафрейма,
+        groupby - список столбцов группировки,
+        aggregates - словарь вида {столбец: функция}.
+
+        Возвращается датафрейм, равный DataFrame.groupby(groupby).agg(aggregates),
+        либо None, если группировку нельзя выполнить в запросе
+        (либо датафрейм уже построен).
+        """
+        if self._optimizer is None:
+            return None
+        try:
+            schema_df = self.get_dataframe(dataframe_id)
+        except SchemaComponentNotFound:
+            return None
+        source = schema_df._source
+        if schema_df.id in self._built_dataframes or source is None or not source.is_sql:
+            return None
+
+        query = self.get_query(schema_df._query.id)
+        self._prepare_query(query)
+        query_conf = optimizer.aggregation_query(schema_df, query.query, groupby, aggregates)
+        if query_conf is None:
+            return None
+
+        key = optimizer.aggregated_key(query.id, query_conf)
+        res = self._results.get(key, None)
+        if res is None:
+            grouping = copy(query)
+            grouping.query = query_conf
+            try:
+                res = grouping.execute()
+            except NoSuchFieldError:
+                return None
+            self._results[key] = res
+            self._compiled_queries[key] = grouping._compiled
+        df = panda_builder.from_result(res)
+        return optimizer.grouped_frame(df, groupby, aggregates)
+
+    def get_page(self, dataframe_id, page, per_page):
+        """
+        Страница данных датафрейма: строки с (page - 1) * per_page по page * per_page
+        и общее количество строк. Если датафрейм строится по sql-запросу без
+        изменений данных (кроме фильтров, которые можно выполнить в запросе),
+        то запрашиваются только строки страницы и их количество, иначе
+        строится датафрейм целиком.
+
+        Возвращается кортеж (датафрейм, количество строк).
+        """
+        schema_df = self.get_dataframe(dataframe_id)
+        source = schema_df._source
+        queries = None
+        built = schema_df.id in self._built_dataframes
+        if not built and source is not None and source.is_sql:
+            query = self.get_query(schema_df._query.id)
+            self._prepare_query(query)
+            queries = optimizer.page_queries(schema_df, query.query, page, per_page)
+
+        if queries is not None:
+            page_query, count_query = copy(query), copy(query)
+            page_query.query, count_query.query = queries
+            try:
+                res = page_query.execute()
+                count = count_query.execute()
+            except NoSuchFieldError:
+                pass
+            else:
+                total = panda_builder.from_result(count)['count'].iloc[0]
+                return panda_builder.from_result(res), int(total)
+
+        df = self.get_or_build_dataframe(dataframe_id)
+        start = (page - 1) * per_page
+        return df.iloc[start:start + per_page], len(df)
+
+    def _read_options(self, schema_df):
+        """
+        Параметры чтения основы датафрейма из файлового источника:
+        фильтры, которые можно применить при чтении, а при включённой
+        оптимизации - используемые столбцы и их типы.
+        """
+        if not isinstance(schema_df._source.connection, FileSource):
+            return {}
+        options = {'filters': optimizer.pushable_filters(schema_df)}
+        if self._optimizer is not None:
+            options['usecols'] = self._optimizer.used_columns(schema_df.id)
+            options['dtypes'] = optimizer.read_dtypes(schema_df)
+        return options
+
     def build_dataframe(self, dataframe_id):
         """
         Сформировать датафрейм.
 
         dataframe_id - id датафрейма.
         """
+        if self._prefetch_pending:
+            self._prefetch_pending = False
+            self.prefetch()
+
         df = self.get_dataframe(dataframe_id)
         #  создание базового датафрейма - либо из запроса, либо из выражения
         dataframe = self.build_base(dataframe_id)
@@ -335,7 +684,7 @@ class ReportBuilder:
             df = self.get_or_build_dataframe(cmp_id)
         elif cmp_type == 'query':
             data = self.get_data(cmp_id)
-            df = panda_builder.new(data.data, data.columns)
+            df = panda_builder.from_result(data)
         elif cmp_type == 'table':
             table = self.build_table(cmp_id, **kwargs)
             is_pt = hasattr(table, 'is_pivot_table')
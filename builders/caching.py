@@ -111,6 +111,9 @@ class CachingReportBuilder(ReportBuilder):
         # 1 - обращение за результатами к кэшу + кэширование новых результатов
         self._mode = 0 if storing_only == True else 1
 
+        # id запросов, результаты которых были закэшированы этим экземпляром
+        self._cached_results = set()
+
     def storing_only(self):
         """
         Включить режим только сохранения.
@@ -148,29 +151,31 @@ class CachingReportBuilder(ReportBuilder):
         return df
 
     def get_data(self, query_id):
-        from_cache = False
-
         #  сначала проверяем наличие рез. запроса в сохраненных результатах -
-        #  в self._results
+        #  в self._results (в т.ч. полученных при предварительной выборке);
+        #  такой результат кэшируется, если ещё не был закэширован
         if query_id in self._results:
             data = self._results[query_id]
-        else:
-            #  если их там нет - пробуем получить из кэша
-            data = None if self.is_storing_only else self.get_cached_query_result(query_id)
-
-        #  если в кэше нет результата - выполняем запрос заново
-        if data is None:
-            data = super().get_data(query_id)
-        else:
-            from_cache = True
-            data = DataQueryResult(**data)
+            if query_id not in self._cached_results:
+                self.cache_query_result(query_id, panda_builder.from_result(data))
+            return data
 
-        #  кэшируем для возможного послед. использования
-        if not from_cache:
-            self.cache_query_result(query_id, data.data)
+        #  если их там нет - пробуем получить из кэша
+        data = None if self.is_storing_only else self.get_cached_query_result(query_id)
+        if data is not None:
+            return DataQueryResult(**data)
 
+        #  если в кэше нет результата - выполняем запрос заново
+        #  и кэшируем для возможного послед. использования
+        data = super().get_data(query_id)
+        self.cache_query_result(query_id, panda_builder.from_result(data))
         return data
 
+    def _needs_fetch(self, query_id):
+        if not super()._needs_fetch(query_id):
+            return False
+        return self.is_storing_only or self._get(query_id, 'query') is None
+
     def cache_df(self, dataframe_id, df, ex=None):
         """
         Кэшировать датафрейм.
@@ -207,7 +212,7 @@ class CachingReportBuilder(ReportBuilder):
         """
         Кэшировать результат запроса.
         query_id - id запроса,
-        query_result - результат запроса в виде списка словарей,
+        query_result - результат запроса в виде датафрейма либо списка словарей,
         ex - время хранения в кэше в секундах.
         """
         ca = CacheAgent(query_result)
@@ -218,6 +223,7 @@ class CachingReportBuilder(ReportBuilder):
             'query',
             self._get_expire(ex)
         )
+        self._cached_results.add(query_id)
 
     def get_cached_query_result(self, query_id):
         """
@@ -0,0 +1,472 @@
+"""
+Анализ конфигурации отчёта для оптимизации получения данных:
+определение используемых столбцов датафреймов и фильтров,
+которые можно применить при чтении данных из источника.
+"""
+import re
+import json
+import hashlib
+from decimal import Decimal
+
+from ..core.dataframes.filters import filter_columns
+
+
+#  ключи конфигурации датафрейма, значения которых не ссылаются на столбцы
+_SKIP_KEYS = {'id', 'name', 'base'}
+
+#  строковые литералы и имена в выражениях
+_STRINGS_RE = re.compile(r'"([^"]*)"|\'([^\']*)\'')
+_NAMES_RE = re.compile(r'[^\s()\[\],;"\'+\-*/<>=!&|]+')
+
+#  типы данных, которые можно передать при чтении файла вместо последующего преобразования;
+#  str и category не передаются, т.к. при чтении они меняют значения
+#  (например, '007' и '1.50' не преобразуются в 7 и 1.5)
+READ_DTYPES = {
+    'int': 'int64',
+    'float': 'float64',
+}
+
+#  операции фильтров датафреймов, которые можно выполнить в sql-запросе;
+#  != и not in не переносятся из-за различий в обработке пустых значений,
+#  startswith и endswith - т.к. в датафрейме они не учитывают регистр
+QUERY_FILTER_OPS = {'==', '>', '>=', '<', '<=', 'in', 'contains'}
+
+#  операции сравнения, переносимые в запрос только для чисел
+_RANGE_OPS = {'>', '>=', '<', '<='}
+
+#  агрегатные функции pandas и соответствующие им функции sql
+AGGREGATE_FUNCS = {
+    'count': 'count',
+    'sum': 'sum',
+    'mean': 'avg',
+    'min': 'min',
+    'max': 'max',
+}
+
+#  символы, при наличии которых contains в датафрейме (регулярное выражение)
+#  не совпадает с like в запросе
+_LIKE_UNSAFE = set('.^$*+?{}[]()|\\%_')
+
+
+class UsageAnalyzer:
+    """
+    Анализатор использования датафреймов в конфигурации отчёта.
+
+    Столбцы, используемые датафреймом, определяются с избытком: это все строки
+    и имена из конфигурации самого датафрейма и ссылающихся на него компонентов.
+    Если датафрейм используется целиком (таблицей либо другим датафреймом)
+    или на него ничто не ссылается, то считается, что используются все столбцы.
+    """
+    def __init__(self, data_config=None, components_config=None, values=None):
+        data_config = data_config or {}
+        self._dataframes = data_config.get('dataframes', {})
+        self._components = components_config or {}
+        self._values = values or {}
+        self._names_cache = {}
+
+    def used_columns(self, dataframe_id):
+        """
+        Множество имён, среди которых находятся все используемые столбцы
+        датафрейма, либо None, если могут использоваться любые столбцы.
+        """
+        df_conf = self._dataframes.get(dataframe_id, None)
+        if df_conf is None:
+            return None
+        refs = {dataframe_id, df_conf.get('name', dataframe_id)}
+
+        touched = False
+        columns = self._collect_names(df_conf, skip=_SKIP_KEYS)
+
+        for other_id, other in self._dataframes.items():
+            if other_id != dataframe_id and self._touches(other, refs):
+                return None
+
+        for value in self._values.values():
+            if self._touches(value, refs):
+                return None
+
+        for component in self._components.values():
+            if not self._touches(component, refs):
+                continue
+            if component.get('type', '') == 'table':
+                return None
+            touched = True
+            columns |= self._collect_names(component)
+
+        if not touched:
+            return None
+        return columns
+
+    def query_columns(self, query_id):
+        """
+        Множество имён, среди которых находятся все используемые столбцы
+        результата запроса (по всем построенным по нему датафреймам),
+        либо None, если могут использоваться любые столбцы.
+        """
+        dataframes = [
+            df_id for df_id, conf in self._dataframes.items()
+            if conf.get('base', {}).get('type', '') == 'query'
+            and conf['base'].get('value', None) == query_id
+        ]
+        if not dataframes:
+            return None
+        columns = set()
+        for df_id in dataframes:
+            used = self.used_columns(df_id)
+            if used is None:
+                return None
+            columns |= used
+        return columns
+
+    def _touches(self, conf, refs):
+        return bool(self._collect_names(conf) & refs)
+
+    def _collect_names(self, conf, skip=()):
+        """
+        Все строки и имена из выражений, встречающиеся в конфигурации.
+        """
+        names = set()
+        if isinstance(conf, dict):
+            for key, value in conf.items():
+                if key not in skip:
+                    names |= self._collect_names(value)
+        elif isinstance(conf, (list, tuple)):
+            for value in conf:
+                names |= self._collect_names(value)
+        elif isinstance(conf, str):
+            names |= self._expression_names(conf)
+        return names
+
+    def _expression_names(self, expr):
+        """
+        Строка целиком, строковые литералы и имена из неё
+        (строка может и не быть выражением).
+        """
+        names = self._names_cache.get(expr, None)
+        if names is None:
+            names = {expr}
+            for double, single in _STRINGS_RE.findall(expr):
+                names.add(double or single)
+            names.update(_NAMES_RE.findall(_STRINGS_RE.sub(' ', expr)))
+            self._names_cache[expr] = names
+        return names
+
+
+def pushable_filters(schema_df):
+    """
+    Фильтры датафрейма (в виде json), которые можно применить
+    к данным основы датафрейма до соединений и добавления столбцов.
+    Результат фильтрации не меняется, т.к. фильтры применяются повторно.
+    """
+    if any(j['type'] in ('right', 'outer') for j in schema_df.joins):
+        return []
+    changed = {col['name'] for col in schema_df.cols}
+    changed |= {dt['col'] for dt in schema_df.dtypes}
+    result = []
+    for f in schema_df.filters:
+        if f['from'] != 'json':
+            continue
+        if filter_columns(f['value']) & changed:
+            continue
+        result.append(f['value'])
+    return result
+
+
+def read_dtypes(schema_df):
+    """
+    Типы данных столбцов, которые можно задать при чтении файла.
+    """
+    return {
+        dt['col']: READ_DTYPES[dt['dtype']]
+        for dt in schema_df.dtypes
+        if dt['dtype'] in READ_DTYPES
+    }
+
+
+def query_filters(query_conf, panda_jsfilters):
+    """
+    Перевод фильтров датафрейма (в виде json) в фильтры запроса для Qbuilder.
+    Переводятся только фильтры по столбцам результата запроса
+    со значениями простых типов; из составного фильтра "и" переводятся
+    подходящие части, составной фильтр "или" - только целиком.
+    Запрос с limit не изменяется, т.к. фильтр изменил бы набор строк.
+    """
+    if _has_limit(query_conf):
+        return []
+    columns = _query_columns(query_conf)
+    result = []
+    for f in panda_jsfilters:
+        query_filter = _query_filter(f, columns)
+        if query_filter is not None:
+            result.append(query_filter)
+    return result
+
+
+def add_query_filters(query_conf, filters):
+    """
+    Копия запроса в виде словаря с добавленными фильтрами.
+    """
+    return {**query_conf, 'filters': [*query_conf.get('filters', []), *filters]}
+
+
+def filtered_key(query_id, filters):
+    """
+    Ключ результата запроса с добавленными фильтрами.
+    """
+    return _derived_key(query_id, 'where', filters)
+
+
+def aggregated_key(query_id, query_conf):
+    """
+    Ключ результата запроса с группировкой.
+    """
+    return _derived_key(query_id, 'group', query_conf)
+
+
+def aggregation_query(schema_df, query_conf, groupby, aggregates):
+    """
+    Запрос в виде словаря (для Qbuilder), группирующий данные датафрейма
+    по столбцам groupby, либо None, если группировку нельзя перенести в запрос.
+
+    aggregates - словарь вида {столбец: функция} (функции - из AGGREGATE_FUNCS).
+    Датафрейм должен строиться по запросу без изменений, кроме фильтров,
+    которые в запросе дают точно такой же результат.
+    """
+    if not _is_plain(schema_df) or not groupby or not aggregates:
+        return None
+    if set(groupby) & set(aggregates):
+        return None
+    if any(func not in AGGREGATE_FUNCS for func in aggregates.values()):
+        return None
+    if _has_limit(query_conf):
+        return None
+    filters = _exact_query_filters(schema_df, query_conf)
+    if filters is None:
+        return None
+    columns = _query_columns(query_conf)
+
+    group_by, query_aggregates = [], []
+    for col in groupby:
+        field = _resolve_column(col, columns)
+        if field is None:
+            return None
+        group_by.append({'table': field[0], 'field': field[1]})
+    for col, func in aggregates.items():
+        field = _resolve_column(col, columns)
+        if field is None:
+            return None
+        query_aggregates.append({
+            'table': field[0],
+            'field': field[1],
+            'func': AGGREGATE_FUNCS[func],
+            'alias': col,
+        })
+
+    query = add_query_filters(query_conf, filters)
+    #  упорядочивание не нужно (результат сортируется по группам), а поля
+    #  запроса заменяются полями группировки и агрегатами
+    query.pop('order_by', None)
+    query.pop('values', None)
+    query['group_by'] = group_by
+    query['aggregates'] = query_aggregates
+    return query
+
+
+def page_queries(schema_df, query_conf, page, per_page):
+    """
+    Запросы в виде словаря (для Qbuilder) для получения страницы page
+    по per_page строк данных датафрейма и количества строк в них
+    либо None, если датафрейм нельзя построить по странице запроса.
+    """
+    if not _is_plain(schema_df) or schema_df.ordering or _has_limit(query_conf):
+        return None
+    filters = _exact_query_filters(schema_df, query_conf)
+    if filters is None:
+        return None
+    query = add_query_filters(query_conf, filters)
+    page_query = {**query, 'limit': per_page, 'offset': (page - 1) * per_page}
+    count_query = {**query, 'count': True}
+    count_query.pop('order_by', None)
+    return page_query, count_query
+
+
+def grouped_frame(df, groupby, aggregates):
+    """
+    Приведение результата запроса с группировкой к виду,
+    который даёт DataFrame.groupby(groupby).agg(aggregates),
+    либо None, если результат может отличаться от результата pandas.
+    """
+    #  min и max строк в запросе зависят от правил сравнения (collation)
+    #  источника, а в pandas строки сравниваются посимвольно
+    for col, func in aggregates.items():
+        if func in ('min', 'max') and _has_strings(df[col]):
+            return None
+    #  в pandas строки с пустыми значениями группировки отбрасываются,
+    #  а сумма пустых значений равна нулю
+    df = df.dropna(subset=groupby)
+    sums = [col for col, func in aggregates.items() if func == 'sum']
+    if sums:
+        df = df.fillna({col: 0 for col in sums})
+    df = df.assign(**{
+        col: _aggregate_values(df[col], func)
+        for col, func in aggregates.items()
+    })
+    return df.set_index(groupby).sort_index()
+
+
+def _has_strings(values):
+    return values.dtype == object and any(isinstance(v, str) for v in values)
+
+
+def _aggregate_values(values, func):
+    """
+    Приведение значений агрегата к типу результата pandas:
+    среднее - дробное, decimal (sum, min, max в postgres и mysql) -
+    целые либо дробные числа.
+    """
+    if func == 'mean':
+        return values.astype('float64')
+    if values.dtype != object or not len(values):
+        return values
+    if not all(isinstance(v, Decimal) for v in values):
+        return values
+    if all(v == v.to_integral_value() for v in values):
+        return values.astype('int64')
+    return values.astype('float64')
+
+
+def _is_plain(schema_df):
+    """
+    Строится ли датафрейм по запросу без изменений данных, кроме фильтров.
+    """
+    if schema_df.build_type != 'query':
+        return False
+    changes = (
+        schema_df.dtypes, schema_df.unions, schema_df.joins,
+        schema_df.cols, schema_df.fillna,
+    )
+    return not any(changes)
+
+
+def _has_limit(query_conf):
+    try:
+        int(query_conf.get('limit', None))
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _exact_query_filters(schema_df, query_conf):
+    """
+    Фильтры датафрейма в виде фильтров запроса, если все они
+    дают в запросе точно такой же результат, иначе None.
+    """
+    panda_jsfilters = []
+    for f in schema_df.filters:
+        if f['from'] != 'json' or not _is_exact(f['value']):
+            return None
+        panda_jsfilters.append(f['value'])
+    columns = _query_columns(query_conf)
+    filters = [_query_filter(f, columns) for f in panda_jsfilters]
+    if any(f is None for f in filters):
+        return None
+    return filters
+
+
+def _derived_key(query_id, kind, params):
+    params_hash = hashlib.sha1(
+        json.dumps(params, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+    return f'{query_id}:{kind}:{params_hash}'
+
+
+def _query_columns(query_conf):
+    """
+    Столбцы результата запроса в виде {название: (таблица, поле)}
+    либо список таблиц, если запрашиваются все поля.
+    """
+    values = query_conf.get('values', [])
+    if values:
+        return {
+            v.get('alias', None) or f'{v["table"]}.{v["field"]}': (v['table'], v['field'])
+            for v in values
+        }
+    tables = [query_conf['base']]
+    for join in query_conf.get('joins', []):
+        tables += [join['l'], join['r']]
+    #  более длинные названия - первыми, на случай совпадения префиксов
+    return sorted(set(tables), key=len, reverse=True)
+
+
+def _resolve_column(col_name, columns):
+    if isinstance(columns, dict):
+        return columns.get(col_name, None)
+    for table in columns:
+        if col_name.startswith(f'{table}.'):
+            return table, col_name[len(table) + 1:]
+    return None
+
+
+def _query_filter(panda_jsf, columns):
+    if panda_jsf.get('is_q', False):
+        parts = [_query_filter(f, columns) for f in panda_jsf['filters']]
+        op = 'or' if panda_jsf['op'] == 'or' else 'and'
+        if op == 'or' and any(p is None for p in parts):
+            return None
+        parts = [p for p in parts if p is not None]
+        if not parts:
+            return None
+        return {'is_complex': True, 'op': op, 'filters': parts}
+
+    op, value = panda_jsf['op'], panda_jsf['value']
+    if op not in QUERY_FILTER_OPS or not _is_query_value(op, value):
+        return None
+    field = _resolve_column(panda_jsf['col_name'], columns)
+    if field is None:
+        return None
+    table, field_name = field
+    return {
+        'is_complex': False,
+        'table': table,
+        'field': field_name,
+        'op': op,
+        'value': value,
+    }
+
+
+def _is_query_value(op, value):
+    if op == 'in':
+        return (
+            isinstance(value, (list, tuple))
+            and len(value) > 0
+            and all(_is_scalar(v) for v in value)
+        )
+    if op == 'contains':
+        return isinstance(value, str) and not set(value) & _LIKE_UNSAFE
+    if op in _RANGE_OPS:
+        #  строки в запросе сравниваются по правилам источника (collation),
+        #  и строки, проходящие фильтр датафрейма, могли бы быть отброшены
+        return _is_number(value)
+    return _is_scalar(value)
+
+
+def _is_scalar(value):
+    #  NaN не равно самому себе
+    return isinstance(value, (str, int, float)) and value == value
+
+
+def _is_exact(panda_jsf):
+    """
+    Даёт ли фильтр в запросе точно такой же результат, как в датафрейме
+    (сравнения с числами).
+    """
+    if panda_jsf.get('is_q', False):
+        return all(_is_exact(f) for f in panda_jsf['filters'])
+    op, value = panda_jsf['op'], panda_jsf['value']
+    if op == 'in':
+        return isinstance(value, (list, tuple)) and len(value) > 0 and all(_is_number(v) for v in value)
+    return op in QUERY_FILTER_OPS - {'contains'} and _is_number(value)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
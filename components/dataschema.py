@@ -1,9 +1,15 @@
 """
 Классы для схемы данных отчёта.
 """
-from pandas import DataFrame
+import asyncio
+from copy import copy
 
 from ..core import collect_tables, get_source_class, Qbuilder
+from ..core.dataframes import panda_builder
+from ..core.sources.metadata import MetadataCache
+from ..core.sources.plan_cache import CompiledQuery, get_plan_cache
+from ..core.sources.result_cache import result_key
+from ..core.sources.trace import TraceSpan
 from .exceptions import SchemaComponentNotFound
 
 
@@ -49,6 +55,7 @@ class DataSchema:
         """
         Добавление датафрейма в схему.
         """
+        base = {**base}  # конфигурация не изменяется - она может использоваться повторно
         if base['type'] == 'query':
             source = self._sources.get(base['source'], None)
             query_id = base['value']
@@ -129,6 +136,17 @@ class SchemaSource:
     def is_sql(self):
         return self.connection.is_sql
 
+    def fork(self):
+        """
+        Копия источника со своим соединением - для использования в отдельном потоке.
+        """
+        return SchemaSource(
+            id=self.id,
+            type=self.type,
+            name=self.name,
+            connection=self.connection.fork(),
+        )
+
     def get_data(self, query=None, **kwargs):
         source = self.connection
         if query is not None:
@@ -137,7 +155,7 @@ class SchemaSource:
             else:
                 source.source = query['base']
                 return source.get_data()
-        return source.get_data()
+        return source.get_data(**kwargs)
 
     @property
     def wildcard(self):
@@ -164,30 +182,172 @@ class SchemaQuery:
         self._source = source
         self._compiled = None
         self.build_from = build_from
+        #  используемые столбцы результата (None - все), см. _compile
+        self.used_columns = None
+        #  кэш результатов (ResultCache) - одинаковые запросы выполняются один раз
+        self.result_cache = None
+        #  трассировка выполнения запросов (QueryTrace)
+        self.trace = None
 
     def execute(self):
-        with self._source as source:
-            if source.is_sql:
-                self._compiled = self._compile()
-                data = source.get_data(query=self._compiled)
-            else:
+        with self._span() as span:
+            with span.timer('connect'):
+                self._source.open()
+            with self._source as source:
+                if source.is_sql:
+                    with span.timer('compile'):
+                        self._compiled = self._compile()
+                    span.sql = str(self._compiled)
+                    data = self._get_data(source, self._compiled, span)
+                else:
+                    source.source = self.query_src['base']
+                    with span.timer('fetch'):
+                        data = source.get_data()
+                    span.add_result(data)
+                return data
+
+    def _span(self):
+        """
+        Трассировка выполнения запроса (TraceSpan).
+        """
+        source_key = getattr(self._source.connection, 'source_key', None)
+        if self.trace is None:
+            return TraceSpan(self.id, source_key)
+        return self.trace.span(self.id, source_key)
+
+    def _get_data(self, source, compiled, span):
+        """
+        Выполнение сформированного запроса либо получение результата
+        такого же запроса (с тем же текстом и параметрами) из кэша результатов.
+        """
+        cache = self.result_cache
+        source_key = getattr(source, 'source_key', None)
+        if cache is None or source_key is None:
+            return source.get_data(query=compiled, span=span)
+        sql, params = compiled.str_and_params()
+        key = result_key(source_key, sql, params)
+        executed = []
+
+        def execute():
+            executed.append(True)
+            return source.get_data(query=compiled, span=span)
+
+        data = cache.get_or_execute(key, execute)
+        if not executed:
+            span.cached = True
+            span.rows = len(data)
+        return data
+
+    async def aexecute(self):
+        """
+        Асинхронное выполнение запроса.
+        Запросы к sql-источникам (формирование и выполнение)
+        выполняются в пуле потоков цикла событий.
+        """
+        source = self._source.connection
+        if source.is_sql:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.execute)
+        with self._span() as span:
+            with span.timer('connect'):
+                await source.aopen()
+            try:
                 source.source = self.query_src['base']
-                data = source.get_data()
-            return data
+                with span.timer('fetch'):
+                    data = await source.aget_data()
+                span.add_result(data)
+                return data
+            finally:
+                await source.aclose()
+
+    def fork(self):
+        """
+        Копия запроса с копией источника - для выполнения в отдельном потоке.
+        """
+        query = copy(self)
+        query._source = self._source.fork()
+        return query
+
+    def iter_execute(self, batch_size=None):
+        """
+        Потоковое выполнение запроса - результат возвращается частями
+        по batch_size строк.
+        """
+        with self._span() as span:
+            with span.timer('connect'):
+                self._source.open()
+            with self._source as source:
+                if source.is_sql:
+                    with span.timer('compile'):
+                        self._compiled = self._compile()
+                    span.sql = str(self._compiled)
+                    yield from source.iter_data(
+                        query=self._compiled,
+                        batch_size=batch_size,
+                        span=span,
+                    )
+                else:
+                    source.source = self.query_src['base']
+                    chunks = source.iter_data(batch_size=batch_size)
+                    while True:
+                        with span.timer('fetch'):
+                            chunk = next(chunks, None)
+                        if chunk is None:
+                            break
+                        span.add_result(chunk)
+                        yield chunk
 
     def _compile(self):
         """
         Создание объекта запроса (SelectQuery из noofa.core.conn.query).
+        Если такой же запрос к той же базе уже формировался, то
+        возвращается сформированный запрос (CompiledQuery) из кэша.
         """
         query = self.query
-        tables_list = collect_tables(query)
         source = self._source
+        connection = source.connection
+        plan_cache = get_plan_cache()
+        source_key = getattr(connection, 'source_key', None)
+        key = None
+        if plan_cache is not None and source_key is not None:
+            key = plan_cache.key(
+                query,
+                source_key,
+                source_type=connection.source_type,
+                wildcard=source.wildcard,
+                used_columns=sorted(self.used_columns or []),
+                projected=self.used_columns is not None,
+            )
+            compiled = plan_cache.get(key)
+            if compiled is not None:
+                return compiled
+
+        tables_list = collect_tables(query)
         if not source.is_opened:
             source.open()
         tables = source.get_table_multiple(tables_list)
-        qb_args = [tables, query, source.wildcard, source.connection.source_type == 'mssql']
-        qbuilder = Qbuilder(*qb_args)
-        return qbuilder.parse_query()
+        qb_args = [tables, query, source.wildcard, connection.source_type == 'mssql']
+        qbuilder = Qbuilder(*qb_args, dialect=connection.source_type)
+        compiled = qbuilder.parse_query()
+        projectable = not query.get('values', []) and not query.get('aggregates', [])
+        if self.used_columns is not None and projectable:
+            #  вместо всех полей таблиц запрашиваются только используемые
+            fields = [
+                (field, None) for field in compiled._fields
+                if field.replace('"', '') in self.used_columns
+            ]
+            if fields:
+                compiled.values(*fields)
+        if query.get('count', False):
+            compiled = compiled.count_query()
+
+        if key is not None:
+            compiled = CompiledQuery.from_select(compiled)
+            #  запрос хранится не дольше метаданных источника
+            metadata_cache = getattr(connection, 'metadata_cache', None)
+            ttl = metadata_cache.ttl if isinstance(metadata_cache, MetadataCache) else None
+            plan_cache.set(key, compiled, ttl)
+        return compiled
 
 
 class SchemaDataframe:
@@ -210,9 +370,13 @@ class SchemaDataframe:
         self.cols = columns or []
         self.fillna = fillna or []
 
-    def get_data(self):
+    def get_data(self, **kwargs):
+        """
+        Получение данных основы датафрейма.
+        kwargs - параметры чтения данных файловым источником (см. FileSource.get_data).
+        """
         if self.build_type == 'source':
-            return self._source.get_data()
+            return self._source.get_data(**kwargs)
         data = self._query.execute()
         return data
 
@@ -220,8 +384,7 @@ class SchemaDataframe:
         res = self.get_data()
         if self.build_type == 'source':
             return res
-        data, columns = res.data, res.columns
-        return DataFrame(data, columns=columns)
+        return panda_builder.from_result(res)
 
     @property
     def build_type(self):
@@ -122,10 +122,13 @@ class PlotlyPie(ReportFigure, PlotlyMixin):
     """
     def using_agg(self, dataframe=None, groupby=[],
         on='', func='count', evaluator=None, **kwargs):
-        df = evaluator.get_or_build_dataframe(dataframe)
+        agg_df = self._aggregate(evaluator, dataframe, groupby, on, func)
+        if agg_df is None:
+            df = evaluator.get_or_build_dataframe(dataframe)
 
         if groupby:
-            agg_df = df.groupby(groupby).agg(func)
+            if agg_df is None:
+                agg_df = df.groupby(groupby).agg(func)
         else:
             agg_df = self._no_groupby(df, on, func)
             return px.pie(agg_df, names='index', values=func)
@@ -179,14 +182,18 @@ class PlotlyBar(ReportFigure, PlotlyMixin):
 
     def using_agg(self, dataframe=None, groupby=[],
         on='', func='count', legend=[], evaluator=None, **kwargs):
-        df = evaluator.get_or_build_dataframe(dataframe)
+        grouped = None
+        if not legend:
+            grouped = self._aggregate(evaluator, dataframe, groupby, on, func)
+        if grouped is None:
+            df = evaluator.get_or_build_dataframe(dataframe)
         kw = {'orientation': self.orientation}
 
         if groupby:
             if legend:
                 return self._using_legend(df, legend, groupby, on, func)
 
-            df = df.groupby(groupby).agg({on: func})
+            df = grouped if grouped is not None else df.groupby(groupby).agg({on: func})
         else:
             df = self._no_groupby(df, on, func)
             x, y = ('index', func) if self.is_vertical else (func, 'index')
@@ -1,3 +1,6 @@
+from ..core.dataframes.panda_builder import pd
+
+
 class PlotlyMixin:
     """
     Доп. класс для компонентов-графиков plotly, при наследовании указывающий, что компонент
@@ -20,6 +23,17 @@ class PlotlyMixin:
             path += '.png'
         self.figure.write_image(path)
 
+    def _aggregate(self, evaluator, dataframe, groupby, on, func):
+        """
+        Группировка, выполненная формирователем отчёта в запросе к источнику,
+        либо None, если это невозможно (см. ReportBuilder.aggregate).
+        """
+        aggregate = getattr(evaluator, 'aggregate', None)
+        if aggregate is None or not groupby:
+            return None
+        grouped = aggregate(dataframe, groupby, {on: func})
+        return grouped if isinstance(grouped, pd.DataFrame) else None
+
     def _no_groupby(self, dataframe, on, func):
         ser = dataframe.agg({on: func})
         df = ser.to_frame(name=func)
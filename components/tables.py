@@ -1,7 +1,19 @@
-from ..core.dataframes.panda_builder import pivot_table, empty
+from ..core.dataframes.panda_builder import pivot_table, empty, pd
 from .base import ReportComponent
 from ..utils import get_dtypes
 from .utils import apply_filters
+from .exceptions import SchemaComponentNotFound
+
+
+#  функции, которыми значения, сгруппированные по ячейкам сводной таблицы,
+#  сводятся в итоговые (в т.ч. при подсчёте итогов по строкам и столбцам)
+_REAGGREGATE = {
+    'count': 'sum',
+    'sum': 'sum',
+    'min': 'min',
+    'max': 'max',
+    'mean': 'mean',
+}
 
 
 class ReportTable(ReportComponent):
@@ -17,6 +29,7 @@ class ReportTable(ReportComponent):
         # должен иметь формат {название_существующего_столбца1: новое_название, ...}
         self._aliases = aliases or {}
         self._df = None  #  датафрейм, данные из которого будут выводиться в виде таблицы
+        self.total = None  #  количество строк во всех страницах при постраничном построении
 
     @property
     def df(self):
@@ -26,12 +39,18 @@ class ReportTable(ReportComponent):
     def df(self, value):
         self._df = value
 
-    def build(self, **kwargs):
+    def build(self, page=None, per_page=None, **kwargs):
         """
         Построение таблицы. Под этим подразумевается переименование столбцов
         и отбрасывание лишних столбцов в зависимости от конфигурации таблицы.
+        При заданных page и per_page строится только страница page
+        (начиная с 1) по per_page строк, а в self.total - количество строк всего.
         """
-        self.df = self.evaluator.evaluate(self.base)
+        if page is not None and per_page:
+            self.df, self.total = self._get_page(int(page), int(per_page))
+        else:
+            self.df = self.evaluator.evaluate(self.base)
+            self.total = None if self._df is None else len(self._df)
 
         if self._df is not None:
             if self._aliases:
@@ -43,6 +62,21 @@ class ReportTable(ReportComponent):
                     self.df = self.df.drop(cols, axis=1)
         return self
 
+    def _get_page(self, page, per_page):
+        """
+        Страница данных и количество строк - от формирователя отчёта,
+        если основа таблицы - датафрейм (см. ReportBuilder.get_page).
+        """
+        get_page = getattr(self.evaluator, 'get_page', None)
+        if get_page is not None and isinstance(self.base, str):
+            try:
+                return get_page(self.base.strip(), page, per_page)
+            except SchemaComponentNotFound:
+                pass
+        df = self.evaluator.evaluate(self.base)
+        start = (page - 1) * per_page
+        return df.iloc[start:start + per_page], len(df)
+
     def to_csv(self, path=None):
         sep, idx = ';', False
         if path is None:
@@ -122,15 +156,55 @@ class ReportPivotTable(ReportComponent):
             self.pivot_df = empty()
             return self
 
-        self.df = self.evaluator.evaluate(self.base)
-        if self.df is not None and self._pivot_conf is not None:
+        pivot_conf = self._pivot_conf
+        grouped = None if filters else self._aggregate()
+        if grouped is not None:
+            #  данные сгруппированы по ячейкам сводной таблицы в запросе к источнику
+            self.df, pivot_conf = grouped
+        else:
+            self.df = self.evaluator.evaluate(self.base)
+        if self.df is not None and pivot_conf is not None:
             if filters:
                 df = apply_filters(self.df, filters)
             else:
                 df = self.df
-            self.pivot_df = pivot_table(df, **self._pivot_conf)
+            self.pivot_df = pivot_table(df, **pivot_conf)
         return self
 
+    def _aggregate(self):
+        """
+        Данные, сгруппированные по строкам и столбцам сводной таблицы
+        формирователем отчёта (см. ReportBuilder.aggregate), и конфигурация
+        для построения по ним сводной таблицы либо None.
+        Возможно, только если для каждого столбца задана одна функция.
+        """
+        aggregate = getattr(self.evaluator, 'aggregate', None)
+        conf = self._pivot_conf
+        aggfunc = conf.get('aggfunc', {})
+        if aggregate is None or not isinstance(self.base, str) or not isinstance(aggfunc, dict):
+            return None
+
+        groupby = []
+        for key in ('index', 'columns'):
+            cols = conf.get(key, None) or []
+            groupby += cols if isinstance(cols, list) else [cols]
+
+        aggregates, reaggfunc = {}, {}
+        for col, funcs in aggfunc.items():
+            funcs = funcs if isinstance(funcs, list) else [funcs]
+            if len(funcs) != 1 or funcs[0] not in _REAGGREGATE:
+                return None
+            func = funcs[0]
+            if func == 'mean' and conf.get('margins', False):
+                return None
+            aggregates[col] = func
+            reaggfunc[col] = [_REAGGREGATE[func]]
+
+        grouped = aggregate(self.base.strip(), groupby, aggregates)
+        if not isinstance(grouped, pd.DataFrame):
+            return None
+        return grouped.reset_index(), {**conf, 'aggfunc': reaggfunc}
+
     @property
     def is_pivot_table(self):
         return True
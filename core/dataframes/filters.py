@@ -218,4 +218,15 @@ def _parse_filters(df, panda_jsfilters):
     for f in panda_jsfilters:
         p = _parse_filter(df, f)
         res &= p
-    return res
\ No newline at end of file
+    return res
+
+def filter_columns(panda_jsf):
+    """
+    Столбцы, используемые фильтром в виде json.
+    """
+    if panda_jsf.get('is_q', False):
+        columns = set()
+        for f in panda_jsf['filters']:
+            columns |= filter_columns(f)
+        return columns
+    return {panda_jsf['col_name']}
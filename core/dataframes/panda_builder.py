@@ -5,12 +5,37 @@ from datetime import datetime, date, time
 import pandas as pd
 
 from . import filters
+from ..sources.conn import ColumnarQueryResult
 
 
 def new(data={}, columns=[]):
     return pd.DataFrame(data, columns=columns)
 
 
+def from_result(result):
+    """
+    Построение датафрейма по результату запроса (DataQueryResult).
+    Для результата в виде строк-кортежей датафрейм строится
+    без промежуточного списка словарей.
+    """
+    if isinstance(result, ColumnarQueryResult):
+        return pd.DataFrame.from_records(result.rows, columns=result.columns)
+    return new(result.data, result.columns)
+
+
+def from_chunks(chunks):
+    """
+    Построение датафрейма по частям результата запроса.
+    chunks - итерируемый объект с экземплярами DataQueryResult.
+    """
+    frames = [from_result(chunk) for chunk in chunks]
+    if not frames:
+        return empty()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
 def join(df1, df2, on, how='inner'):
     """
     Соединение датафреймов.
@@ -0,0 +1,176 @@
+"""
+Компиляция проверенных синтаксических деревьев формул в функции Python.
+Дерево обходится один раз, при этом количество аргументов функций
+проверяется при компиляции, а проверки типов аргументов заранее
+подбираются для каждого аргумента. Результат компиляции - функция
+от контекста интерпретатора, которую можно вычислять многократно.
+"""
+from .base import Func, NonMandatoryArg
+from .context import GetFromContext, GetSlice
+from .errors import NotEnoughArguments, ArgumentTypeError
+
+
+class FormulaCompiler:
+    """
+    Компилятор синтаксических деревьев.
+
+    functions_dict - словарь функций вида {название: класс функции},
+    operators_dict - словарь операторов вида {знак: класс оператора}.
+    """
+    def __init__(self, functions_dict, operators_dict):
+        self._functions_dict = functions_dict
+        self._operators_dict = operators_dict
+
+    def compile(self, stree):
+        """
+        Компиляция дерева в функцию вида f(context) -> результат.
+        """
+        if stree is None:
+            return _constant(None)
+        type_ = stree['type']
+        if type_ == 'symbol':
+            return _context_getter(stree['value'])
+        if type_ == 'string':
+            return self._compile_constant('to_str', stree['value'])
+        if type_ == 'number':
+            value = stree['value']
+            return self._compile_constant('to_float' if '.' in value else 'to_int', value)
+        if type_ == 'operator':
+            func_cls = self._operators_dict.get(stree['value'], None)
+            args = [self.compile(stree['left']), self.compile(stree['right'])]
+            return _call(func_cls, args)
+        if type_ == 'context':
+            return self._compile_slice(stree)
+        if type_ == 'call':
+            args = [self.compile(arg) for arg in stree['args']]
+            _func = stree['function']
+            if _func is None:
+                return args[0]
+            func_cls = self._functions_dict.get(_func['value'], None)
+            if func_cls.group == 'context':
+                args.insert(0, _current_context)
+            return _call(func_cls, args)
+
+    def _compile_constant(self, fname, value):
+        """
+        Строки и числа вычисляются при компиляции; если значение
+        нельзя преобразовать, то ошибка выбрасывается при вычислении.
+        """
+        func_cls = self._functions_dict.get(fname, None)
+        try:
+            return _constant(func_cls(value)())
+        except Exception:
+            return _call(func_cls, [_constant(value)])
+
+    def _compile_slice(self, stree):
+        """
+        Получение элемента/столбца переменной контекста: var[arg1, ...].
+        """
+        getters = [self.compile(arg) for arg in stree['args']]
+        name = stree['var']['value']
+        get_slice = GetSlice()._get_operation()
+
+        def run(context):
+            key = [getter(context) for getter in getters]
+            return get_slice(context.get(name), key)
+
+        return run
+
+
+def _constant(value):
+    def run(context):
+        return value
+    return run
+
+
+def _current_context(context):
+    return context
+
+
+def _context_getter(name):
+    get = GetFromContext()._get_operation()
+
+    def run(context):
+        return get(context, name)
+
+    return run
+
+
+def _call(func_cls, args):
+    """
+    Вызов функции func_cls с аргументами, вычисляемыми функциями args.
+    """
+    if not _is_standard(func_cls):
+        #  функции с собственным порядком вызова выполняются как при интерпретации
+        def run(context):
+            return func_cls(*[arg(context) for arg in args])()
+        return run
+
+    func = func_cls()
+    name = func.get_name()
+    if len(args) < func._mandatory:
+        raise NotEnoughArguments(name, func._mandatory)
+    operation = func._get_operation()
+    checks = _type_checks(func, len(args))
+
+    if len(args) == 2:
+        left, right = args
+        left_types, right_types = checks
+
+        def run(context):
+            a, b = left(context), right(context)
+            if left_types is not None and not isinstance(a, left_types):
+                raise ArgumentTypeError(name, a.__class__.__name__)
+            if right_types is not None and not isinstance(b, right_types):
+                raise ArgumentTypeError(name, b.__class__.__name__)
+            return operation(a, b)
+
+        return run
+
+    checked = [(n, types) for n, types in enumerate(checks) if types is not None]
+
+    def run(context):
+        values = [arg(context) for arg in args]
+        for n, types in checked:
+            value = values[n]
+            if not isinstance(value, types):
+                raise ArgumentTypeError(name, value.__class__.__name__)
+        return operation(*values)
+
+    return run
+
+
+def _type_checks(func, args_len):
+    """
+    Допустимые типы для каждого из args_len аргументов функции (кортежи)
+    либо None, если тип аргумента не проверяется (см. Func._check_arguments).
+    """
+    if func.arguments_type is not None:
+        return [(func.arguments_type, )] * args_len
+    args_desc = func.__class__.args_description
+    checks = []
+    for n in range(args_len):
+        types = args_desc[n]._types if n < len(args_desc) else []
+        checks.append(tuple(types) if types else None)
+    return checks
+
+
+def _is_standard(func_cls):
+    """
+    Используются ли для функции стандартные вызов и проверки аргументов Func.
+    """
+    return all(
+        getattr(func_cls, attr) is getattr(Func, attr)
+        for attr in ('__init__', '__call__', '_check_arguments', '_check_one_type_arguments')
+    ) and all(
+        type(arg).check_value is NonMandatoryArg.check_value
+        for arg in func_cls.args_description
+    )
+
+
+def compile_tree(stree, functions_dict, operators_dict):
+    """
+    Компиляция проверенного синтаксического дерева формулы.
+    """
+    return FormulaCompiler(functions_dict, operators_dict).compile(stree)
+
@@ -277,7 +277,7 @@ class CreateDataframe(DataframeFunc):
             return panda_builder.new()
         data = args[0]
         if isinstance(data, DataQueryResult):
-            return panda_builder.new(data.data, data.columns)
+            return panda_builder.from_result(data)
         if data:
             columns = data.pop(0)
             return panda_builder.new(data, columns)
@@ -5,11 +5,47 @@ from .parser import parse
 from .context import Context, _context_funcs, GetFromContext, GetSlice
 from ._functions import FUNCTIONS_DICT as _functions_dict
 from ._functions import OPERATORS_DICT as _operators_dict
-from .operators import _OPERATORS_PRIORITY
 from .errors import ExpressionSyntaxError
+from .tree_cache import SyntaxTreeCache, get_tree_cache, get_compiled_cache
+from .compiler import compile_tree
+from .vectorize import Vectorizer
 
 
-_OPERATORS = _OPERATORS_PRIORITY.keys()
+class FunctionsTable(dict):
+    """
+    Словарь функций интерпретатора, отмечающий свои изменения:
+    формулы, скомпилированные с изменённым словарём, не помещаются
+    в общий для интерпретаторов кэш.
+    """
+    modified = False
+
+    def __setitem__(self, key, value):
+        self.modified = True
+        super().__setitem__(key, value)
+
+    def __delitem__(self, key):
+        self.modified = True
+        super().__delitem__(key)
+
+    def update(self, *args, **kwargs):
+        self.modified = True
+        super().update(*args, **kwargs)
+
+    def setdefault(self, key, default=None):
+        self.modified = True
+        return super().setdefault(key, default)
+
+    def pop(self, *args):
+        self.modified = True
+        return super().pop(*args)
+
+    def popitem(self):
+        self.modified = True
+        return super().popitem()
+
+    def clear(self):
+        self.modified = True
+        super().clear()
 
 
 class Interpreter:
@@ -17,9 +53,10 @@ class Interpreter:
     Интерпретатор для выполнения функций и вычислений.
     """
     def __init__(self, **context):
-        self._functions_dict = {**_functions_dict}
-        self._functions_dict.update(_context_funcs)
+        self._functions_dict = FunctionsTable({**_functions_dict, **_context_funcs})
         self._operators_dict = _operators_dict
+        #  кэш формул, скомпилированных с изменённым словарём функций
+        self._compiled = SyntaxTreeCache()
         self._context = Context(**context)
         self._connections = {}
 
@@ -38,22 +75,65 @@ class Interpreter:
         """
         if not expression.endswith(';'):
             expression += ';'
-        stree = parse(expression)
-        stree = self._normalize_operators(stree[0])
+        formula = self.compile(expression)
+        return formula(self._context)
+
+    def compile(self, expression):
+        """
+        Формула в виде функции от контекста интерпретатора (см. compiler.py) -
+        из кэша (см. get_compiled_cache) либо после компиляции.
+        Формулы, использующие изменённый словарь функций интерпретатора,
+        хранятся в собственном кэше интерпретатора.
+        """
+        cache = get_compiled_cache()
+        if cache is not None and getattr(self._functions_dict, 'modified', True):
+            cache = self._compiled
+        formula = cache.get(expression) if cache is not None else None
+        if formula is None:
+            stree = self._get_tree(expression)
+            formula = compile_tree(stree, self._functions_dict, self._operators_dict)
+            if cache is not None:
+                cache.set(expression, formula)
+        return formula
+
+    def _get_tree(self, expression):
+        """
+        Проверенное синтаксическое дерево формулы - из кэша (см. get_tree_cache)
+        либо после разбора формулы.
+        """
+        cache = get_tree_cache()
+        stree = cache.get(expression) if cache is not None else None
+        if stree is None:
+            stree = self._build_tree(expression)
+            if cache is not None:
+                cache.set(expression, stree)
+        return stree
+
+    def _build_tree(self, expression):
+        """
+        Разбор формулы и проверка синтаксиса.
+        """
+        stree = parse(expression)[0]
         is_valid = self._check_syntax(stree)
         if not is_valid:
             raise ExpressionSyntaxError
-        func = self._eval(stree)
-        result = func()
-        return result
+        return stree
 
-    def apply(self, df, expr):
+    def apply(self, df, expr, vectorize=True):
         """
         Применение выражения к строкам датафрейма.
         Здесь исользуется локальный контекст интерпретатора,
         при этом в выражении будут доступны переменные row - строка датафрейма в виде словаря,
         и idx - порядковый номер строки. Нумерация строк - с 0.
+
+        При vectorize=True выражение по возможности вычисляется один раз
+        над столбцами датафрейма (см. vectorize.py), иначе - для каждой строки.
         """
+        if vectorize and len(df):
+            result = self._apply_vectorized(df, expr)
+            if result is not None:
+                return result
+
         result = []
         rows = df.to_dict(orient='records')
         self._context.switch_to_local()
@@ -68,6 +148,24 @@ class Interpreter:
         self._context.switch_to_global()
         return result
 
+    def _apply_vectorized(self, df, expr):
+        """
+        Результат выражения, вычисленного над столбцами датафрейма,
+        либо None, если так его вычислить нельзя.
+        """
+        expression = expr if expr.endswith(';') else expr + ';'
+        stree = self._get_tree(expression)
+        vectorizer = Vectorizer(self._functions_dict, self._operators_dict)
+        self._context.switch_to_local()
+        try:
+            return vectorizer.evaluate(stree, df, self._context)
+        except Exception:
+            #  в т.ч. NotVectorizable - выражение вычисляется по строкам,
+            #  и возможная ошибка выбрасывается при этом вычислении
+            return None
+        finally:
+            self._context.switch_to_global()
+
     def add_to_global(self, key, value):
         """
         Добавление ключа-значения в глобальный контекст.
@@ -183,90 +281,3 @@ class Interpreter:
 
     def _get_operator(self, sign):
         return self._operators_dict.get(sign, None)
-
-    def _normalize_operators(self, expr):
-        """
-        Упорядочивание операторов в выражении по приоритету операций.
-        """
-        type_ = expr['type']
-        if type_ == 'operator':
-            _unpacked = self._unpack_operator(expr)
-            expr = self._sort_operators(_unpacked)
-        elif type_ == 'call':
-            args = []
-            for arg in expr['args']:
-                args.append(self._normalize_operators(arg))
-            expr['args'] = args
-        return expr
-
-    def _sort_operators(self, unpacked_operator):
-        """
-        Сортировка операторов по приоритету операций.
-        """
-        def upd(unp, n, operator):
-            left, right = unp[n-1], unp[n+1]
-            op = {'type': 'operator', 'value': operator, 'left': left, 'right': right}
-            l, r = unp[:n-1], unp[n+2:]
-            l.append(op)
-            return op, l + r
-
-        def get_prioritized(priority):
-            return [s for s, p in _OPERATORS_PRIORITY.items() if p == priority]
-
-        res = []
-        current_priority = 1
-        prioritized_operators = get_prioritized(current_priority)
-        # перебор распакованного оператора производится до тех пор,
-        # пока он не будет приведён к одному словарю
-        while len(unpacked_operator) != 1:
-            for n, i in enumerate(unpacked_operator):
-                type_ = type(i)
-                if type_ is str:
-                    priority = _OPERATORS_PRIORITY[i]
-                    if priority == current_priority:
-                        res, unpacked_operator = upd(unpacked_operator, n, i)
-                        break
-                    else:
-                        keep_looking = False
-                        for p in prioritized_operators:
-                            if p in unpacked_operator:
-                                keep_looking = True
-                                break
-                        if not keep_looking:
-                            #res, unpacked_operator = upd(unpacked_operator, n, i)
-                            current_priority += 1
-                            prioritized_operators = get_prioritized(current_priority)
-                            break
-        return res
-
-    def _unpack_operator(self, op):
-        """
-        Распаковка аргументов оператора.
-        Используется для дальнейшего расположения
-        арифмет. операторов в порядке приоритета операций.
-
-        На выходе имеем список вида [токен1, оператор1, ..., операторN-1, токенN]
-        """
-        res = [op['value']]
-        for i in ('left', 'right'):
-            o = op[i]
-            if o is None:
-                if i == 'left':
-                    res.insert(0, o)
-                else:
-                    res.append(o)
-                continue
-            if o['type'] == 'operator':
-                unp = self._unpack_operator(o)
-                if i == 'left':
-                    for i in unp[::-1]:
-                        res.insert(0, i)
-                else:
-                    for i in unp:
-                        res.append(i)
-            else:
-                if i == 'left':
-                    res.insert(0, o)
-                else:
-                    res.append(o)
-        return res
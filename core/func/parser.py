@@ -6,6 +6,11 @@ import re
 from abc import ABC, abstractmethod
 
 from .errors import ExpressionParsingError
+from .operators import _OPERATORS_PRIORITY
+
+
+#  наименьший приоритет операторов (больше значение - ниже приоритет)
+_LOWEST_PRIORITY = max(_OPERATORS_PRIORITY.values())
 
 
 def parse(formula_string):
@@ -20,6 +25,8 @@ def parse(formula_string):
 class Parser:
     """
     Парсер.
+    Операторы упорядочиваются по приоритету операций при разборе
+    (методом предшествования операторов), левоассоциативно.
     """
     def __init__(self, token_stream, stop_at=';'):
         self._tokens = token_stream
@@ -35,32 +42,63 @@ class Parser:
 
     def parse(self):
         while self.tokens.next is not None:
-            e = self.next_expression(None)
+            e = self.next_expression()
             if e is not None:
                 yield e
             self.tokens.get_next()
 
-    def next_expression(self, prev):
+    def next_expression(self, max_priority=_LOWEST_PRIORITY):
+        """
+        Разбор выражения до стоп-токена либо до оператора
+        с приоритетом ниже max_priority.
+        """
+        left = self._operand()
+        while True:
+            next_ = self.tokens.next
+            type_, value = next_['type'], next_['value']
+            if type_ in self.stop_at:
+                return left
+            if type_ != 'operator':
+                raise ExpressionParsingError(f'Неожиданный токен: {(type_, value)}')
+            priority = _OPERATORS_PRIORITY[value]
+            if priority > max_priority:
+                return left
+            self.tokens.get_next()
+            #  операторы с более высоким приоритетом относятся к правому операнду
+            right = self.next_expression(priority - 1)
+            left = {'type': 'operator', 'value': value, 'left': left, 'right': right}
+
+    def _operand(self):
+        """
+        Операнд оператора: значение, вызов функции либо получение
+        элемента переменной. None - операнд отсутствует (например, -x).
+        """
         next_ = self.tokens.next
         type_, value = next_['type'], next_['value']
-        if type_ in self.stop_at:
-            return prev
+        if type_ in self.stop_at or type_ == 'operator':
+            return None
         self.tokens.get_next()
-        if type_ in ('number', 'string', 'symbol') and prev is None:
-            return self.next_expression(next_)
-        elif type_ == 'operator':
-            nxt = self.next_expression(None)
-            return self.next_expression({'type': 'operator', 'value': value, 'left': prev, 'right': nxt})
-        elif type_ in '([':
-            if type_ == '(':
-                args = self._scan_args(func=prev)
-                return self.next_expression({'type': 'call', 'function': prev, 'args': args})
-            elif type_ == '[':
-                args = self._scan_args(func=prev, end=']')
-                return self.next_expression({'type': 'context', 'var': prev, 'args': args})
+        if type_ in ('number', 'string', 'symbol'):
+            operand = next_
+        elif type_ == '(':
+            operand = {'type': 'call', 'function': None, 'args': self._scan_args()}
+        elif type_ == '[':
+            operand = {'type': 'context', 'var': None, 'args': self._scan_args(end=']')}
         else:
             raise ExpressionParsingError(f'Неожиданный токен: {(type_, value)}')
 
+        type_ = self.tokens.next['type']
+        while type_ in ('(', '['):
+            self.tokens.get_next()
+            if type_ == '(':
+                args = self._scan_args(func=operand)
+                operand = {'type': 'call', 'function': operand, 'args': args}
+            else:
+                args = self._scan_args(func=operand, end=']')
+                operand = {'type': 'context', 'var': operand, 'args': args}
+            type_ = self.tokens.next['type']
+        return operand
+
     def _scan_args(self, sep=',', end=')', func=None):
         args = []
         type_ = self.tokens.next['type']
@@ -73,7 +111,7 @@ class Parser:
                 stop_at = (sep, end)
             arg_parser = Parser(self.tokens, stop_at)
             while type_ != end:
-                p = arg_parser.next_expression(None)
+                p = arg_parser.next_expression()
                 if p is not None:
                     args.append(p)
                 type_ = self.tokens.next['type']
@@ -103,9 +141,70 @@ class Stream:
         return self._next
 
 
+#  токены формулы; группы проверяются в порядке перечисления
+_TOKEN_RE = re.compile(r"""
+    (?P<space>[ \n]+)
+    |(?P<punct>[(),;\[\]])
+    |(?P<number>[0-9.]+)
+    |(?P<symbol>[a-zA-Z_][a-zA-Z_0-9]*)
+    |(?P<operator>[-+*/&|])
+    |(?P<compare>[<>!=].?)
+    |"(?P<dstring>[^"]*)"
+    |'(?P<sstring>[^']*)'
+    |(?P<unclosed>["'])
+""", re.VERBOSE | re.DOTALL)
+
+
 class FormulaLexer:
     """
     Лексер для формул.
+    Формула разбирается за один проход одним регулярным выражением.
+    """
+    def __init__(self, tokens):
+        self._text = tokens
+
+    def lex(self):
+        text = self._text
+        match = _TOKEN_RE.match
+        pos, end = 0, len(text)
+        while pos < end:
+            m = match(text, pos)
+            if m is None:
+                raise ExpressionParsingError(f'Неизвестный токен: {text[pos]}')
+            pos = m.end()
+            kind = m.lastgroup
+            if kind == 'space':
+                continue
+            value = m.group(kind)
+            if kind == 'punct':
+                yield {'type': value, 'value': ''}
+            elif kind == 'compare':
+                yield {'type': 'operator', 'value': _compare_operator(value)}
+            elif kind in ('dstring', 'sstring'):
+                yield {'type': 'string', 'value': value}
+            elif kind == 'unclosed':
+                raise ExpressionParsingError('Незавершённый идентификатор строки')
+            else:
+                yield {'type': kind, 'value': value}
+
+
+def _compare_operator(value):
+    """
+    Оператор сравнения по знаку и следующему за ним символу.
+    Как и в RuleLexer, символ после > и < (не "=") пропускается.
+    """
+    sign, c = value[0], value[1:]
+    if c == '=':
+        return value
+    if sign in ('!', '='):
+        raise ExpressionParsingError(f'Неожиданный токен после "{sign}": {c or None}')
+    return sign
+
+
+class RuleLexer:
+    """
+    Посимвольный лексер на правилах Rule (прежняя реализация FormulaLexer).
+    Результат совпадает с результатом FormulaLexer.
     """
     def __init__(self, tokens):
         self._rules = [
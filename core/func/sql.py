@@ -65,12 +65,11 @@ class SqlExecute(SqlFunc):
         conn = args[0]
         q = args[1].q_part
         tables_list = collect_tables(q)
-        conn.open()
-        tables = conn.get_table_multiple(tables_list)
-        qb = Qbuilder(tables, q)
-        query = qb.parse_query()
-        data = conn.get_data(query=query)
-        conn.close()
+        with conn:
+            tables = conn.get_table_multiple(tables_list)
+            qb = Qbuilder(tables, q)
+            query = qb.parse_query()
+            data = conn.get_data(query=query)
         return data
 
 
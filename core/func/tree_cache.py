@@ -0,0 +1,100 @@
+"""
+Кэши формул по их тексту: синтаксических деревьев и скомпилированных функций
+(см. compiler.py) - разбор, упорядочивание операторов, проверка синтаксиса
+и компиляция выполняются только при первом вычислении формулы.
+"""
+import threading
+from collections import OrderedDict
+
+
+#  количество хранимых деревьев по умолчанию
+TREE_CACHE_SIZE = 1024
+
+
+class SyntaxTreeCache:
+    """
+    Кэш (LRU) проверенных синтаксических деревьев (либо скомпилированных
+    функций) по тексту формулы. Деревья не должны изменяться после помещения в кэш.
+
+    max_entries - макс. количество хранимых деревьев.
+    """
+    def __init__(self, max_entries=TREE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, expression):
+        """
+        Дерево формулы expression либо None.
+        """
+        with self._lock:
+            stree = self._items.get(expression, None)
+            if stree is None:
+                self._misses += 1
+                return None
+            self._items.move_to_end(expression)
+            self._hits += 1
+            return stree
+
+    def set(self, expression, stree):
+        with self._lock:
+            self._items[expression] = stree
+            self._items.move_to_end(expression)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    @property
+    def stats(self):
+        """
+        Количество попаданий и промахов, доля попаданий и размер кэша.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0,
+                'size': len(self._items),
+            }
+
+
+_TREE_CACHE = SyntaxTreeCache()
+
+
+def get_tree_cache():
+    """
+    Общий для интерпретаторов кэш синтаксических деревьев.
+    """
+    return _TREE_CACHE
+
+
+def set_tree_cache(cache):
+    """
+    Замена общего кэша деревьев (None - отключение кэширования).
+    """
+    global _TREE_CACHE
+    _TREE_CACHE = cache
+
+
+_COMPILED_CACHE = SyntaxTreeCache()
+
+
+def get_compiled_cache():
+    """
+    Общий для интерпретаторов кэш скомпилированных формул.
+    """
+    return _COMPILED_CACHE
+
+
+def set_compiled_cache(cache):
+    """
+    Замена общего кэша скомпилированных формул (None - отключение кэширования).
+    """
+    global _COMPILED_CACHE
+    _COMPILED_CACHE = cache
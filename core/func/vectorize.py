@@ -0,0 +1,340 @@
+"""
+Векторное вычисление формул по строкам датафрейма (см. Interpreter.apply):
+формула, в которой используются только операторы и функции с аналогами
+для столбцов, вычисляется один раз над столбцами (pandas.Series)
+вместо вычисления для каждой строки.
+"""
+from datetime import datetime
+
+import numpy as np
+
+from ..dataframes.panda_builder import pd
+from .compiler import _type_checks
+from ._functions import FUNCTIONS_DICT, OPERATORS_DICT
+
+
+class NotVectorizable(Exception):
+    """
+    Формулу (либо её часть) нельзя вычислить над столбцами.
+    """
+    pass
+
+
+class Vectorizer:
+    """
+    Вычисление синтаксического дерева формулы над столбцами датафрейма.
+    В формуле row[столбец] - столбец датафрейма, idx - номера строк (с 0).
+
+    Результат совпадает с результатом вычисления по строкам: если значения
+    столбцов не подходят по типам для функций либо для части значений
+    вычисление по строкам привело бы к ошибке, выбрасывается NotVectorizable.
+    """
+    def __init__(self, functions_dict, operators_dict):
+        self._functions_dict = functions_dict
+        self._operators_dict = operators_dict
+
+    def evaluate(self, stree, df, context):
+        """
+        Результат формулы в виде списка значений для строк датафрейма.
+        """
+        value = self._evaluate(stree, df, context)
+        if isinstance(value, pd.Series):
+            return value.tolist()
+        return [value] * len(df)
+
+    def _evaluate(self, stree, df, context):
+        if stree is None:
+            return None
+        type_ = stree['type']
+        if type_ == 'symbol':
+            name = stree['value']
+            if name == 'idx':
+                return pd.Series(range(len(df)), index=df.index)
+            if name == 'row':
+                raise NotVectorizable(name)
+            return context.get(name)
+        if type_ == 'string':
+            return stree['value']
+        if type_ == 'number':
+            value = stree['value']
+            return float(value) if '.' in value else int(value)
+        if type_ == 'context':
+            return self._column(stree, df)
+        if type_ == 'operator':
+            sign = stree['value']
+            func_cls = self._operators_dict.get(sign, None)
+            vectorized = _OPERATORS.get(sign, None)
+            default_cls = OPERATORS_DICT.get(sign, None)
+            args = [stree['left'], stree['right']]
+        elif type_ == 'call':
+            _func = stree['function']
+            if _func is None:
+                return self._evaluate(stree['args'][0], df, context)
+            fname = _func['value']
+            func_cls = self._functions_dict.get(fname, None)
+            vectorized = _FUNCTIONS.get(fname, None)
+            default_cls = FUNCTIONS_DICT.get(fname, None)
+            args = stree['args']
+        else:
+            raise NotVectorizable(type_)
+
+        #  аналоги для столбцов есть только у стандартных функций
+        if func_cls is None or vectorized is None or func_cls is not default_cls:
+            raise NotVectorizable(type_)
+        values = [self._evaluate(arg, df, context) for arg in args]
+        return _call(func_cls, vectorized, values)
+
+    def _column(self, stree, df):
+        var_, args = stree['var'], stree['args']
+        if var_['value'] != 'row' or len(args) != 1 or args[0]['type'] != 'string':
+            raise NotVectorizable('context')
+        col = args[0]['value']
+        if col not in df.columns:
+            raise NotVectorizable(col)
+        return df[col]
+
+
+def _call(func_cls, vectorized, values):
+    """
+    Вычисление функции над значениями values (столбцами либо скалярами)
+    с проверками, соответствующими проверкам при вычислении по строкам.
+    """
+    func = func_cls()
+    if len(values) < func._mandatory:
+        raise NotVectorizable(func.get_name())
+    kinds = [_kind(v) for v in values]
+    for kind, types in zip(kinds, _type_checks(func, len(values))):
+        if types is not None and not issubclass(kind, types):
+            raise NotVectorizable(func.get_name())
+    if not any(isinstance(v, pd.Series) for v in values):
+        #  значения одинаковы для всех строк
+        return func._get_operation()(*values)
+    return vectorized(values, kinds)
+
+
+def _kind(value):
+    """
+    Тип значения либо значений столбца (как при вычислении по строкам).
+    """
+    if not isinstance(value, pd.Series):
+        return type(value)
+    dtype = value.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return bool
+    if pd.api.types.is_integer_dtype(dtype):
+        return int
+    if pd.api.types.is_float_dtype(dtype):
+        return float
+    if pd.api.types.is_datetime64_dtype(dtype):
+        return datetime
+    if dtype == object and pd.api.types.infer_dtype(value, skipna=False) == 'string':
+        return str
+    raise NotVectorizable(str(dtype))
+
+
+_NUMBERS = (int, float)
+
+
+def _numbers(kinds):
+    if not all(k in _NUMBERS for k in kinds):
+        raise NotVectorizable(kinds)
+
+
+def _comparable(kinds):
+    """
+    Значения сравниваются так же, как по строкам, только если они одной категории.
+    """
+    categories = {_category(k) for k in kinds}
+    if len(categories) != 1 or None in categories:
+        raise NotVectorizable(kinds)
+
+
+def _category(kind):
+    if kind in (int, float, bool):
+        return 'number'
+    if kind is str:
+        return 'str'
+    if issubclass(kind, datetime):
+        return 'datetime'
+    return None
+
+
+def _has_nan(value):
+    return isinstance(value, pd.Series) and bool(value.isna().any())
+
+
+def _add(values, kinds):
+    left, right = values
+    if left is None:
+        _numbers(kinds[1:])
+        return right
+    if all(k is str for k in kinds):
+        return left + right
+    _numbers(kinds)
+    return _int_checked(lambda a, b: a + b, left, right)
+
+
+def _subtract(values, kinds):
+    left, right = values
+    if left is None:
+        _numbers(kinds[1:])
+        return _int_checked(lambda a, b: a - b, 0, right)
+    _numbers(kinds)
+    return _int_checked(lambda a, b: a - b, left, right)
+
+
+def _multiply(values, kinds):
+    _numbers(kinds)
+    return _int_checked(lambda a, b: a * b, values[0], values[1])
+
+
+#  граница значений, до которой целочисленный результат точно не переполняет int64
+_INT64_SAFE = 2 ** 62
+
+
+def _int_checked(op, left, right):
+    """
+    Результат op(left, right). Целые числа Python не переполняются,
+    поэтому для целочисленного результата операция повторяется
+    над float64, и при значениях, близких к границам int64, выбрасывается
+    NotVectorizable.
+    """
+    result = op(left, right)
+    if isinstance(result, pd.Series) and pd.api.types.is_integer_dtype(result.dtype):
+        approx = op(_as_float(left), _as_float(right))
+        if bool((approx.abs() >= _INT64_SAFE).any()):
+            raise NotVectorizable('int64')
+    return result
+
+
+def _as_float(value):
+    if isinstance(value, pd.Series):
+        return value.astype('float64')
+    return float(value)
+
+
+def _divide(values, kinds):
+    _numbers(kinds)
+    left, right = values
+    #  деление на 0 при вычислении по строкам - ошибка
+    if (right == 0).any() if isinstance(right, pd.Series) else right == 0:
+        raise NotVectorizable('/')
+    return left / right
+
+
+def _comparison(op):
+    def compare(values, kinds):
+        _comparable(kinds)
+        return op(values[0], values[1])
+    return compare
+
+
+def _logical(op):
+    def logical(values, kinds):
+        if not all(k is bool for k in kinds) or any(_has_nan(v) for v in values):
+            raise NotVectorizable(kinds)
+        return op(values[0], values[1])
+    return logical
+
+
+def _if(values, kinds):
+    condition, when_true, when_false = values[:3]
+    if len(values) > 3 or not isinstance(condition, pd.Series):
+        raise NotVectorizable('if')
+    #  при разных типах ветвей (например, int и float) столбец
+    #  привёл бы значения к одному типу, а по строкам они сохраняются
+    if kinds[1] is not kinds[2] or _category(kinds[1]) is None:
+        raise NotVectorizable('if')
+    mask = condition == True
+    index = condition.index
+    if not isinstance(when_true, pd.Series):
+        when_true = pd.Series([when_true] * len(index), index=index)
+    return when_true.where(mask, when_false)
+
+
+def _series_method(method, check=None):
+    """
+    Функция одного аргумента, выполняемая методом method столбца.
+    """
+    def run(values, kinds):
+        if len(values) != 1:
+            raise NotVectorizable(method)
+        value = values[0]
+        if check is not None and not check(value):
+            raise NotVectorizable(method)
+        return method(value)
+    return run
+
+
+def _no_nan(value):
+    return not _has_nan(value)
+
+
+def _no_int64_min(value):
+    #  abs наименьшего значения int64 не представим в int64
+    return _kind(value) is not int or not (value == np.iinfo('int64').min).any()
+
+
+def _is_number_column(value):
+    return _kind(value) in _NUMBERS
+
+
+def _str_method(name):
+    def run(values, kinds):
+        column, arg = values
+        if not isinstance(column, pd.Series) or isinstance(arg, pd.Series):
+            raise NotVectorizable(name)
+        if name == 'contains':
+            return column.str.contains(arg, regex=False)
+        return getattr(column.str, name)(arg)
+    return run
+
+
+def _concat(values, kinds):
+    result = values[0]
+    for value in values[1:]:
+        result = result + value
+    return result
+
+
+_OPERATORS = {
+    '+': _add,
+    '-': _subtract,
+    '*': _multiply,
+    '/': _divide,
+    '>': _comparison(lambda a, b: a > b),
+    '>=': _comparison(lambda a, b: a >= b),
+    '<': _comparison(lambda a, b: a < b),
+    '<=': _comparison(lambda a, b: a <= b),
+    '==': _comparison(lambda a, b: a == b),
+    '!=': _comparison(lambda a, b: a != b),
+    '&': _logical(lambda a, b: a & b),
+    '|': _logical(lambda a, b: a | b),
+}
+
+
+_FUNCTIONS = {
+    'if': _if,
+    'eq': _OPERATORS['=='],
+    'neq': _OPERATORS['!='],
+    'gt': _OPERATORS['>'],
+    'gte': _OPERATORS['>='],
+    'lt': _OPERATORS['<'],
+    'lte': _OPERATORS['<='],
+    'and': _OPERATORS['&'],
+    'or': _OPERATORS['|'],
+    'abs': _series_method(lambda s: s.abs(), lambda s: _is_number_column(s) and _no_int64_min(s)),
+    'floor': _series_method(lambda s: s.floordiv(1).astype('int64'), _no_nan),
+    'ceil': _series_method(lambda s: (-(-s).floordiv(1)).astype('int64'), _no_nan),
+    'sqrt': _series_method(np.sqrt, lambda s: not (s < 0).any()),
+    'lower': _series_method(lambda s: s.str.lower()),
+    'upper': _series_method(lambda s: s.str.upper()),
+    'len': _series_method(lambda s: s.str.len()),
+    'concat': _concat,
+    'startswith': _str_method('startswith'),
+    'endswith': _str_method('endswith'),
+    'contains': _str_method('contains'),
+    'to_str': _series_method(lambda s: s.astype(str), lambda s: _kind(s) is not float),
+    'to_float': _series_method(lambda s: s.astype(float), _is_number_column),
+    'to_int': _series_method(lambda s: s.astype('int64'), lambda s: _is_number_column(s) and _no_nan(s)),
+}
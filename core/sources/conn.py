@@ -1,26 +1,39 @@
 import json
+import copy
 import redis
+import asyncio
 import sqlite3
 import psycopg2
 import pyodbc
 import requests
 import mysql.connector
 from abc import ABC, abstractmethod
-from random import choice
+from functools import partial
+from uuid import uuid4
 
 from .file_sources import FILE_SOURCES
+from .pool import get_pool
+from .metadata import get_metadata_cache
+from .plan_cache import get_plan_cache
+from .response_cache import get_response_cache, response_cache_key
+from .trace import TraceSpan
+from .exceptions import UnknownPaginationType
 from .statements import (
     _TEST_QUERIES,
     _TABLES_QUERIES,
     _COLUMNS_QUERIES,
     _FIELDS_QUERIES,
     _CONSTRAINTS_QUERIES,
+    _EXPLAIN_QUERIES,
 )
 
 
 _DEFAULT_MSSQL_DRIVER = '{ODBC Driver 18 for SQL Server}'
 _FREE_TDS = '{FreeTDS}'
 
+#  количество строк в одной части результата при потоковом получении данных
+DEFAULT_BATCH_SIZE = 10000
+
 
 class DataQueryResult:
     def __init__(self, data, columns=[]):
@@ -28,6 +41,28 @@ class DataQueryResult:
         self.columns = columns
 
 
+class ColumnarQueryResult(DataQueryResult):
+    """
+    Результат запроса в виде строк-кортежей и списка столбцов.
+    Список словарей (data) строится только при первом обращении.
+    """
+
+    def __init__(self, rows, columns=[]):
+        self.rows = rows
+        self.columns = columns
+        self._data = None
+
+    @property
+    def data(self):
+        if self._data is None:
+            columns = self.columns
+            self._data = [dict(zip(columns, row)) for row in self.rows]
+        return self._data
+
+    def __len__(self):
+        return len(self.rows)
+
+
 class DataSource(ABC):
     """
     Абстрактный источник.
@@ -57,6 +92,16 @@ class DataSource(ABC):
         """
         pass
 
+    def fork(self):
+        """
+        Копия источника без открытого соединения.
+        """
+        source = copy.copy(self)
+        source.connection = None
+        if hasattr(source, '_aconnection'):
+            source._aconnection = None
+        return source
+
     @property
     def _test_query(self):
         return _TEST_QUERIES.get(self.source_type, None)
@@ -85,6 +130,13 @@ class DataSource(ABC):
     def source_type(self):
         return self.__class__.source_type
 
+    def iter_data(self, batch_size=None, **kwargs):
+        """
+        Получение данных частями (экземплярами DataQueryResult).
+        По умолчанию данные возвращаются одной частью.
+        """
+        yield self.get_data(**kwargs)
+
     def _parse_conn_str(self):
         return _parse_conn_str(self._conn_str)
 
@@ -95,6 +147,24 @@ class DataSource(ABC):
     def __exit__(self, exc_type, exc_value, exc_traceback):
         self.close()
 
+    #  асинхронный интерфейс: по умолчанию блокирующие методы
+    #  выполняются в пуле потоков цикла событий
+    async def aopen(self):
+        await _run_blocking(self.open)
+
+    async def aget_data(self, **kwargs):
+        return await _run_blocking(self.get_data, **kwargs)
+
+    async def aclose(self):
+        await _run_blocking(self.close)
+
+    async def __aenter__(self):
+        await self.aopen()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, exc_traceback):
+        await self.aclose()
+
 
 class DatabaseSource(DataSource):
     _is_sql = True
@@ -109,6 +179,138 @@ class DatabaseSource(DataSource):
     def enquote(self):
         return self.__class__.enquote
 
+    def _configure_pool(self, pooled=True, pool_size=None, pool_max_idle=None,
+        pool_check_interval=None, pool_timeout=None, **kwargs):
+        """
+        Настройка использования пула соединений.
+        При pooled=False соединения создаются и закрываются при каждом открытии/закрытии
+        источника.
+        """
+        self._pooled = pooled
+        self._pool_options = {
+            'max_size': pool_size,
+            'max_idle': pool_max_idle,
+            'check_interval': pool_check_interval,
+            'timeout': pool_timeout,
+        }
+
+    def _configure_metadata_cache(self, metadata_cache=True, **kwargs):
+        """
+        Настройка кэширования метаданных (списков полей таблиц и структуры базы).
+        metadata_cache - True (общий для процесса кэш), False
+        либо экземпляр MetadataCache.
+        """
+        self._metadata_cache = metadata_cache
+
+    @property
+    def metadata_cache(self):
+        """
+        Кэш метаданных источника (None, если кэширование отключено).
+        """
+        cache = getattr(self, '_metadata_cache', False)
+        if cache is True:
+            return get_metadata_cache()
+        return cache or None
+
+    def invalidate_metadata(self, table_name=None):
+        """
+        Удаление метаданных источника (либо таблицы table_name) из кэша.
+        """
+        cache = self.metadata_cache
+        if cache is not None:
+            cache.invalidate(self.source_key, table_name)
+        #  сформированные ранее запросы могут ссылаться на изменённые таблицы
+        plan_cache = get_plan_cache()
+        if plan_cache is not None:
+            plan_cache.invalidate(self.source_key)
+
+    #  атрибуты с параметрами подключения
+    _connection_attrs = ('_conn_str', '_host', '_port', '_dbname', '_user', '_password')
+
+    def _connection_params(self):
+        """
+        Параметры подключения, по которым определяется пул соединений.
+        """
+        return tuple(getattr(self, attr) for attr in self._connection_attrs)
+
+    def _connector(self):
+        """
+        Функция создания соединения для пула. Она не ссылается на источник
+        (пул может существовать дольше него), а использует только параметры подключения.
+        """
+        return _connector(type(self), {
+            attr: getattr(self, attr) for attr in self._connection_attrs
+        })
+
+    @property
+    def source_key(self):
+        """
+        Строка, идентифицирующая базу данных источника (без пароля).
+        """
+        if self._conn_str:
+            conn_dict = self._parse_conn_str()
+            host, port = conn_dict.get('host', ''), conn_dict.get('port', self._port)
+            db, user = conn_dict.get('database', ''), conn_dict.get('user', '')
+        else:
+            host, port = self._host, self._port
+            db, user = self._dbname, self._user
+        return f'{self.source_type}://{user}@{host}:{port}/{db}'
+
+    @property
+    def pool(self):
+        """
+        Пул соединений источника (None, если пул не используется).
+        """
+        if not getattr(self, '_pooled', False):
+            return None
+        key = (self.source_type, ) + self._connection_params()
+        return get_pool(
+            key,
+            self._connector(),
+            test_query=self._test_query,
+            label=self.source_key,
+            **self._pool_options,
+        )
+
+    def open(self):
+        if self.connection is not None:
+            self.close()
+        pool = self.pool
+        if pool is not None:
+            self.connection = pool.acquire()
+        else:
+            self.connection = self.get_connection()
+
+    def close(self):
+        connection, self.connection = self.connection, None
+        if connection is None:
+            return
+        try:
+            self._reset_connection(connection)
+        except:
+            broken = True
+        else:
+            broken = False
+
+        pool = self.pool
+        if pool is not None:
+            pool.release(connection, discard=broken)
+        else:
+            connection.close()
+
+    def _reset_connection(self, connection):
+        """
+        Завершение транзакции перед возвратом соединения в пул либо закрытием.
+        """
+        connection.rollback()
+
+    def __del__(self):
+        #  возвращаем соединение в пул, если источник не был закрыт
+        try:
+            self.close()
+        except:
+            pass
+
     @abstractmethod
     def get_tables(self):
         """
@@ -117,15 +319,161 @@ class DatabaseSource(DataSource):
         """
         pass
 
-    @abstractmethod
     def get_fields(self, table_name, **kwargs):
         """
         Получение списка полей в таблице.
 
         table_name - имя таблицы из бд.
         """
+        cache = self.metadata_cache
+        if cache is None:
+            return self._fetch_fields(table_name)
+        fields = cache.get_fields(self.source_key, table_name)
+        if fields is None:
+            fields = self._fetch_fields(table_name)
+            cache.set_fields(self.source_key, table_name, fields)
+        return fields
+
+    @abstractmethod
+    def _fetch_fields(self, table_name):
+        """
+        Получение списка полей в таблице из бд.
+        """
         pass
 
+    def get_data(self, query=None, span=None, **kwargs):
+        """
+        Получение результата запроса.
+
+        query - объект запроса SelectQuery,
+        span - трассировка выполнения запроса (TraceSpan).
+        """
+        span = span or TraceSpan()
+        columns = self._result_columns(query)
+        cursor = self.connection.cursor()
+        try:
+            with span.timer('execute'):
+                self._execute(cursor, query)
+            with span.timer('fetch'):
+                rows = cursor.fetchall()
+        finally:
+            self._cleanup(cursor, query)
+            cursor.close()
+        span.add_rows(rows)
+        self._trace_plan(span, query)
+        return self._make_result(rows, columns)
+
+    def iter_data(self, query=None, batch_size=None, span=None, **kwargs):
+        """
+        Потоковое получение результата запроса частями по batch_size строк.
+        Если запрос не вернул строк, то возвращается одна пустая часть.
+
+        query - объект запроса SelectQuery,
+        batch_size - количество строк в части,
+        span - трассировка выполнения запроса (TraceSpan).
+        """
+        span = span or TraceSpan()
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        columns = self._result_columns(query)
+        cursor = self._stream_cursor(batch_size)
+        try:
+            with span.timer('execute'):
+                self._execute(cursor, query)
+            is_empty = True
+            while True:
+                with span.timer('fetch'):
+                    rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                is_empty = False
+                span.add_rows(rows)
+                yield self._make_result(rows, columns)
+            if is_empty:
+                yield self._make_result([], columns)
+        finally:
+            self._cleanup(cursor, query)
+            self._close_stream_cursor(cursor)
+        self._trace_plan(span, query)
+
+    def explain(self, query):
+        """
+        План выполнения запроса в виде текста
+        либо None, если получение плана для источника не поддерживается.
+        """
+        statement = _EXPLAIN_QUERIES.get(self.source_type, None)
+        if statement is None:
+            return None
+        q, params = query.str_and_params()
+        cursor = self.connection.cursor()
+        try:
+            self._prepare(cursor, query)
+            q = statement.format(q)
+            if params:
+                cursor.execute(q, params)
+            else:
+                cursor.execute(q)
+            rows = cursor.fetchall()
+        finally:
+            self._cleanup(cursor, query)
+            cursor.close()
+        return '\n'.join(' '.join(str(v) for v in row) for row in rows)
+
+    def _trace_plan(self, span, query):
+        if not span.needs_plan:
+            return
+        try:
+            span.plan = self.explain(query)
+        except Exception:
+            #  план не обязателен - ошибка его получения не влияет на результат
+            pass
+
+    def _execute(self, cursor, query):
+        self._prepare(cursor, query)
+        q, params = query.str_and_params()
+        if params:
+            cursor.execute(q, params)
+        else:
+            cursor.execute(q)
+
+    def _prepare(self, cursor, query):
+        """
+        Выполнение выражений, подготавливающих запрос (напр., заполнение временных таблиц).
+        """
+        for statement, rows in getattr(query, 'prepare', []):
+            if rows is None:
+                cursor.execute(statement)
+            else:
+                self._executemany(cursor, statement, rows)
+
+    def _executemany(self, cursor, statement, rows):
+        cursor.executemany(statement, rows)
+
+    def _cleanup(self, cursor, query):
+        """
+        Выполнение выражений, завершающих запрос (напр., удаление временных таблиц).
+        """
+        for statement in getattr(query, 'cleanup', []):
+            try:
+                cursor.execute(statement)
+            except Exception:
+                #  ошибка удаления не должна скрывать результат либо ошибку запроса
+                pass
+
+    def _stream_cursor(self, batch_size):
+        """
+        Курсор для потокового получения данных.
+        """
+        return self.connection.cursor()
+
+    def _close_stream_cursor(self, cursor):
+        cursor.close()
+
+    def _result_columns(self, query):
+        return [f.replace('"', "") for f in query.requested]
+
+    def _make_result(self, rows, columns):
+        return ColumnarQueryResult(rows, columns)
+
     def get_table(self, table_name):
         """
         Построение таблицы.
@@ -144,20 +492,47 @@ class DatabaseSource(DataSource):
         from .query import Table
 
         assert isinstance(tables_list, list), 'tables_list должен быть списком'
-        tables = {}
-        fields = []
+        tables, missing = {}, []
+        cache = self.metadata_cache
+
+        for table_name in tables_list:
+            fields = None
+            if cache is not None:
+                fields = cache.get_fields(self.source_key, table_name)
+            if fields is None:
+                missing.append(table_name)
+            else:
+                tables[table_name] = fields
 
-        if tables_list:
-            _tables_list = ""
-            for table_name in tables_list:
-                _tables_list += f"'{table_name}', "
-            _tables_list = _tables_list.rstrip(', ')
+        if missing:
+            fetched = self._fetch_fields_multiple(missing)
+            if cache is not None:
+                for table_name, fields in fetched.items():
+                    cache.set_fields(self.source_key, table_name, fields)
+            tables.update(fetched)
 
-            with self.connection.cursor() as cursor:
-                q = "SELECT column_name, data_type, table_name FROM information_schema.columns "
-                q += "WHERE table_name in (%s) ORDER BY table_name" % _tables_list
-                cursor.execute(q)
-                fields = cursor.fetchall()
+        tables = {
+            table_name: Table(table_name, table_fields, enquote=self.enquote)
+            for table_name, table_fields in tables.items()
+        }
+
+        return tables
+
+    def _fetch_fields_multiple(self, tables_list):
+        """
+        Получение списков полей нескольких таблиц из бд одним запросом.
+        """
+        tables = {}
+        _tables_list = ""
+        for table_name in tables_list:
+            _tables_list += f"'{table_name}', "
+        _tables_list = _tables_list.rstrip(', ')
+
+        with self.connection.cursor() as cursor:
+            q = "SELECT column_name, data_type, table_name FROM information_schema.columns "
+            q += "WHERE table_name in (%s) ORDER BY table_name" % _tables_list
+            cursor.execute(q)
+            fields = cursor.fetchall()
 
         for field_name, data_type, table_name in fields:
             if not table_name in tables:
@@ -165,14 +540,22 @@ class DatabaseSource(DataSource):
             table = tables[table_name]
             table.append(field_name)
 
-        tables = {
-            table_name: Table(table_name, table_fields, enquote=self.enquote)
-            for table_name, table_fields in tables.items()
-        }
-
         return tables
 
     def get_db_structure(self):
+        """
+        Получение структуры базы данных (таблиц, их полей и связей).
+        """
+        cache = self.metadata_cache
+        if cache is None:
+            return self._fetch_db_structure()
+        structure = cache.get_structure(self.source_key)
+        if structure is None:
+            structure = self._fetch_db_structure()
+            cache.set_structure(self.source_key, structure)
+        return structure
+
+    def _fetch_db_structure(self):
         with self.connection.cursor() as cursor:
             cursor.execute(self._columns_query, (self._dbname, ))
             columns_res = cursor.fetchall()
@@ -200,6 +583,8 @@ class PostgresSource(DatabaseSource):
         self._password = password
         self._conn_str = conn_str
         self.connection = None
+        self._configure_pool(**kwargs)
+        self._configure_metadata_cache(**kwargs)
 
     def get_tables(self):
         tables = []
@@ -226,17 +611,14 @@ class PostgresSource(DatabaseSource):
         )
         return conn
 
-    def open(self):
-        print('open')
-        if self.connection is not None:
-            self.connection.close()
-        self.connection = self.get_connection()
+    def _reset_connection(self, connection):
+        connection.commit()
 
-    def close(self):
-        print('close')
-        self.connection.commit()
-        self.connection.close()
-        self.connection = None
+    def _stream_cursor(self, batch_size):
+        #  именованный (серверный) курсор - строки передаются частями по мере чтения
+        cursor = self.connection.cursor(name=f'noofa_{uuid4().hex}')
+        cursor.itersize = batch_size
+        return cursor
 
     def test(self):
         try:
@@ -246,27 +628,7 @@ class PostgresSource(DatabaseSource):
             return False
         return True
 
-    def get_data(self, query=None, **kwargs):
-        q, params = query.str_and_params()
-        fields = query.requested
-        data = []
-
-        with self.connection.cursor() as cursor:
-            if params:
-                cursor.execute(q, params)
-            else:
-                cursor.execute(q)
-
-            _data = cursor.fetchall()
-            desc = [f.replace('"', "") for f in fields]
-            for d in _data:
-                datapiece = {}
-                for n, i in enumerate(d):
-                    datapiece[desc[n]] = i
-                data.append(datapiece)
-        return DataQueryResult(data, desc)
-
-    def get_fields(self, table_name):
+    def _fetch_fields(self, table_name):
         fields = []
         with self.connection.cursor() as cursor:
             q = self._fields_query
@@ -292,6 +654,8 @@ class MySqlSource(DatabaseSource):
         self._password = password
         self._conn_str = conn_str
         self.connection = None
+        self._configure_pool(**kwargs)
+        self._configure_metadata_cache(**kwargs)
 
     def get_tables(self):
         tables = []
@@ -317,15 +681,6 @@ class MySqlSource(DatabaseSource):
         )
         return conn
 
-    def open(self):
-        if self.connection is not None:
-            self.connection.close()
-        self.connection = self.get_connection()
-
-    def close(self):
-        self.connection.close()
-        self.connection = None
-
     def test(self):
         try:
             with self.connection.cursor() as cursor:
@@ -334,26 +689,19 @@ class MySqlSource(DatabaseSource):
             return False
         return True
 
-    def get_data(self, query=None, **kwargs):
-        q, params = query.str_and_params()
-        fields = query.requested
-        data = []
-        with self.connection.cursor() as cursor:
-            if params:
-                cursor.execute(q, params)
-            else:
-                cursor.execute(q)
+    def _stream_cursor(self, batch_size):
+        #  небуферизованный курсор - строки читаются с сервера по мере получения
+        return self.connection.cursor(buffered=False)
 
-            _data = cursor.fetchall()
-            desc = fields
-            for d in _data:
-                datapiece = {}
-                for n, i in enumerate(d):
-                    datapiece[desc[n]] = i
-                data.append(datapiece)
-        return DataQueryResult(data, desc)
+    def _close_stream_cursor(self, cursor):
+        try:
+            cursor.close()
+        except:
+            #  при досрочном прекращении чтения нужно дочитать оставшиеся строки
+            self.connection.consume_results()
+            cursor.close()
 
-    def get_fields(self, table_name):
+    def _fetch_fields(self, table_name):
         fields = []
         with self.connection.cursor() as cursor:
             q = self._fields_query
@@ -383,6 +731,19 @@ class MSSqlSource(DatabaseSource):
         self._password = password
         self._conn_str = conn_str
         self.connection = None
+        self._configure_pool(**kwargs)
+        self._configure_metadata_cache(**kwargs)
+
+    _connection_attrs = DatabaseSource._connection_attrs + ('_ad', '_driver')
+
+    def _make_result(self, rows, columns):
+        #  строки pyodbc не являются кортежами
+        return ColumnarQueryResult([tuple(r) for r in rows], columns)
+
+    def _executemany(self, cursor, statement, rows):
+        #  все строки передаются на сервер одним пакетом
+        cursor.fast_executemany = True
+        cursor.executemany(statement, rows)
 
     def get_tables(self):
         tables = []
@@ -398,15 +759,6 @@ class MSSqlSource(DatabaseSource):
         conn = pyodbc.connect(conn_str, timeout=3)
         return conn
 
-    def open(self):
-        if self.connection is not None:
-            self.connection.close()
-        self.connection = self.get_connection()
-
-    def close(self):
-        self.connection.close()
-        self.connection = None
-
     def test(self):
         try:
             with self.connection.cursor() as cursor:
@@ -415,27 +767,7 @@ class MSSqlSource(DatabaseSource):
             return False
         return True
 
-    def get_data(self, query=None, **kwargs):
-        q, params = query.str_and_params()
-        fields = query.requested
-        data = []
-
-        with self.connection.cursor() as cursor:
-            if params:
-                cursor.execute(q, params)
-            else:
-                cursor.execute(q)
-
-            _data = cursor.fetchall()
-            desc = [f.replace('"', "") for f in fields]
-            for d in _data:
-                datapiece = {}
-                for n, i in enumerate(d):
-                    datapiece[desc[n]] = i
-                data.append(datapiece)
-        return DataQueryResult(data, desc)
-
-    def get_fields(self, table_name):
+    def _fetch_fields(self, table_name):
         fields = []
         with self.connection.cursor() as cursor:
             q = self._fields_query
@@ -464,7 +796,7 @@ class MSSqlSource(DatabaseSource):
 
         return conn_str
 
-    def get_db_structure(self):
+    def _fetch_db_structure(self):
         with self.connection.cursor() as cursor:
             cursor.execute(self._columns_query)
             columns_res = cursor.fetchall()
@@ -489,6 +821,17 @@ class SqliteSource(DatabaseSource):
         self._db_file = kwargs.get('dbname')
         self._conn_str = kwargs.get('conn_str', None)
         self.connection = None
+        self._configure_pool(**kwargs)
+        self._configure_metadata_cache(**kwargs)
+
+    _connection_attrs = ('_conn_str', '_db_file')
+
+    @property
+    def source_key(self):
+        db_file = self._db_file
+        if self._conn_str:
+            db_file = self._parse_conn_str()['database']
+        return f'{self.source_type}://{db_file}'
 
     def get_tables(self):
         tables = []
@@ -500,21 +843,15 @@ class SqliteSource(DatabaseSource):
         return tables
 
     def get_connection(self, **kwargs):
+        #  соединение из пула может использоваться в разных потоках
+        #  (но не одновременно), поэтому проверка потока отключена
+        db_file = self._db_file
         if self._conn_str:
             conn_dict = self._parse_conn_str()
-            return sqlite3.connect(conn_dict['database'])
-        conn = sqlite3.connect(self._db_file)
+            db_file = conn_dict['database']
+        conn = sqlite3.connect(db_file, check_same_thread=False)
         return conn
 
-    def open(self):
-        if self.connection is not None:
-            self.connection.close()
-        self.connection = self.get_connection()
-
-    def close(self):
-        self.connection.close()
-        self.connection = None
-
     def test(self):
         try:
             cursor = self.connection.cursor()
@@ -524,28 +861,7 @@ class SqliteSource(DatabaseSource):
             return False
         return True
 
-    def get_data(self, **kwargs):
-        query = kwargs['query']
-        q, params = query.str_and_params()
-        fields = query.requested
-        data = []
-
-        cursor = self.connection.cursor()
-        if params:
-            cursor.execute(q, params)
-        else:
-            cursor.execute(q)
-
-        _data = cursor.fetchall()
-        desc = [f.replace('"', "") for f in fields]
-        for d in _data:
-            datapiece = {}
-            for n, i in enumerate(d):
-                datapiece[desc[n]] = i
-            data.append(datapiece)
-        return DataQueryResult(data, desc)
-
-    def get_fields(self, table_name, **kwargs):
+    def _fetch_fields(self, table_name):
         fields = []
         cursor = self.connection.cursor()
         q = self._fields_query % table_name
@@ -573,7 +889,7 @@ class RedisSource(DataSource):
     source_type = 'redis'
 
     def __init__(self, host='localhost', port=6379, db=0, user=None,
-        password=None, source='', conn_str=None, **kwargs):
+        password=None, source='', conn_str=None, json_decoder='json', **kwargs):
         self._host = host
         self._port = port
         self._db = db
@@ -582,13 +898,17 @@ class RedisSource(DataSource):
         self.source = source
         self._conn_str = conn_str
         self.connection = None
+        self._aconnection = None  # соединение для асинхронного интерфейса
 
-    def get_connection(self):
+        #  декодер значений хэша: json либо orjson (если установлен)
+        self._json_loads = _get_json_loads(json_decoder)
+
+    def get_connection(self, redis_cls=redis.Redis):
         if self._conn_str:
             conn_dict = self._parse_conn_str()
             conn_dict['db'] = conn_dict.pop('database')
-            return redis.Redis(**conn_dict)
-        conn = redis.Redis(
+            return redis_cls(**conn_dict)
+        conn = redis_cls(
             host=self._host,
             port=self._port,
             db=self._db,
@@ -598,6 +918,10 @@ class RedisSource(DataSource):
         )
         return conn
 
+    def get_async_connection(self):
+        from redis import asyncio as aioredis
+        return self.get_connection(redis_cls=aioredis.Redis)
+
     def open(self):
         if self.connection is not None:
             self.connection.close()
@@ -615,16 +939,62 @@ class RedisSource(DataSource):
         return result
 
     def get_data(self):
-        data, columns = [], []
         with self.connection as conn:
             _data = conn.hgetall(self.source)
+        return self._make_result(_data)
 
-            for k, d in _data.items():
-                data.append(json.loads(d))
-            if data:
-                columns = [key for key in data[0].keys()]
+    def iter_data(self, batch_size=None, **kwargs):
+        """
+        Потоковое получение содержимого хэша с помощью HSCAN
+        частями примерно по batch_size записей.
+        Если хэш пуст, то возвращается одна пустая часть.
+        При изменении хэша во время чтения HSCAN может вернуть
+        одну и ту же запись повторно.
+        """
+        batch_size = batch_size or DEFAULT_BATCH_SIZE
+        is_empty = True
+        with self.connection as conn:
+            batch = {}
+            for key, value in conn.hscan_iter(self.source, count=batch_size):
+                batch[key] = value
+                if len(batch) >= batch_size:
+                    is_empty = False
+                    yield self._make_result(batch)
+                    batch = {}
+            if batch or is_empty:
+                yield self._make_result(batch)
+
+    async def aopen(self):
+        if self._aconnection is not None:
+            await self.aclose()
+        self._aconnection = self.get_async_connection()
+
+    async def aget_data(self, **kwargs):
+        _data = await self._aconnection.hgetall(self.source)
+        return self._make_result(_data)
+
+    async def aclose(self):
+        conn, self._aconnection = self._aconnection, None
+        if conn is not None:
+            close = getattr(conn, 'aclose', None) or conn.close
+            await close()
+
+    def _make_result(self, hash_data):
+        columns = []
+        data = self._decode(hash_data.values())
+        if data:
+            columns = [key for key in data[0].keys()]
         return DataQueryResult(data, columns)
 
+    def _decode(self, values):
+        """
+        Декодирование значений хэша. Каждое значение декодируется
+        отдельно, т.к. при объединении значений в один json-массив
+        значение вида '1,2' дало бы две записи вместо ошибки.
+        """
+        loads = self._json_loads
+        return [loads(v) for v in values]
+
     def get_tables(self):
         tables = []
         try:
@@ -638,28 +1008,62 @@ class RedisSource(DataSource):
     def get_fields(self):
         fields = []
         with self.connection as conn:
-            if conn.hlen(self.source):
-                rand_key = choice(conn.hkeys(self.source))
+            rand_key = self._random_key(conn)
+            if rand_key is not None:
                 rand_value = conn.hget(self.source, rand_key)
-                rand_value = json.loads(rand_value)
+                rand_value = self._json_loads(rand_value)
                 fields = list(rand_value.keys())
         return fields
 
+    def _random_key(self, conn):
+        """
+        Случайный ключ хэша (HRANDFIELD, redis >= 6.2);
+        для более ранних версий - первый ключ, полученный HSCAN.
+        """
+        try:
+            keys = conn.hrandfield(self.source, count=1)
+            return next(iter(keys or []), None)
+        except redis.ResponseError:
+            _, keys = conn.hscan(self.source, count=10)
+            return next(iter(keys), None)
+
 
 class JsonSource(DataSource):
     """
     Источник из json-ответа.
     Использование среди прочих источников под вопросом.
+
+    items_path - путь к списку записей в ответе через точку, например, 'data.items'
+    (если не задан, то записями считается сам ответ),
+    pagination - параметры постраничного получения данных (см. PAGINATION_DEFAULTS),
+    response_cache - кэш ответов для условных запросов: True (общий для процесса кэш),
+    False либо экземпляр ResponseCache.
     """
 
     source_type = 'json'
 
-    def __init__(self, url, **kwargs):
+    def __init__(self, url, items_path=None, pagination=None, response_cache=False, **kwargs):
         self._url = url
         self._params = kwargs.get('params', {})
         self._headers = kwargs.get('headers', {})
         self._auth = kwargs.get('auth', ())
+        self._items_path = items_path
+        self._pagination = None
+        if pagination:
+            type_ = pagination.get('type', 'page')
+            if type_ not in PAGINATION_DEFAULTS:
+                raise UnknownPaginationType(type_)
+            self._pagination = {**PAGINATION_DEFAULTS[type_], **pagination, 'type': type_}
+        self._response_cache = response_cache
         self.connection = None
+        self._aconnection = None  # сессия aiohttp для асинхронного интерфейса
+
+    @property
+    def response_cache(self):
+        cache = self._response_cache
+        if cache is True:
+            return get_response_cache()
+        return cache or None
 
     def get_connection(self, **kwargs):
         conn = requests.Session()
@@ -674,22 +1078,180 @@ class JsonSource(DataSource):
         self.connection.close()
         self.connection = None
 
-    def get_data(self, **kwargs):
-        data = {}
-        with self.connection as conn:
-            resp = conn.get(
+    def test(self):
+        try:
+            resp = self.connection.get(
                 self._url,
                 headers=self._headers,
                 auth=self._auth,
-                params=self._params
+                params=self._params,
+                timeout=3,
             )
-            data = resp.json()
+        except:
+            return False
+        return resp.ok
+
+    def get_data(self, **kwargs):
+        if self._pagination is not None:
+            data = []
+            for items in self._iter_pages():
+                data.extend(items)
+            return self._make_result(data)
+        data = {}
+        with self.connection as conn:
+            data, _ = self._request(conn, self._url, self._params)
+        if self._items_path is not None:
+            return self._make_result(self._items(data))
         return DataQueryResult(data)
 
+    def iter_data(self, batch_size=None, **kwargs):
+        """
+        Получение данных частями: при постраничном получении
+        каждая страница возвращается отдельной частью.
+        """
+        if self._pagination is None:
+            yield self.get_data(**kwargs)
+            return
+        is_empty = True
+        for items in self._iter_pages():
+            if items or is_empty:
+                is_empty = False
+                yield self._make_result(items)
+
+    def _iter_pages(self):
+        """
+        Получение списков записей по страницам.
+        """
+        p = self._pagination
+        type_, size, max_pages = p['type'], p['size'], p['max_pages']
+        url, params = self._url, dict(self._params)
+        position = p['start']
+        n = 0
+        with self.connection as conn:
+            while True:
+                if type_ in ('page', 'offset'):
+                    params[p['param']] = position
+                    if size:
+                        params[p['size_param']] = size
+                body, resp = self._request(conn, url, params)
+                items = self._items(body)
+                yield items
+                n += 1
+                if not items or (max_pages and n >= max_pages):
+                    break
+                if type_ in ('page', 'offset'):
+                    if size and len(items) < size:
+                        break
+                    position += 1 if type_ == 'page' else len(items)
+                elif type_ == 'cursor':
+                    cursor = _get_path(body, p['cursor_path'])
+                    if not cursor:
+                        break
+                    params[p['param']] = cursor
+                elif type_ == 'link':
+                    next_link = resp.links.get('next', None)
+                    if next_link is None:
+                        break
+                    url, params = next_link['url'], None
+
+    def _request(self, conn, url, params):
+        """
+        GET-запрос. При заданном кэше ответов запрос выполняется условным
+        (If-None-Match/If-Modified-Since), и при ответе 304 используются
+        ранее полученные данные.
+        Возвращаются данные ответа и сам ответ.
+        """
+        cache = self.response_cache
+        headers, cached, key = dict(self._headers), None, None
+        if cache is not None:
+            key = response_cache_key(url, params, self._headers, self._auth)
+            cached = cache.get(key)
+            if cached is not None:
+                if cached['etag']:
+                    headers['If-None-Match'] = cached['etag']
+                if cached['last_modified']:
+                    headers['If-Modified-Since'] = cached['last_modified']
+
+        resp = conn.get(url, headers=headers, auth=self._auth, params=params)
+        if cached is not None and resp.status_code == 304:
+            return cached['data'], resp
+
+        data = resp.json()
+        etag, last_modified = resp.headers.get('ETag'), resp.headers.get('Last-Modified')
+        if cache is not None and resp.ok and (etag or last_modified):
+            cache.set(key, {'etag': etag, 'last_modified': last_modified, 'data': data})
+        return data, resp
+
+    def _items(self, body):
+        """
+        Список записей из ответа.
+        """
+        items = _get_path(body, self._items_path) if self._items_path else body
+        if items is None:
+            return []
+        if isinstance(items, dict):
+            return [items]
+        return items
+
+    def _make_result(self, items):
+        columns = []
+        if items and isinstance(items[0], dict):
+            columns = [key for key in items[0].keys()]
+        return DataQueryResult(items, columns)
+
+    #  асинхронный интерфейс использует aiohttp, если он установлен,
+    #  иначе - блокирующие методы в пуле потоков
+    async def aopen(self):
+        aiohttp = _import_aiohttp()
+        if aiohttp is None:
+            return await super().aopen()
+        if self._aconnection is not None:
+            await self.aclose()
+        self._aconnection = aiohttp.ClientSession()
+
+    async def aget_data(self, **kwargs):
+        #  постраничное получение и кэш ответов - только в блокирующем режиме
+        if self._aconnection is None or self._pagination or self.response_cache:
+            return await super().aget_data(**kwargs)
+        aiohttp = _import_aiohttp()
+        auth = aiohttp.BasicAuth(*self._auth) if self._auth else None
+        async with self._aconnection.get(
+            self._url,
+            headers=self._headers,
+            auth=auth,
+            params=self._params,
+        ) as resp:
+            data = await resp.json(content_type=None)
+        if self._items_path is not None:
+            return self._make_result(self._items(data))
+        return DataQueryResult(data)
+
+    async def aclose(self):
+        if self._aconnection is None:
+            return await super().aclose()
+        conn, self._aconnection = self._aconnection, None
+        await conn.close()
+
     def get_fields(self, **kwargs):
         return []
 
 
+#  параметры постраничного получения данных json-источником по умолчанию:
+#  page - номер страницы в параметре param (начиная со start), размер - в size_param;
+#  offset - смещение в параметре param, размер страницы - в size_param;
+#  cursor - курсор следующей страницы берётся из ответа по пути cursor_path
+#  и передаётся в параметре param;
+#  link - адрес следующей страницы берётся из заголовка Link (rel="next").
+#  max_pages - макс. количество страниц (None - без ограничения).
+PAGINATION_DEFAULTS = {
+    'page': {'param': 'page', 'start': 1, 'size_param': 'per_page', 'size': None, 'max_pages': None},
+    'offset': {'param': 'offset', 'start': 0, 'size_param': 'limit', 'size': 100, 'max_pages': None},
+    'cursor': {'param': 'cursor', 'cursor_path': 'next', 'start': None, 'size_param': None,
+        'size': None, 'max_pages': None},
+    'link': {'start': None, 'size_param': None, 'size': None, 'max_pages': None},
+}
+
+
 SOURCES_DICT = {
     'postgres': PostgresSource,
     'mysql': MySqlSource,
@@ -705,6 +1267,60 @@ def get_source_class(type_):
     return SOURCES_DICT.get(type_, None)
 
 
+async def _run_blocking(func, *args, **kwargs):
+    """
+    Выполнение блокирующей функции в пуле потоков цикла событий.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+
+
+def _get_json_loads(decoder='json'):
+    """
+    Функция декодирования json: json.loads либо orjson.loads.
+    Если orjson не установлен, то используется json.loads.
+    """
+    if decoder == 'orjson':
+        try:
+            import orjson
+        except ImportError:
+            pass
+        else:
+            return orjson.loads
+    return json.loads
+
+
+def _get_path(data, path):
+    """
+    Получение значения из вложенных словарей по пути через точку.
+    """
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key, None)
+    return data
+
+
+def _import_aiohttp():
+    try:
+        import aiohttp
+    except ImportError:
+        return None
+    return aiohttp
+
+
+def _connector(source_cls, params):
+    """
+    Функция создания соединения источником класса source_cls
+    с атрибутами подключения params (без вызова __init__).
+    """
+    def connect():
+        source = source_cls.__new__(source_cls)
+        source.__dict__.update(params)
+        return source.get_connection()
+    return connect
+
+
 def _parse_conn_str(conn_str):
     """
     Парсинг строки соединения.
@@ -12,3 +12,30 @@ class TableHasNoFields(Exception):
 
     def __str__(self):
         return f'Таблица {self._table} не содержит полей либо не существует'
+
+
+class PoolTimeoutError(Exception):
+    def __init__(self, pool, timeout):
+        self._pool = pool
+        self._timeout = timeout
+
+    def __str__(self):
+        return f'Нет свободных соединений в пуле {self._pool} (ожидание {self._timeout} с.)'
+
+
+class PoolConfigError(Exception):
+    def __init__(self, pool, options):
+        self._pool = pool
+        self._options = options
+
+    def __str__(self):
+        options = ', '.join(f'{k}={v}' for k, v in self._options.items())
+        return f'Пул {self._pool} уже создан с другими параметрами ({options})'
+
+
+class UnknownPaginationType(Exception):
+    def __init__(self, type_):
+        self._type = type_
+
+    def __str__(self):
+        return f'Неизвестный способ постраничного получения данных: {self._type}'
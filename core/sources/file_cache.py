@@ -0,0 +1,165 @@
+"""
+Кэш разобранных файлов (csv, excel): повторное чтение неизменённого файла
+заменяется загрузкой датафрейма из бинарного файла (feather либо pickle).
+"""
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas
+
+
+#  директория кэша по умолчанию
+FILE_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'noofa_file_cache')
+
+
+class FileCache:
+    """
+    Кэш датафреймов, полученных из файлов.
+    Ключ - путь к файлу, время его изменения, размер и параметры чтения,
+    поэтому изменение файла делает прежнее значение недоступным.
+
+    path - директория для хранения датафреймов в файлах (None - не хранить на диске),
+    memory_size - количество датафреймов, хранимых в памяти (0 - не хранить в памяти).
+    """
+    def __init__(self, path=FILE_CACHE_DIR, memory_size=0):
+        self._path = path
+        self.memory_size = memory_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def get_or_read(self, file_path, read_params, read):
+        """
+        Датафрейм из кэша либо результат функции чтения read, который сохраняется в кэш.
+        """
+        file_key, params_key = self.key(file_path, read_params)
+        df = self.get(file_key, params_key)
+        if df is None:
+            df = read()
+            self.set(file_key, params_key, df)
+            if self.memory_size:
+                df = df.copy()
+        return df
+
+    def key(self, file_path, read_params):
+        """
+        Ключ значения в кэше в виде пары (хэш пути к файлу, хэш состояния файла и параметров).
+        """
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        params = json.dumps(read_params, sort_keys=True, default=str)
+        state = f'{stat.st_mtime_ns}:{stat.st_size}:{params}'
+        return _hash(file_path), _hash(state)
+
+    def get(self, file_key, params_key):
+        key = (file_key, params_key)
+        with self._lock:
+            df = self._memory.get(key, None)
+            if df is not None:
+                self._memory.move_to_end(key)
+                self._hits += 1
+                return df.copy()
+        df = self._load(file_key, params_key)
+        with self._lock:
+            if df is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+        self._remember(key, df)
+        return df.copy() if self.memory_size else df
+
+    def set(self, file_key, params_key, df):
+        self._remember((file_key, params_key), df)
+        if self._path is not None:
+            self._dump(file_key, params_key, df)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._path is not None:
+            for name in os.listdir(self._path):
+                os.remove(os.path.join(self._path, name))
+
+    @property
+    def stats(self):
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses}
+
+    def _remember(self, key, df):
+        if not self.memory_size:
+            return
+        with self._lock:
+            self._memory[key] = df
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _dump(self, file_key, params_key, df):
+        """
+        Сохранение датафрейма в файл feather, а если это невозможно
+        (нет pyarrow, нестандартный индекс, столбцы со смешанными типами) - в pickle.
+        Файлы с прежними версиями того же исходного файла удаляются.
+        """
+        base = os.path.join(self._path, f'{file_key}_{params_key}')
+        tmp_path = f'{base}.tmp'
+        try:
+            df.to_feather(tmp_path)
+            target = f'{base}.feather'
+        except Exception:
+            df.to_pickle(tmp_path)
+            target = f'{base}.pkl'
+        os.replace(tmp_path, target)
+
+        for name in os.listdir(self._path):
+            path = os.path.join(self._path, name)
+            if name.startswith(f'{file_key}_') and path != target:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _load(self, file_key, params_key):
+        if self._path is None:
+            return None
+        base = os.path.join(self._path, f'{file_key}_{params_key}')
+        try:
+            if os.path.exists(f'{base}.feather'):
+                from pyarrow import feather
+                return feather.read_table(f'{base}.feather', memory_map=True).to_pandas()
+            if os.path.exists(f'{base}.pkl'):
+                return pandas.read_pickle(f'{base}.pkl')
+        except Exception:
+            return None
+        return None
+
+
+def _hash(value):
+    return hashlib.sha1(value.encode()).hexdigest()[:20]
+
+
+_FILE_CACHE = None
+_FILE_CACHE_LOCK = threading.Lock()
+
+
+def get_file_cache():
+    """
+    Общий для процесса кэш файлов (создаётся при первом обращении).
+    """
+    global _FILE_CACHE
+    with _FILE_CACHE_LOCK:
+        if _FILE_CACHE is None:
+            _FILE_CACHE = FileCache()
+        return _FILE_CACHE
+
+
+def set_file_cache(cache):
+    global _FILE_CACHE
+    with _FILE_CACHE_LOCK:
+        _FILE_CACHE = cache
@@ -2,19 +2,39 @@ import pathlib
 import pandas
 from abc import ABC, abstractmethod
 
+from ..dataframes import filters as panda_filters
+from .file_cache import get_file_cache
+
 
 class FileSource(ABC):
     """
     Абстрактный источник из файла.
+    cache - кэш разобранных файлов: True (общий для процесса кэш),
+    False либо экземпляр FileCache.
     """
     source_type = ''
 
-    def __init__(self, path, file_id=None, read_params={}):
+    def __init__(self, path, file_id=None, read_params=None, cache=False, **kwargs):
         self.path = path
-        self._read_params = read_params
+        self._read_params = dict(read_params or {})
+        self._cache = cache
+
+    @property
+    def file_cache(self):
+        cache = self._cache
+        if cache is True:
+            return get_file_cache()
+        return cache or None
 
     @abstractmethod
-    def get_data(self):
+    def get_data(self, usecols=None, filters=None, dtypes=None, **kwargs):
+        """
+        Получение данных в виде датафрейма.
+
+        usecols - множество имён, которыми можно ограничить читаемые столбцы,
+        filters - фильтры датафрейма в виде json, которые можно применить при чтении,
+        dtypes - словарь типов данных столбцов.
+        """
         pass
 
     def test(self):
@@ -39,27 +59,340 @@ class FileSource(ABC):
 class CSVSource(FileSource):
     """
     Источник из csv-файла.
+    При заданном chunksize файл читается частями по chunksize строк,
+    и фильтры применяются к каждой части до их объединения.
     """
     source_type = 'csv'
 
-    def get_data(self):
-        self._read_params['sep'] = ';'
-        data = pandas.read_csv(self.path, **self._read_params)
-        return data
+    def __init__(self, path, file_id=None, read_params=None, chunksize=None, **kwargs):
+        super().__init__(path, file_id=file_id, read_params=read_params, **kwargs)
+        self.chunksize = chunksize
+
+    def get_data(self, usecols=None, filters=None, dtypes=None, **kwargs):
+        params = {'sep': ';', **self._read_params}
+        cache = self.file_cache
+        if cache is not None:
+            #  в кэше хранится файл, прочитанный целиком
+            data = cache.get_or_read(self.path, params, lambda: self._read(params))
+            return _apply_read_options(data, usecols, filters, dtypes)
+        if usecols is not None and 'usecols' not in params:
+            usecols = set(usecols)
+            params['usecols'] = lambda col: col in usecols
+        #  при чтении задаются только числовые типы - они не меняют значения;
+        #  остальные (str, category) применяются к прочитанным данным,
+        #  т.к. иначе, например, '007' осталось бы строкой '007', а не '7'
+        parse_dtypes, other_dtypes = {}, {}
+        for col, dtype in (dtypes or {}).items():
+            numeric = _is_parse_dtype(dtype)
+            (parse_dtypes if numeric else other_dtypes)[col] = dtype
+        if parse_dtypes:
+            params['dtype'] = {**parse_dtypes, **params.get('dtype', {})}
+        try:
+            data = self._read(params, filters)
+        except (ValueError, TypeError):
+            #  если данные не соответствуют заданным типам,
+            #  то типы определяются при чтении
+            if not parse_dtypes:
+                raise
+            params['dtype'] = self._read_params.get('dtype', None)
+            data = self._read(params, filters)
+        return _apply_read_options(data, dtypes=other_dtypes)
+
+    def _read(self, params, filters=None):
+        if not self.chunksize:
+            return pandas.read_csv(self.path, **params)
+        chunks = []
+        with pandas.read_csv(self.path, chunksize=self.chunksize, **params) as reader:
+            for chunk in reader:
+                chunks.append(_filter_chunk(chunk, filters))
+        if len(chunks) == 1:
+            return chunks[0]
+        return pandas.concat(chunks)
 
 
 class ExcelSource(FileSource):
     """
     Источник из excel-файла.
+    sheet - имя либо номер листа (по умолчанию - первый лист),
+    cell_range - диапазон ячеек вида 'A1:D100' (первая строка диапазона - заголовки),
+    streaming - чтение листа построчно в режиме read_only openpyxl:
+    датафрейм собирается из частей по chunksize строк, к каждой части
+    применяются типы столбцов и фильтры, поэтому весь лист в памяти не хранится.
+    Диапазон ячеек читается только в этом режиме.
     """
     source_type = 'excel'
 
-    def get_data(self):
-        data = pandas.read_excel(self.path, **self._read_params)
-        return data
+    def __init__(self, path, file_id=None, read_params=None, sheet=None,
+                 cell_range=None, streaming=False, chunksize=10000, **kwargs):
+        super().__init__(path, file_id=file_id, read_params=read_params, **kwargs)
+        self.sheet = sheet
+        self.cell_range = cell_range
+        self.streaming = streaming or cell_range is not None
+        self.chunksize = chunksize
+
+    def get_data(self, usecols=None, filters=None, dtypes=None, **kwargs):
+        cache = self.file_cache
+        if cache is not None:
+            params = {
+                **self._read_params,
+                'sheet': self.sheet,
+                'cell_range': self.cell_range,
+                'streaming': self.streaming,
+            }
+            data = cache.get_or_read(self.path, params, self._read)
+            return _apply_read_options(data, usecols, filters, dtypes)
+        if self.streaming:
+            return self._stream(usecols, filters, dtypes)
+        return self._read()
+
+    def _read(self):
+        if self.streaming:
+            return self._stream()
+        params = dict(self._read_params)
+        if self.sheet is not None:
+            params['sheet_name'] = self.sheet
+        return pandas.read_excel(self.path, **params)
+
+    def _stream(self, usecols=None, filters=None, dtypes=None):
+        openpyxl = _import_openpyxl()
+        dtypes = dtypes or {}
+        workbook = openpyxl.load_workbook(self.path, read_only=True, data_only=True)
+        try:
+            rows = self._iter_rows(workbook)
+            header = next(rows, None)
+            if header is None:
+                return pandas.DataFrame()
+            columns = _excel_columns(header)
+            positions = [
+                n for n, col in enumerate(columns)
+                if usecols is None or col in usecols
+            ]
+            columns = [columns[n] for n in positions]
+            #  категории объединяются после сборки всех частей
+            chunk_dtypes = {
+                col: dtype for col, dtype in dtypes.items()
+                if col in columns and dtype != 'category'
+            }
+
+            chunks, batch = [], []
+            for row in rows:
+                batch.append([row[n] if n < len(row) else None for n in positions])
+                if len(batch) >= self.chunksize:
+                    chunks.append(self._make_chunk(batch, columns, chunk_dtypes, filters))
+                    batch = []
+            if batch or not chunks:
+                chunks.append(self._make_chunk(batch, columns, chunk_dtypes, filters))
+        finally:
+            workbook.close()
+
+        data = chunks[0] if len(chunks) == 1 else pandas.concat(chunks, ignore_index=True)
+        categories = {
+            col: dtype for col, dtype in dtypes.items()
+            if col in columns and dtype == 'category'
+        }
+        return _apply_read_options(data, dtypes=categories)
+
+    def _iter_rows(self, workbook):
+        if self.sheet is None:
+            sheet = workbook.worksheets[0]
+        elif isinstance(self.sheet, int):
+            sheet = workbook.worksheets[self.sheet]
+        else:
+            sheet = workbook[self.sheet]
+        bounds = {}
+        if self.cell_range is not None:
+            from openpyxl.utils.cell import range_boundaries
+            min_col, min_row, max_col, max_row = range_boundaries(self.cell_range)
+            bounds = {
+                'min_col': min_col, 'min_row': min_row,
+                'max_col': max_col, 'max_row': max_row,
+            }
+        return sheet.iter_rows(values_only=True, **bounds)
+
+    @staticmethod
+    def _make_chunk(batch, columns, dtypes, filters):
+        chunk = pandas.DataFrame.from_records(batch, columns=columns)
+        return _apply_read_options(chunk, filters=filters, dtypes=dtypes)
+
+
+class ArrowFileSource(FileSource):
+    """
+    Абстрактный источник из файла колоночного формата.
+    Файл читается с помощью pyarrow.dataset: читаются только используемые
+    столбцы, а фильтры передаются при чтении (для parquet по статистике
+    групп строк пропускаются группы, не удовлетворяющие фильтрам).
+    read_params передаются в pyarrow.dataset.dataset.
+    """
+    _format = ''
+
+    def get_data(self, usecols=None, filters=None, dtypes=None, **kwargs):
+        ds = _import_pyarrow_dataset()
+        dataset = ds.dataset(self.path, format=self._format, **self._read_params)
+        names = dataset.schema.names
+        columns = None
+        if usecols is not None:
+            columns = [name for name in names if name in usecols]
+        expression = _arrow_filter(ds, filters or [], set(names))
+        try:
+            table = dataset.to_table(columns=columns, filter=expression)
+        except (TypeError, NotImplementedError, ValueError):
+            #  фильтр не применим к типам столбцов в файле -
+            #  фильтрация будет выполнена после чтения
+            table = dataset.to_table(columns=columns)
+        return table.to_pandas()
+
+
+class ParquetSource(ArrowFileSource):
+    """
+    Источник из parquet-файла.
+    """
+    source_type = 'parquet'
+    _format = 'parquet'
+
+
+class FeatherSource(ArrowFileSource):
+    """
+    Источник из feather-файла (версии 2).
+    """
+    source_type = 'feather'
+    _format = 'feather'
+
+
+class ArrowSource(ArrowFileSource):
+    """
+    Источник из файла в формате Arrow IPC.
+    """
+    source_type = 'arrow'
+    _format = 'ipc'
+
+
+def _import_openpyxl():
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError('Для построчного чтения excel-файлов требуется пакет openpyxl')
+    return openpyxl
+
+
+def _excel_columns(header):
+    """
+    Названия столбцов по строке заголовков так же, как в pandas.read_excel:
+    целые числа остаются числами, пустые ячейки - Unnamed: n,
+    повторяющиеся названия переименовываются (a, a.1, ...).
+    """
+    from pandas.io.parsers import TextParser
+    header = [_excel_header_cell(cell) for cell in header]
+    return list(TextParser([header], header=0).read().columns)
+
+
+def _excel_header_cell(cell):
+    #  так же, как ячейки приводит pandas при чтении через openpyxl
+    if cell is None:
+        return ''
+    if isinstance(cell, float) and cell.is_integer():
+        return int(cell)
+    return cell
+
+
+def _import_pyarrow_dataset():
+    try:
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise ImportError('Для чтения файлов parquet, feather и arrow требуется пакет pyarrow')
+    return ds
+
+
+def _arrow_filter(ds, panda_jsfilters, names):
+    """
+    Преобразование фильтров датафрейма в выражение pyarrow.
+    Фильтры, которые нельзя преобразовать, пропускаются: выражение
+    может отбирать больше строк, чем фильтры, но не меньше.
+    """
+    result = None
+    for f in panda_jsfilters:
+        expression = _arrow_expression(ds, f, names)
+        if expression is not None:
+            result = expression if result is None else result & expression
+    return result
+
+
+def _arrow_expression(ds, panda_jsf, names):
+    if panda_jsf.get('is_q', False):
+        expressions = [_arrow_expression(ds, f, names) for f in panda_jsf['filters']]
+        if panda_jsf['op'] == 'or':
+            if not expressions or any(e is None for e in expressions):
+                return None
+            result = expressions[0]
+            for e in expressions[1:]:
+                result = result | e
+            return result
+        return _arrow_filter(ds, panda_jsf['filters'], names)
+
+    col, op, value = panda_jsf['col_name'], panda_jsf['op'], panda_jsf['value']
+    if col not in names:
+        return None
+    field = ds.field(col)
+    if op == 'in':
+        if not isinstance(value, (list, tuple)) or None in value:
+            return None
+        return field.isin(list(value))
+    if value is None:
+        return None
+    if op == '==':
+        return field == value
+    if op == '!=':
+        #  в pandas пустые значения не равны любому значению
+        return (field != value) | field.is_null()
+    if op == '>':
+        return field > value
+    if op == '>=':
+        return field >= value
+    if op == '<':
+        return field < value
+    if op == '<=':
+        return field <= value
+    return None
+
+
+def _is_parse_dtype(dtype):
+    """
+    Можно ли задать тип при чтении csv (целые и дробные числа).
+    """
+    try:
+        return pandas.api.types.is_integer_dtype(dtype) or pandas.api.types.is_float_dtype(dtype)
+    except TypeError:
+        return False
+
+
+def _apply_read_options(data, usecols=None, filters=None, dtypes=None):
+    """
+    Применение к прочитанному целиком файлу параметров чтения (см. FileSource.get_data).
+    """
+    if usecols is not None:
+        data = data[[col for col in data.columns if col in usecols]]
+    for col, dtype in (dtypes or {}).items():
+        if col in data.columns:
+            try:
+                data = data.astype({col: dtype})
+            except (ValueError, TypeError):
+                pass
+    return _filter_chunk(data, filters)
+
+
+def _filter_chunk(chunk, filters=None):
+    """
+    Фильтрация части файла фильтрами, все столбцы которых в ней есть.
+    """
+    for f in filters or []:
+        if panda_filters.filter_columns(f) <= set(chunk.columns):
+            chunk = chunk[panda_filters._parse_filters(chunk, [f]).filter]
+    return chunk
 
 
 FILE_SOURCES = {
     'csv': CSVSource,
     'excel': ExcelSource,
+    'parquet': ParquetSource,
+    'feather': FeatherSource,
+    'arrow': ArrowSource,
 }
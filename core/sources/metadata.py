@@ -0,0 +1,209 @@
+"""
+Кэш метаданных источников: списков полей таблиц и структуры базы.
+"""
+import os
+import json
+import time
+import threading
+from copy import deepcopy
+
+
+#  время хранения метаданных в кэше по умолчанию (сек.)
+METADATA_TTL = 600
+
+_REDIS_PREFIX = 'noofa:metadata:'
+
+
+class MemoryMetadataStorage:
+    """
+    Хранилище метаданных в памяти процесса.
+    """
+    def __init__(self):
+        self._items = {}  # ключ: (время истечения либо None, значение)
+
+    def get(self, key):
+        item = self._items.get(key, None)
+        if item is None:
+            return None
+        expires, value = item
+        if expires is not None and expires <= time.time():
+            self._items.pop(key, None)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):
+        expires = None if ttl is None else time.time() + ttl
+        self._items[key] = (expires, value)
+
+    def delete(self, prefix=''):
+        """
+        Удаление значений, ключи которых начинаются с prefix.
+        """
+        for key in [k for k in self._items if k.startswith(prefix)]:
+            del self._items[key]
+
+    def remove(self, key):
+        """
+        Удаление значения по ключу key.
+        """
+        self._items.pop(key, None)
+
+
+class FileMetadataStorage(MemoryMetadataStorage):
+    """
+    Хранилище метаданных в json-файле.
+    Содержимое файла загружается при создании хранилища
+    и перезаписывается при каждом изменении.
+    """
+    def __init__(self, path):
+        super().__init__()
+        self._path = path
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self._items = {k: tuple(v) for k, v in json.load(f).items()}
+
+    def set(self, key, value, ttl=None):
+        super().set(key, value, ttl)
+        self._dump()
+
+    def delete(self, prefix=''):
+        super().delete(prefix)
+        self._dump()
+
+    def remove(self, key):
+        super().remove(key)
+        self._dump()
+
+    def _dump(self):
+        tmp_path = f'{self._path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._items, f)
+        os.replace(tmp_path, self._path)
+
+
+class RedisMetadataStorage:
+    """
+    Хранилище метаданных в redis.
+
+    connection - соединение с redis (redis.Redis).
+    """
+    def __init__(self, connection):
+        self._conn = connection
+
+    def get(self, key):
+        value = self._conn.get(_REDIS_PREFIX + key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key, value, ttl=None):
+        ex = None if ttl is None else max(int(ttl), 1)
+        self._conn.set(_REDIS_PREFIX + key, json.dumps(value), ex=ex)
+
+    def delete(self, prefix=''):
+        keys = list(self._conn.scan_iter(match=f'{_REDIS_PREFIX}{prefix}*'))
+        if keys:
+            self._conn.delete(*keys)
+
+    def remove(self, key):
+        self._conn.delete(_REDIS_PREFIX + key)
+
+
+class MetadataCache:
+    """
+    Кэш метаданных источников.
+    Значения хранятся по ключам вида '{source_key}:fields:{table}'
+    и '{source_key}:struct', где source_key - строка, идентифицирующая
+    базу данных источника.
+
+    storage - хранилище (по умолчанию - в памяти процесса),
+    ttl - время хранения значений в секундах (None - без ограничения).
+    """
+    def __init__(self, storage=None, ttl=METADATA_TTL):
+        self._storage = storage if storage is not None else MemoryMetadataStorage()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get_fields(self, source_key, table_name):
+        """
+        Список полей таблицы либо None, если его нет в кэше.
+        """
+        fields = self._get(_fields_key(source_key, table_name))
+        return None if fields is None else list(fields)
+
+    def set_fields(self, source_key, table_name, fields):
+        self._set(_fields_key(source_key, table_name), list(fields))
+
+    def get_structure(self, source_key):
+        """
+        Структура базы данных либо None, если её нет в кэше.
+        """
+        structure = self._get(_struct_key(source_key))
+        return None if structure is None else deepcopy(structure)
+
+    def set_structure(self, source_key, structure):
+        self._set(_struct_key(source_key), deepcopy(structure))
+
+    def invalidate(self, source_key=None, table_name=None):
+        """
+        Удаление метаданных из кэша:
+        без аргументов - всех, с source_key - метаданных источника,
+        с source_key и table_name - полей таблицы и структуры базы.
+        """
+        with self._lock:
+            if source_key is None:
+                self._storage.delete('')
+            elif table_name is None:
+                self._storage.delete(f'{source_key}:')
+            else:
+                self._storage.remove(_fields_key(source_key, table_name))
+                self._storage.remove(_struct_key(source_key))
+
+    @property
+    def stats(self):
+        """
+        Количество попаданий и промахов кэша.
+        """
+        with self._lock:
+            return {'hits': self._hits, 'misses': self._misses}
+
+    def _get(self, key):
+        with self._lock:
+            value = self._storage.get(key)
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._storage.set(key, value, self.ttl)
+
+
+def _fields_key(source_key, table_name):
+    return f'{source_key}:fields:{table_name}'
+
+
+def _struct_key(source_key):
+    return f'{source_key}:struct'
+
+
+_METADATA_CACHE = MetadataCache()
+
+
+def get_metadata_cache():
+    """
+    Общий для процесса кэш метаданных.
+    """
+    return _METADATA_CACHE
+
+
+def set_metadata_cache(cache):
+    """
+    Замена общего кэша метаданных, например, на кэш с хранилищем в redis.
+    """
+    global _METADATA_CACHE
+    _METADATA_CACHE = cache
@@ -0,0 +1,170 @@
+"""
+Кэш сформированных запросов: повторное построение отчёта
+с тем же запросом не требует получения таблиц и построения SelectQuery.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .metadata import METADATA_TTL
+
+
+#  количество хранимых запросов по умолчанию
+PLAN_CACHE_SIZE = 512
+
+
+class CompiledQuery:
+    """
+    Сформированный запрос: текст, параметры, названия столбцов результата
+    и выражения, выполняемые до и после запроса (см. SelectQuery.prepare).
+    Имеет ту часть интерфейса SelectQuery, которая используется источниками.
+    """
+    def __init__(self, sql, params=None, requested=None, prepare=None, cleanup=None):
+        self._sql = sql
+        self._params = list(params or [])
+        self._requested = list(requested or [])
+        self._prepare = list(prepare or [])
+        self._cleanup = list(cleanup or [])
+
+    @classmethod
+    def from_select(cls, select_query):
+        sql, params = select_query.str_and_params()
+        return cls(
+            sql,
+            params,
+            select_query.requested,
+            select_query.prepare,
+            select_query.cleanup,
+        )
+
+    @property
+    def params(self):
+        return list(self._params)
+
+    @property
+    def requested(self):
+        return list(self._requested)
+
+    @property
+    def prepare(self):
+        return list(self._prepare)
+
+    @property
+    def cleanup(self):
+        return list(self._cleanup)
+
+    def str_and_params(self):
+        return (self._sql, self.params)
+
+    def __str__(self):
+        return self._sql
+
+
+class QueryPlanCache:
+    """
+    Кэш сформированных запросов (LRU).
+    Ключ - хэш запроса в виде словаря, строки источника (source_key),
+    параметров построения и версии схемы источника; версия увеличивается
+    при сбросе метаданных источника (см. DatabaseSource.invalidate_metadata).
+
+    Запросы хранятся не дольше метаданных, по которым они сформированы:
+    ttl - время хранения в секундах (None - без ограничения), по умолчанию
+    совпадает со временем хранения метаданных.
+
+    max_entries - макс. количество хранимых запросов.
+    """
+    def __init__(self, max_entries=PLAN_CACHE_SIZE, ttl=METADATA_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def key(self, query_conf, source_key, **options):
+        with self._lock:
+            version = self._versions.get(source_key, 0)
+        value = json.dumps(
+            [query_conf, source_key, version, options],
+            sort_keys=True,
+            default=_typed_repr,
+        )
+        return hashlib.sha1(value.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Сформированный запрос (CompiledQuery) либо None.
+        """
+        with self._lock:
+            expires, compiled = self._items.get(key, (None, None))
+            if compiled is not None and expires is not None and expires <= time.time():
+                del self._items[key]
+                compiled = None
+            if compiled is None:
+                self._misses += 1
+                return None
+            self._items.move_to_end(key)
+            self._hits += 1
+            return compiled
+
+    def set(self, key, compiled, ttl=None):
+        """
+        Сохранение запроса на ttl секунд (по умолчанию - self.ttl).
+        """
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else time.time() + ttl
+        with self._lock:
+            self._items[key] = (expires, compiled)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def invalidate(self, source_key=None):
+        """
+        Сброс запросов источника (без аргументов - всех запросов).
+        """
+        with self._lock:
+            if source_key is None:
+                self._items.clear()
+            else:
+                self._versions[source_key] = self._versions.get(source_key, 0) + 1
+
+    @property
+    def stats(self):
+        """
+        Количество попаданий и промахов, доля попаданий и размер кэша.
+        """
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total else 0.0,
+                'size': len(self._items),
+            }
+
+
+def _typed_repr(value):
+    #  значения, не представимые в json (даты и т.п.), различаются и по типу
+    return f'{type(value).__name__}:{value!r}'
+
+
+_PLAN_CACHE = QueryPlanCache()
+
+
+def get_plan_cache():
+    """
+    Общий для процесса кэш сформированных запросов.
+    """
+    return _PLAN_CACHE
+
+
+def set_plan_cache(cache):
+    """
+    Замена общего кэша запросов (None - отключение кэширования).
+    """
+    global _PLAN_CACHE
+    _PLAN_CACHE = cache
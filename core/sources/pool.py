@@ -0,0 +1,223 @@
+"""
+Пул соединений с источниками.
+"""
+import time
+import threading
+
+from .exceptions import PoolTimeoutError, PoolConfigError
+
+
+#  параметры пулов по умолчанию
+POOL_DEFAULTS = {
+    'max_size': 10,  # макс. количество соединений в пуле
+    'max_idle': 300,  # время (сек.), после которого простаивающее соединение закрывается
+    'check_interval': 30,  # время простоя (сек.), после которого соединение проверяется перед выдачей
+    'timeout': 30,  # время ожидания (сек.) свободного соединения
+}
+
+_POOLS = {}  # пулы соединений по ключам параметров подключения
+_POOLS_LOCK = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Пул соединений с одинаковыми параметрами подключения.
+
+    connect - функция создания нового соединения,
+    test_query - запрос для проверки "живости" соединения,
+    label - название пула (используется в статистике).
+    """
+    def __init__(self, connect, test_query=None, label='', max_size=None,
+        max_idle=None, check_interval=None, timeout=None, **kwargs):
+        self._connect = connect
+        self._test_query = test_query
+        self.label = label
+        self.max_size = _default(max_size, 'max_size')
+        self.max_idle = _default(max_idle, 'max_idle')
+        self.check_interval = _default(check_interval, 'check_interval')
+        self.timeout = _default(timeout, 'timeout')
+
+        self._idle = []  # простаивающие соединения в виде (соединение, время возврата в пул)
+        self._size = 0  # количество соединений, созданных пулом и не закрытых
+        self._cond = threading.Condition()
+
+        #  метрики пула
+        self._hits = 0  # выдано готовых соединений
+        self._misses = 0  # создано новых соединений
+        self._waits = 0  # количество ожиданий свободного соединения
+        self._wait_time = 0.0  # суммарное время ожидания
+        self._discarded = 0  # закрыто неисправных либо "устаревших" соединений
+
+    def acquire(self):
+        """
+        Получение соединения из пула.
+        При отсутствии свободных соединений создаётся новое, если не превышен
+        размер пула, иначе - ожидание возврата соединения в пул.
+        Проверка и закрытие простаивающих соединений выполняются вне блокировки.
+        """
+        deadline = None
+        while True:
+            with self._cond:
+                while True:
+                    candidate = self._take_idle()
+                    if candidate is not None:
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        self._misses += 1
+                        break
+
+                    now = time.monotonic()
+                    if deadline is None:
+                        self._waits += 1
+                        deadline = now + self.timeout
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PoolTimeoutError(self.label, self.timeout)
+                    self._cond.wait(remaining)
+                    self._wait_time += time.monotonic() - now
+
+            if candidate is None:
+                break
+            conn, idle_time = candidate
+            if idle_time > self.max_idle or (
+                idle_time > self.check_interval and not self._is_alive(conn)
+            ):
+                self._discard(conn)
+                continue
+            with self._cond:
+                self._hits += 1
+            return conn
+
+        #  соединение создаётся вне блокировки, чтобы не задерживать других
+        try:
+            return self._connect()
+        except:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, conn, discard=False):
+        """
+        Возврат соединения в пул.
+        При discard=True соединение закрывается.
+        """
+        if discard:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def clear(self):
+        """
+        Закрытие всех простаивающих соединений.
+        """
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @property
+    def stats(self):
+        """
+        Метрики пула.
+        """
+        with self._cond:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'waits': self._waits,
+                'wait_time': self._wait_time,
+                'discarded': self._discarded,
+                'size': self._size,
+                'idle': len(self._idle),
+            }
+
+    def _take_idle(self):
+        """
+        Простаивающее соединение и время его простоя либо None
+        (вызывается с блокировкой; проверка соединения - после её снятия).
+        """
+        if not self._idle:
+            return None
+        conn, released_at = self._idle.pop()
+        return conn, time.monotonic() - released_at
+
+    def _is_alive(self, conn):
+        """
+        Проверка соединения запросом проверки связи.
+        """
+        if self._test_query is None:
+            return True
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(self._test_query)
+                cursor.fetchall()
+            finally:
+                cursor.close()
+        except:
+            return False
+        return True
+
+    def _discard(self, conn):
+        """
+        Закрытие соединения (вне блокировки) и освобождение места в пуле.
+        """
+        try:
+            conn.close()
+        except:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+
+def get_pool(key, connect, **options):
+    """
+    Получение пула соединений по ключу параметров подключения.
+    Если пула с таким ключом нет, то он создаётся. Если пул есть,
+    а заданные параметры размера и времени отличаются от его параметров,
+    выбрасывается PoolConfigError.
+    """
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key, None)
+        if pool is None:
+            pool = ConnectionPool(connect, **options)
+            _POOLS[key] = pool
+            return pool
+    conflicts = {
+        option: options[option] for option in POOL_DEFAULTS
+        if options.get(option, None) is not None
+        and options[option] != getattr(pool, option)
+    }
+    if conflicts:
+        raise PoolConfigError(pool.label, conflicts)
+    return pool
+
+
+def pools_stats():
+    """
+    Метрики всех пулов соединений.
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    return {pool.label: pool.stats for pool in pools}
+
+
+def close_pools():
+    """
+    Закрытие простаивающих соединений и удаление всех пулов.
+    """
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        _POOLS.clear()
+    for pool in pools:
+        pool.clear()
+
+
+def _default(value, option):
+    return value if value is not None else POOL_DEFAULTS[option]
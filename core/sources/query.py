@@ -1,4 +1,79 @@
+import json
+import hashlib
+from copy import copy
+from datetime import date, datetime
+
 from .exceptions import NoSuchFieldError, TableHasNoFields
+from .plan_cache import CompiledQuery, _typed_repr
+
+
+#  агрегатные функции, доступные в запросах с группировкой
+AGGREGATE_FUNCS = ('COUNT', 'SUM', 'AVG', 'MIN', 'MAX')
+
+#  типы с плавающей точкой по типам источников: значения AVG приводятся к ним,
+#  т.к. среднее целых чисел в mssql - целое, а в postgres и mysql - decimal
+#  (CAST AS DOUBLE в mysql - начиная с версии 8.0.17)
+_FLOAT_TYPES = {
+    'postgres': 'DOUBLE PRECISION',
+    'mysql': 'DOUBLE',
+    'mssql': 'FLOAT',
+    'sqlite': 'REAL',
+}
+
+#  макс. количество значений в одном IN; списки большего размера
+#  делятся на части, объединяемые через OR
+IN_LIST_BATCH = 1000
+
+#  количество значений IN, начиная с которого они загружаются во временную
+#  таблицу (для источников с ограничением количества параметров в запросе)
+IN_TEMP_TABLE_MIN = 2000
+
+#  то же для отдельных типов источников: в mssql в запросе может быть не более
+#  2100 параметров, и несколько частей IN по IN_LIST_BATCH значений вместе
+#  с остальными параметрами запроса могут превысить это ограничение
+_IN_TEMP_TABLE_MIN = {
+    'mssql': IN_LIST_BATCH + 1,
+}
+
+#  выражения для работы с временными таблицами значений IN по типам источников
+_TEMP_TABLES = {
+    'mssql': {
+        'name': '#noofa_in_{}',
+        'create': [
+            "IF OBJECT_ID('tempdb..{name}') IS NOT NULL DROP TABLE {name}",
+            'CREATE TABLE {name} (v {type})',
+        ],
+        'drop': "IF OBJECT_ID('tempdb..{name}') IS NOT NULL DROP TABLE {name}",
+    },
+    'sqlite': {
+        'name': 'temp.noofa_in_{}',
+        'create': [
+            'DROP TABLE IF EXISTS {name}',
+            'CREATE TEMP TABLE {name} (v)',
+        ],
+        'drop': 'DROP TABLE IF EXISTS {name}',
+    },
+}
+
+#  источники, в которые список значений можно передать одним параметром-массивом
+_ARRAY_DIALECTS = ('postgres', )
+
+
+def in_list_strategy(dialect, size):
+    """
+    Способ передачи size значений фильтра IN в запрос к источнику типа dialect:
+    plain - каждое значение отдельным параметром,
+    batches - несколько IN по IN_LIST_BATCH значений,
+    array - одним параметром-массивом (= ANY),
+    temp_table - через временную таблицу.
+    """
+    if size <= IN_LIST_BATCH:
+        return 'plain'
+    if dialect in _ARRAY_DIALECTS:
+        return 'array'
+    if dialect in _TEMP_TABLES and size >= _IN_TEMP_TABLE_MIN.get(dialect, IN_TEMP_TABLE_MIN):
+        return 'temp_table'
+    return 'batches'
 
 
 class Join:
@@ -51,8 +126,14 @@ class SelectQuery:
         self._table = table  # таблица
         self._values = []  # список запрашиваемых полей
         self._order_by = []
+        self._group_by = []  # список полей группировки
+        self._aggregates = []  # список агрегатов вида (выражение, название)
+        self._order_fields = []  # поля упорядочивания вида (поле, ASC либо DESC)
         self._limit = None
+        self._offset = None
         self._is_mssql = False
+        self._prepare = []  # выражения, выполняемые перед запросом, вида (выражение, строки либо None)
+        self._cleanup = []  # выражения, выполняемые после запроса
 
         for f in table.get_verbose_names():
             self._fields.append(f)
@@ -61,6 +142,8 @@ class SelectQuery:
 
     @property
     def requested(self):
+        if self._group_by or self._aggregates:
+            return self._group_by + [a[1] for a in self._aggregates]
         if self._values:
             values = [v[0] if v[1] is None else v[1] for v in self._values]
             return values
@@ -97,6 +180,8 @@ class SelectQuery:
                 self._where.append(Q(f))
             for p in f._params:
                 self._params.append(p)
+            self._prepare += getattr(f, '_prepare', [])
+            self._cleanup += getattr(f, '_cleanup', [])
 
         return self
 
@@ -107,6 +192,21 @@ class SelectQuery:
         """
         return self._params
 
+    @property
+    def prepare(self):
+        """
+        Выражения, выполняемые перед запросом (напр., заполнение временных таблиц),
+        в виде списка пар (выражение, список строк параметров либо None).
+        """
+        return self._prepare
+
+    @property
+    def cleanup(self):
+        """
+        Выражения, выполняемые после запроса.
+        """
+        return self._cleanup
+
     def values(self, *values):
         for value in values:
             f = value[0]
@@ -117,6 +217,35 @@ class SelectQuery:
                 raise NoSuchFieldError(f)
         return self
 
+    def group_by(self, *fields):
+        """
+        Добавление полей группировки. При группировке запрашиваются
+        только поля группировки и агрегаты.
+        """
+        for f in fields:
+            if f not in self._fields:
+                raise NoSuchFieldError(f)
+            if f not in self._group_by:
+                self._group_by.append(f)
+        return self
+
+    def aggregate(self, func, field, name, dialect=None):
+        """
+        Добавление агрегата func(field), который в результате
+        будет представлен столбцом name.
+        dialect - тип источника; при его указании AVG вычисляется
+        для значений с плавающей точкой (см. _FLOAT_TYPES).
+        """
+        func = func.upper()
+        assert func in AGGREGATE_FUNCS, f'Недопустимая агрегатная функция: {func}'
+        if field not in self._fields:
+            raise NoSuchFieldError(field)
+        expr = field
+        if func == 'AVG' and dialect is not None:
+            expr = f'CAST({field} AS {_FLOAT_TYPES.get(dialect, "FLOAT")})'
+        self._aggregates.append((f'{func}({expr})', name))
+        return self
+
     def limit(self, n):
         try:
             n = int(n)
@@ -126,6 +255,59 @@ class SelectQuery:
             self._limit = n
         return self
 
+    def offset(self, n):
+        """
+        Смещение (количество пропускаемых строк).
+        Применяется только вместе с limit.
+        """
+        try:
+            n = int(n)
+        except:
+            pass
+        else:
+            self._offset = n if n > 0 else None
+        return self
+
+    def paginate(self, page, per_page):
+        """
+        Ограничение результата страницей page (начиная с 1) по per_page строк.
+        """
+        page, per_page = int(page), int(per_page)
+        assert page >= 1 and per_page >= 1, 'Номер и размер страницы должны быть больше нуля'
+        return self.limit(per_page).offset((page - 1) * per_page)
+
+    def seek(self, values, param_placeholder='%s'):
+        """
+        Постраничное получение по ключу (keyset): отбор строк, следующих
+        в порядке упорядочивания за строкой со значениями полей упорядочивания values.
+        Значения полей упорядочивания не должны быть пустыми,
+        а их сочетание должно быть уникальным.
+        """
+        fields = self._order_fields
+        assert 0 < len(values) <= len(fields), 'Количество значений должно быть не больше количества полей упорядочивания'
+        q = Q()
+        for n, value in enumerate(values):
+            field, sorting = fields[n]
+            filter_cls = GtFilter if sorting == 'ASC' else LtFilter
+            equal = [
+                EqFilter(f, v, param_placeholder)
+                for (f, _), v in zip(fields[:n], values[:n])
+            ]
+            q |= Q(*equal, filter_cls(field, value, param_placeholder))
+        return self.where(q)
+
+    def count_query(self):
+        """
+        Запрос количества строк результата (без упорядочивания и ограничений).
+        """
+        if self._group_by:
+            query = copy(self)
+            query._order_by, query._limit, query._offset = [], None, None
+            sql = f'SELECT COUNT(*) FROM ({query}) AS noofa_count'
+        else:
+            sql = f'SELECT COUNT(*){self._from_where()}'.rstrip()
+        return CompiledQuery(sql, self._params, ['count'], self._prepare, self._cleanup)
+
     def mssql_limit(self, n):
         self._is_mssql = True
         return self.limit(n)
@@ -142,6 +324,7 @@ class SelectQuery:
             ordby = f'{", ".join(fields)} {sorting}'
             if ordby not in self._order_by:
                 self._order_by.append(ordby)
+                self._order_fields += [(field, sorting) for field in fields]
         return self
 
     def _execute(self, cursor):
@@ -159,16 +342,45 @@ class SelectQuery:
         return (str(self), self._params)
 
     def __str__(self):
-        if self._values:
+        if self._group_by or self._aggregates:
+            fields = ', '.join(self._group_by + [a[0] for a in self._aggregates])
+        elif self._values:
             values = [v[0] for v in self._values]
             fields = f', '.join(values)
         else:
             fields = f', '.join(self._fields)
 
         has_limit = self._limit is not None
+        #  в mssql при смещении вместо TOP используется OFFSET ... FETCH
+        use_fetch = has_limit and self._is_mssql and self._offset is not None
+
+        q_beg = f'SELECT TOP {self._limit}' if has_limit and self._is_mssql and not use_fetch else 'SELECT'
+        q = f'{q_beg} {fields}{self._from_where()}'
+
+        if self._group_by:
+            q += f' GROUP BY {", ".join(self._group_by)}'
+
+        if self._order_by:
+            ordby = f' ORDER BY {", ".join(self._order_by)}'
+            q += ordby
+        elif use_fetch:
+            #  OFFSET ... FETCH допускается только с ORDER BY
+            q += ' ORDER BY (SELECT NULL)'
 
-        q_beg = f'SELECT TOP {self._limit}' if has_limit and self._is_mssql else 'SELECT'
-        q = f'{q_beg} {fields} FROM {self._table._name}'
+        if use_fetch:
+            q += f' OFFSET {self._offset} ROWS FETCH NEXT {self._limit} ROWS ONLY'
+        elif has_limit and not self._is_mssql:
+            q += f' LIMIT {self._limit}'
+            if self._offset is not None:
+                q += f' OFFSET {self._offset}'
+
+        return q.rstrip()
+
+    def _from_where(self):
+        """
+        Часть запроса с таблицами, соединениями и фильтрами.
+        """
+        q = f' FROM {self._table._name}'
 
         _joins = ''
         if self._joins:
@@ -186,14 +398,7 @@ class SelectQuery:
         if _where:
             q += f' WHERE {_where}'
 
-        if self._order_by:
-            ordby = f' ORDER BY {", ".join(self._order_by)}'
-            q += ordby
-
-        if has_limit and not self._is_mssql:
-            q += f' LIMIT {self._limit}'
-
-        return q.rstrip()
+        return q
 
 
 class Q:
@@ -203,11 +408,15 @@ class Q:
     def __init__(self, *filters):
         self._filters = ['AND', ]
         self._params = []
+        self._prepare = []
+        self._cleanup = []
 
         for f in filters:
             self._filters.append(f)
             for p in f._params:
                 self._params.append(p)
+            self._prepare += getattr(f, '_prepare', [])
+            self._cleanup += getattr(f, '_cleanup', [])
 
     @property
     def is_empty(self):
@@ -264,6 +473,8 @@ class Q:
             q._filters.append(value._filters)
             q._params += self._params
             q._params += value._params
+            q._prepare += self._prepare + value._prepare
+            q._cleanup += self._cleanup + value._cleanup
             return q
         raise TypeError(f'Недопустимый операнд: {value}')
 
@@ -346,21 +557,53 @@ class EndsWithFilter(Filter):
 
 
 class InFilter:
-    """ IN """
+    """
+    IN.
+    Способ передачи значений зависит от их количества и типа источника
+    dialect (см. in_list_strategy); без dialect каждое значение
+    передаётся отдельным параметром.
+    """
 
     _not = False
 
-    def __init__(self, field_name, values_range, param_placeholder='%s'):
+    def __init__(self, field_name, values_range, param_placeholder='%s', dialect=None):
         self._field_name = field_name
         self._not = False
         self._param_placeholder = param_placeholder
+        self._prepare = []
+        self._cleanup = []
+        self._strategy = 'plain'
 
         if type(values_range) is SelectQuery:
             self._params = [p for p in values_range._params]
             self._subquery = values_range
         else:
-            self._params = values_range
+            values = list(values_range)
             self._subquery = None
+            self._strategy = in_list_strategy(dialect, len(values))
+            if self._strategy == 'array':
+                self._params = [values]
+            elif self._strategy == 'temp_table':
+                self._params = []
+                self._temp_table = self._make_temp_table(values, dialect)
+            else:
+                self._params = values
+
+    def _make_temp_table(self, values, dialect):
+        """
+        Заполнение временной таблицы значениями перед запросом
+        и её удаление после. Возвращается название таблицы.
+        """
+        statements = _TEMP_TABLES[dialect]
+        values = list(dict.fromkeys(values))
+        value = json.dumps([self._field_name, values], default=_typed_repr)
+        name = statements['name'].format(hashlib.sha1(value.encode()).hexdigest()[:16])
+        for create in statements['create']:
+            self._prepare.append((create.format(name=name, type=_temp_column_type(values)), None))
+        insert = f'INSERT INTO {name} (v) VALUES ({self._param_placeholder})'
+        self._prepare.append((insert, [(v, ) for v in values]))
+        self._cleanup.append(statements['drop'].format(name=name))
+        return name
 
     def __str__(self):
         operator = 'IN'
@@ -369,23 +612,52 @@ class InFilter:
 
         if self._subquery is not None:
             return f'{self._field_name} {operator} ({str(self._subquery)})'
-        else:
-            placeholder = self._param_placeholder
-            if self._params:
-                if placeholder == '?':
-                    params_list = ', '.join(placeholder*len(self._params))
-                    return f'{self._field_name} {operator} ({params_list})'
-                else:
-                    params_list = ', '.join([placeholder]*len(self._params))
-                return f'{self._field_name} {operator} ({placeholder})' % params_list
-            else:
-                return '1 = 1' if self._not else '1 = 2'
+
+        if not self._params and self._strategy != 'temp_table':
+            return '1 = 1' if self._not else '1 = 2'
+
+        field, placeholder = self._field_name, self._param_placeholder
+        if self._strategy == 'array':
+            if self.__class__._not:
+                return f'{field} <> ALL({placeholder})'
+            return f'{field} = ANY({placeholder})'
+        if self._strategy == 'temp_table':
+            return f'{field} {operator} (SELECT v FROM {self._temp_table})'
+        if self._strategy == 'batches':
+            size = IN_LIST_BATCH
+            parts = [
+                f'{field} {operator} ({_placeholders(placeholder, len(self._params[i:i + size]))})'
+                for i in range(0, len(self._params), size)
+            ]
+            op = ' AND ' if self.__class__._not else ' OR '
+            return f'({op.join(parts)})'
+        return f'{field} {operator} ({_placeholders(placeholder, len(self._params))})'
 
     def __neg__(self):
         self._not = not self._not
         return self
 
 
+def _placeholders(placeholder, n):
+    return ', '.join([placeholder]*n)
+
+
+def _temp_column_type(values):
+    """
+    Тип столбца временной таблицы для значений values.
+    """
+    types = {type(v) for v in values if v is not None}
+    if types and all(issubclass(t, int) and t is not bool for t in types):
+        return 'BIGINT'
+    if types and all(issubclass(t, (int, float)) and t is not bool for t in types):
+        return 'FLOAT'
+    if types and all(issubclass(t, datetime) for t in types):
+        return 'DATETIME2'
+    if types and all(issubclass(t, date) for t in types):
+        return 'DATE'
+    return 'NVARCHAR(4000)'
+
+
 class NotInFilter(InFilter):
     _not = True
 
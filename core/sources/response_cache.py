@@ -0,0 +1,119 @@
+"""
+Кэш http-ответов для условных запросов (ETag/Last-Modified).
+"""
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+#  макс. количество ответов, хранимых в памяти
+RESPONSE_CACHE_SIZE = 256
+
+
+class ResponseCache:
+    """
+    Кэш разобранных json-ответов с их ETag и Last-Modified.
+    Ответы хранятся в памяти (не более max_entries, вытесняются давно
+    не использовавшиеся) и, если задана директория path, - в файлах.
+
+    Значение в кэше - словарь с ключами etag, last_modified, data.
+    """
+    def __init__(self, path=None, max_entries=RESPONSE_CACHE_SIZE):
+        self._path = path
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._items.get(key, None)
+            if entry is not None:
+                self._items.move_to_end(key)
+                return entry
+        entry = self._load(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        self._remember(key, entry)
+        if self._path is not None:
+            file_path = self._file_path(key)
+            tmp_path = f'{file_path}.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, file_path)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+        if self._path is not None:
+            for name in os.listdir(self._path):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self._path, name))
+
+    def _remember(self, key, entry):
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def _load(self, key):
+        if self._path is None:
+            return None
+        try:
+            with open(self._file_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _file_path(self, key):
+        name = hashlib.sha1(key.encode()).hexdigest()
+        return os.path.join(self._path, f'{name}.json')
+
+
+def response_cache_key(url, params=None, headers=None, auth=None):
+    """
+    Ключ ответа в кэше - url, параметры запроса и хэш заголовков
+    и данных авторизации (ответы для разных пользователей различаются,
+    а сами заголовки и пароли в ключ не попадают).
+    """
+    params = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    headers = sorted((str(k).lower(), str(v)) for k, v in (headers or {}).items())
+    identity = json.dumps([headers, _auth_identity(auth)])
+    return json.dumps([url, params, hashlib.sha256(identity.encode()).hexdigest()])
+
+
+def _auth_identity(auth):
+    """
+    Данные авторизации в виде, пригодном для json:
+    кортеж (пользователь, пароль) либо атрибуты объекта авторизации requests.
+    """
+    if not auth:
+        return None
+    if isinstance(auth, (tuple, list)):
+        return [str(v) for v in auth]
+    if hasattr(auth, '__dict__'):
+        values = sorted((k, repr(v)) for k, v in vars(auth).items())
+        return [type(auth).__name__, values]
+    return repr(auth)
+
+
+_RESPONSE_CACHE = ResponseCache()
+
+
+def get_response_cache():
+    """
+    Общий для процесса кэш http-ответов.
+    """
+    return _RESPONSE_CACHE
+
+
+def set_response_cache(cache):
+    global _RESPONSE_CACHE
+    _RESPONSE_CACHE = cache
@@ -0,0 +1,121 @@
+"""
+Кэш результатов запросов по содержимому: запросы с одинаковым текстом
+и параметрами к одной и той же базе выполняются один раз.
+"""
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from .plan_cache import _typed_repr
+
+
+#  время хранения результатов в общем для процесса кэше по умолчанию (сек.)
+RESULT_TTL = 60
+
+
+class ResultCache:
+    """
+    Кэш результатов запросов.
+    Если запрос с тем же ключом уже выполняется (в другом потоке),
+    то вместо повторного выполнения ожидается его результат.
+
+    ttl - время хранения результатов в секундах (None - без ограничения),
+    max_entries - макс. количество хранимых результатов.
+    """
+    def __init__(self, ttl=None, max_entries=128):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items = OrderedDict()  # ключ: (время истечения либо None, результат)
+        self._inflight = {}  # ключ: Future выполняющегося запроса
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+
+    def get_or_execute(self, key, execute):
+        """
+        Результат из кэша, результат выполняющегося запроса с тем же ключом
+        либо результат execute(), который сохраняется в кэш.
+        """
+        with self._lock:
+            item = self._items.get(key, None)
+            if item is not None and not _expired(item[0]):
+                self._items.move_to_end(key)
+                self._hits += 1
+                return item[1]
+            future = self._inflight.get(key, None)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight[key] = future
+                self._misses += 1
+            else:
+                self._coalesced += 1
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            result = execute()
+        except BaseException as e:
+            with self._lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._inflight[key]
+            expires = None if self.ttl is None else time.monotonic() + self.ttl
+            self._items[key] = (expires, result)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+        future.set_result(result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    @property
+    def stats(self):
+        """
+        Количество попаданий, промахов и объединённых с выполняющимися запросов.
+        """
+        with self._lock:
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'coalesced': self._coalesced,
+            }
+
+
+def result_key(source_key, sql, params):
+    """
+    Ключ результата: хэш строки источника, текста запроса и параметров.
+    """
+    value = json.dumps([source_key, sql, list(params or [])], default=_typed_repr)
+    return hashlib.sha1(value.encode()).hexdigest()
+
+
+def _expired(expires):
+    return expires is not None and expires <= time.monotonic()
+
+
+_RESULT_CACHE = ResultCache(ttl=RESULT_TTL)
+
+
+def get_result_cache():
+    """
+    Общий для процесса кэш результатов - для использования результатов
+    одних отчётов при построении других.
+    """
+    return _RESULT_CACHE
+
+
+def set_result_cache(cache):
+    global _RESULT_CACHE
+    _RESULT_CACHE = cache
@@ -81,3 +81,11 @@ _CONSTRAINTS_QUERIES = {
     'mssql': _PG_MSSQL_CONSTR_Q,
     'mysql': _MYSQL_CONSTR_Q,
 }
+
+
+#  получение плана выполнения запроса ({} - текст запроса)
+_EXPLAIN_QUERIES = {
+    'postgres': 'EXPLAIN {}',
+    'mysql': 'EXPLAIN {}',
+    'sqlite': 'EXPLAIN QUERY PLAN {}',
+}
@@ -0,0 +1,206 @@
+"""
+Трассировка выполнения запросов: время подключения, формирования, выполнения
+запроса и получения данных, количество строк и их объём, планы медленных запросов.
+"""
+import sys
+import time
+import threading
+from contextlib import contextmanager
+
+
+#  этапы выполнения запроса, время которых учитывается
+TRACE_STAGES = ('connect', 'compile', 'execute', 'fetch')
+
+
+class QueryTrace:
+    """
+    Трассировка запросов, выполняемых при построении отчёта.
+
+    slow_threshold - время выполнения и получения данных (сек.), начиная с которого
+    запрос считается медленным; при explain=True для медленных запросов
+    сохраняется план выполнения (см. DatabaseSource.explain).
+    """
+    def __init__(self, slow_threshold=None, explain=False):
+        self.slow_threshold = slow_threshold
+        self.explain = explain
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def span(self, query_id, source_key=None):
+        """
+        Трассировка выполнения запроса query_id (TraceSpan); используется как
+        контекстный менеджер и по выходу из него сохраняется в трассировку.
+        """
+        return TraceSpan(query_id, source_key, trace=self)
+
+    def _add(self, span):
+        with self._lock:
+            self._spans.append(span)
+
+    @property
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    @property
+    def slow_queries(self):
+        return [s for s in self.spans if s.is_slow]
+
+    @property
+    def totals(self):
+        """
+        Суммарные значения по всем запросам.
+        """
+        spans = self.spans
+        totals = {stage: sum(s.timings[stage] for s in spans) for stage in TRACE_STAGES}
+        totals.update({
+            'queries': len(spans),
+            'cached': sum(1 for s in spans if s.cached),
+            'errors': sum(1 for s in spans if s.error is not None),
+            'slow': sum(1 for s in spans if s.is_slow),
+            'rows': sum(s.rows for s in spans),
+            'bytes': sum(s.bytes for s in spans),
+            'duration': sum(s.duration or 0.0 for s in spans),
+        })
+        return totals
+
+    def to_dict(self):
+        return {
+            'totals': self.totals,
+            'queries': [s.to_dict() for s in self.spans],
+        }
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class TraceSpan:
+    """
+    Трассировка выполнения одного запроса.
+    Без trace значения учитываются, но никуда не сохраняются
+    (и не подсчитывается объём данных).
+    """
+    def __init__(self, query_id=None, source_key=None, trace=None):
+        self.query_id = query_id
+        self.source_key = source_key
+        self.sql = None
+        self.timings = {stage: 0.0 for stage in TRACE_STAGES}
+        self.rows = 0
+        self.bytes = 0
+        self.cached = False  #  результат получен из кэша результатов
+        self.plan = None
+        self.error = None
+        self.started = None
+        self.duration = None
+        self._trace = trace
+        self._start = None
+
+    @property
+    def enabled(self):
+        return self._trace is not None
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        Учёт времени этапа stage (одного из TRACE_STAGES).
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    def add_rows(self, rows):
+        """
+        Учёт полученных строк (кортежей либо словарей).
+        """
+        self.rows += len(rows)
+        if self.enabled:
+            self.bytes += _rows_size(rows)
+
+    def add_result(self, result):
+        """
+        Учёт результата источника: DataQueryResult либо датафрейма.
+        """
+        if hasattr(result, 'memory_usage'):
+            self.rows += len(result)
+            if self.enabled:
+                self.bytes += int(result.memory_usage(deep=True).sum())
+            return
+        rows = getattr(result, 'rows', None)
+        if rows is None:
+            rows = getattr(result, 'data', None)
+        if isinstance(rows, list):
+            self.add_rows(rows)
+
+    @property
+    def is_slow(self):
+        threshold = self._trace.slow_threshold if self.enabled else None
+        if threshold is None:
+            return False
+        return self.timings['execute'] + self.timings['fetch'] >= threshold
+
+    @property
+    def needs_plan(self):
+        """
+        Нужно ли получить план выполнения запроса.
+        """
+        return self.enabled and self._trace.explain and self.plan is None and self.is_slow
+
+    def to_dict(self):
+        return {
+            'query_id': self.query_id,
+            'source': self.source_key,
+            'sql': self.sql,
+            'started': self.started,
+            'duration': self.duration,
+            **self.timings,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'cached': self.cached,
+            'slow': self.is_slow,
+            'plan': self.plan,
+            'error': self.error,
+        }
+
+    def __enter__(self):
+        self.started = time.time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.duration = time.perf_counter() - self._start
+        #  GeneratorExit - прекращение потокового получения данных, а не ошибка
+        if exc_value is not None and not isinstance(exc_value, GeneratorExit):
+            self.error = f'{exc_type.__name__}: {exc_value}'
+        if self._trace is not None:
+            self._trace._add(self)
+        return False
+
+
+#  количество строк, по которым оценивается объём результата
+SIZE_SAMPLE = 100
+
+
+def _rows_size(rows):
+    """
+    Примерный объём значений строк в памяти (байт).
+    Для больших результатов объём оценивается по равномерной выборке
+    из SIZE_SAMPLE строк.
+    """
+    count = len(rows)
+    if count <= SIZE_SAMPLE:
+        return _sample_size(rows)
+    step = count / SIZE_SAMPLE
+    sample = [rows[int(n * step)] for n in range(SIZE_SAMPLE)]
+    return int(_sample_size(sample) * count / SIZE_SAMPLE)
+
+
+def _sample_size(rows):
+    size = 0
+    for row in rows:
+        values = row.values() if isinstance(row, dict) else row
+        for value in values:
+            size += sys.getsizeof(value)
+    return size
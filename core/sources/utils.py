@@ -73,8 +73,9 @@ class Qbuilder:
 
     # В конструктов передаются:
     # словарь используемых в запросе таблиц вида {название таблицы: объект Table}
-    # и запрос в виде словаря
-    def __init__(self, tables, query, param_placeholder='%s', mssql=False):
+    # и запрос в виде словаря;
+    # dialect - тип источника, от которого зависит передача больших списков IN
+    def __init__(self, tables, query, param_placeholder='%s', mssql=False, dialect=None):
         self._source = None  # источник данных
         self._base = query['base']
         self._tables = tables  # словарь таблиц
@@ -83,8 +84,13 @@ class Qbuilder:
         self._filters_list = query.get('filters', [])  # список фильтров в запросе
         self._values_list = query.get('values', [])  # список запрашиваемых полей
         self._limit = query.get('limit', None)  #  limit в запросе
+        self._offset = query.get('offset', None)  #  смещение (вместе с limit)
+        self._seek = query.get('seek', [])  #  значения полей упорядочивания для keyset
         self._orderings = query.get('order_by', [])  # упорядочивание
+        self._group_by_list = query.get('group_by', [])  # поля группировки
+        self._aggregates_list = query.get('aggregates', [])  # агрегаты
         self._is_mssql = mssql
+        self._dialect = dialect
 
         try:
             int(self._limit)
@@ -137,7 +143,10 @@ class Qbuilder:
                     field_name = f'"{table_name}"."{field_name}"'
                 else:
                     field_name = f'{table_name}.{field_name}'
-                _filter = _filter(field_name, val, param_placeholder=self._param_placeholder)
+                kwargs = {'param_placeholder': self._param_placeholder}
+                if issubclass(_filter, query.InFilter):
+                    kwargs['dialect'] = self._dialect
+                _filter = _filter(field_name, val, **kwargs)
                 return query.Q(_filter)
         else:
             op = f['op'].lower()
@@ -175,10 +184,17 @@ class Qbuilder:
         values, orderings = self._parse_values(), self._parse_orderings()
         q = self._base_table.select().join(*joins).where(*filters).values(*values)
         q = q.order_by(*orderings)
+        q = q.group_by(*self._parse_group_by())
+        for func, field, name in self._parse_aggregates():
+            q.aggregate(func, field, name, dialect=self._dialect)
+        if self._seek:
+            q.seek(self._seek, self._param_placeholder)
 
         if self._limit is not None:
             l = self._limit
             q.limit(l) if not self._is_mssql else q.mssql_limit(l)
+            if self._offset is not None:
+                q.offset(self._offset)
         return q
 
     def _parse_values(self):
@@ -199,6 +215,31 @@ class Qbuilder:
             result.append((value, alias))
         return result
 
+    def _parse_group_by(self):
+        return [self._field_name(g['table'], g['field']) for g in self._group_by_list]
+
+    def _parse_aggregates(self):
+        """
+        Список агрегатов вида (функция, поле, название столбца в результате).
+        Название по умолчанию - 'функция(таблица.поле)'.
+        """
+        result = []
+        for a in self._aggregates_list:
+            func, table_name, field_name = a['func'], a['table'], a['field']
+            name = a.get('alias', None) or f'{func}({table_name}.{field_name})'
+            result.append((func, self._field_name(table_name, field_name), name))
+        return result
+
+    def _field_name(self, table_name, field_name):
+        """
+        Полное название поля с проверкой его наличия в таблице.
+        """
+        table = self._tables[table_name]
+        table.has_field(field_name)
+        if table.enquote:
+            return f'"{table._name}"."{field_name}"'
+        return f'{table._name}.{field_name}'
+
     def _parse_orderings(self):
         result = []
         for ordering in self._orderings:
@@ -1,10 +1,28 @@
 from noofa.tests.base import NoofaSuite, NoofaRunner
-from noofa.tests.builders.builder import TestBuilder
+from noofa.tests.builders.builder import (
+    TestBuilder,
+    TestChinookBuilder,
+    TestCachingBuilder,
+)
+from noofa.tests.builders.optimizer import (
+    TestUsageAnalyzer,
+    TestOptimizedBuild,
+    TestQueryPushdown,
+    TestQueryProjection,
+    TestAggregationPushdown,
+)
 
 
 def builders_suite():
     suite = NoofaSuite()
     suite.add(TestBuilder)
+    suite.add(TestChinookBuilder)
+    suite.add(TestCachingBuilder)
+    suite.add(TestUsageAnalyzer)
+    suite.add(TestOptimizedBuild)
+    suite.add(TestQueryPushdown)
+    suite.add(TestQueryProjection)
+    suite.add(TestAggregationPushdown)
     return suite
 
 
@@ -1,5 +1,18 @@
+import asyncio
+import unittest
+from copy import deepcopy
+
+from pandas.testing import assert_frame_equal
+
 from noofa.tests.base import NoofaTest
 from noofa.builders.builders import ReportBuilder
+from noofa.builders.caching import CachingReportBuilder
+from noofa.examples.examples import _chinook_db_file
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
 
 
 class TestBuilder(NoofaTest):
@@ -30,6 +43,193 @@ class TestBuilder(NoofaTest):
         self.assertTrue(success)
 
 
+class TestChinookBuilder(NoofaTest):
+    """
+    Тесты построения датафреймов по демонстрационной базе chinook.
+    """
+    def setUp(self):
+        self.conf = {'data_config': _chinook_conf()}
+
+    def test_build_query_dataframe(self):
+        rb = ReportBuilder(**self.conf)
+        df = rb.get_or_build_dataframe('tracks')
+        self.assertEqual(df.shape, (3503, 12))
+        self.assertEqual(df['tracks.TrackId'].tolist()[:3], [1, 2, 3])
+
+    def test_streaming(self):
+        expected = ReportBuilder(**self.conf).get_or_build_dataframe('tracks')
+        rb = ReportBuilder(fetch_batch_size=1000, **self.conf)
+        df = rb.get_or_build_dataframe('tracks')
+        assert_frame_equal(df, expected)
+        self.assertNotIn('tracks', rb._results)
+
+    def test_prefetch(self):
+        rb = ReportBuilder(**self.conf)
+        fetched = rb.prefetch(per_source=1)
+        self.assertCountEqual(fetched, ['tracks', 'artists'])
+        self.assertEqual(len(rb._results['artists']), 275)
+        expected = ReportBuilder(**self.conf).get_or_build_dataframe('tracks')
+        assert_frame_equal(rb.get_or_build_dataframe('tracks'), expected)
+        self.assertEqual(rb.prefetch(), [])
+
+    def test_prefetch_on_build(self):
+        rb = ReportBuilder(prefetch=True, **self.conf)
+        self.assertEqual(rb._results, {})
+        rb.get_or_build_dataframe('artists')
+        self.assertIn('tracks', rb._results)
+
+    def test_abuild(self):
+        conf = {
+            **self.conf,
+            'components_config': {
+                'tracks_table': {
+                    'id': 'tracks_table',
+                    'type': 'table',
+                    'base': {'from': 'dataframe', 'value': 'tracks'},
+                    'title_text': 'Tracks',
+                },
+            },
+        }
+        rb = ReportBuilder(**conf)
+        components = asyncio.run(rb.abuild())
+        self.assertEqual(list(components), ['tracks_table'])
+        self.assertEqual(components['tracks_table'].df.shape, (3503, 12))
+        self.assertIn('artists', rb._results)
+
+    def test_paged_table(self):
+        conf = {
+            **self.conf,
+            'components_config': {
+                'tracks_table': {
+                    'id': 'tracks_table',
+                    'type': 'table',
+                    'base': {'from': 'dataframe', 'value': 'tracks'},
+                    'title_text': 'Tracks',
+                },
+            },
+        }
+        conf['data_config']['dataframes']['tracks']['filters'] = [
+            {'from': 'json', 'value': {'is_q': False, 'col_name': 'tracks.GenreId', 'op': '==', 'value': 1}},
+        ]
+        expected = ReportBuilder(**deepcopy(conf)).get_or_build_dataframe('tracks')
+        rb = ReportBuilder(**deepcopy(conf))
+        table = rb.build_table('tracks_table', page=3, per_page=20)
+        self.assertEqual(table.total, len(expected))
+        assert_frame_equal(table.df, expected.iloc[40:60].reset_index(drop=True))
+        self.assertNotIn('tracks', rb._built_dataframes)
+
+        #  при упорядочивании в датафрейме он строится целиком
+        conf['data_config']['dataframes']['tracks']['ordering'] = [
+            {'cols': 'tracks.Name', 'asc': True},
+        ]
+        expected = ReportBuilder(**deepcopy(conf)).get_or_build_dataframe('tracks')
+        rb = ReportBuilder(**deepcopy(conf))
+        table = rb.build_table('tracks_table', page=2, per_page=10)
+        assert_frame_equal(table.df, expected.iloc[10:20])
+        self.assertEqual(table.total, len(expected))
+
+    def test_keyset(self):
+        conf = _chinook_conf()
+        conf['queries']['tracks']['value'].update({'seek': [10], 'limit': 5})
+        df = ReportBuilder(data_config=conf).get_or_build_dataframe('tracks')
+        self.assertEqual(df['tracks.TrackId'].tolist(), [11, 12, 13, 14, 15])
+
+    def test_prefetch_skips_failed(self):
+        conf = _chinook_conf()
+        conf['queries']['artists']['value'] = 'sql_select("no_such_table")'
+        rb = ReportBuilder(data_config=conf)
+        self.assertEqual(rb.prefetch(), ['tracks'])
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis не установлен')
+class TestCachingBuilder(NoofaTest):
+    """
+    Тесты формирователя отчётов с кэшированием в redis.
+    """
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.expected = ReportBuilder(data_config=_chinook_conf()).get_or_build_dataframe('tracks')
+
+    def _builder(self, **kwargs):
+        return CachingReportBuilder(
+            redis_connection=fakeredis.FakeRedis(server=self.server),
+            data_config=_chinook_conf(),
+            **kwargs,
+        )
+
+    def test_prefetch(self):
+        rb = self._builder(prefetch=True)
+        df = rb.get_or_build_dataframe('tracks')
+        assert_frame_equal(df, self.expected)
+        self.assertIsNotNone(rb.get_cached_query_result('tracks'))
+        self.assertEqual(len(rb.get_data('artists')), 275)
+        self.assertIsNotNone(rb.get_cached_query_result('artists'))
+
+        #  результаты запросов - из кэша
+        rb = self._builder(prefetch=True)
+        self.assertEqual(rb.prefetch(), [])
+        self.assertEqual(len(rb.get_data('artists').data), 275)
+        assert_frame_equal(rb.get_or_build_dataframe('tracks'), self.expected)
+
+    def test_abuild(self):
+        rb = self._builder()
+        asyncio.run(rb.abuild())
+        data = rb.get_data('tracks')
+        self.assertEqual(len(data), 3503)
+        self.assertIsNotNone(rb.get_cached_query_result('tracks'))
+
+
+def _chinook_conf():
+    return {
+        'sources': {
+            'chinook': {
+                'id': 'chinook',
+                'type': 'sqlite',
+                'name': 'chinook',
+                'from': 'json',
+                'value': {'dbname': _chinook_db_file},
+            },
+        },
+        'queries': {
+            'tracks': {
+                'id': 'tracks',
+                'name': 'tracks',
+                'from': 'json',
+                'source': 'chinook',
+                'value': {
+                    'base': 'tracks',
+                    'tables': ['tracks', 'albums'],
+                    'joins': [
+                        {'l': 'tracks', 'r': 'albums', 'j': 'inner', 'on': {'l': 'AlbumId', 'r': 'AlbumId'}},
+                    ],
+                    'order_by': [{'table': 'tracks', 'fields': ['TrackId'], 'type': 'asc'}],
+                },
+            },
+            'artists': {
+                'id': 'artists',
+                'name': 'artists',
+                'from': 'expression',
+                'source': 'chinook',
+                'value': 'sql_select("artists")',
+            },
+        },
+        'dataframes': {
+            'tracks': {
+                'id': 'tracks',
+                'name': 'tracks',
+                'base': {'type': 'query', 'source': 'chinook', 'value': 'tracks'},
+                'ordering': [],
+            },
+            'artists': {
+                'id': 'artists',
+                'name': 'artists',
+                'base': {'type': 'query', 'source': 'chinook', 'value': 'artists'},
+                'ordering': [],
+            },
+        },
+    }
+
+
 def _sources_conf():
     return {
         'src1': {
@@ -0,0 +1,384 @@
+import os
+import tempfile
+from copy import deepcopy
+from decimal import Decimal
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from noofa.tests.base import NoofaTest
+from noofa.builders.builders import ReportBuilder
+from noofa.builders.optimizer import (
+    UsageAnalyzer,
+    pushable_filters,
+    query_filters,
+    filtered_key,
+    grouped_frame,
+)
+from noofa.tests.builders.builder import _chinook_conf
+
+
+class TestUsageAnalyzer(NoofaTest):
+    """
+    Тесты определения используемых столбцов датафреймов.
+    """
+    def setUp(self):
+        self.data_config = {
+            'dataframes': {
+                'df1': {
+                    'id': 'df1',
+                    'name': 'df1',
+                    'base': {'type': 'source', 'source': 'csv', 'value': 'csv'},
+                    'filters': [
+                        {'from': 'json', 'value': {'is_q': False, 'col_name': 'amount', 'op': '>', 'value': 1}},
+                    ],
+                    'ordering': [],
+                },
+            },
+        }
+        self.figure = {
+            'id': 'fig1',
+            'type': 'figure',
+            'figure_type': 'bar',
+            'base': {'from': 'dataframe', 'value': {'dataframe': 'df1'}, 'x': 'city', 'y': 'amount'},
+        }
+
+    def test_used_columns(self):
+        analyzer = UsageAnalyzer(self.data_config, {'fig1': self.figure})
+        columns = analyzer.used_columns('df1')
+        self.assertTrue({'city', 'amount'} <= columns)
+        self.assertNotIn('id', columns)
+
+    def test_expression_usage(self):
+        pie = {
+            'id': 'pie1',
+            'type': 'figure',
+            'base': {'from': 'list', 'value': [{'name': 'a', 'value': 'sum(df1["code"])'}]},
+        }
+        analyzer = UsageAnalyzer(self.data_config, {'fig1': self.figure, 'pie1': pie})
+        self.assertIn('code', analyzer.used_columns('df1'))
+
+    def test_all_columns(self):
+        table = {'id': 't1', 'type': 'table', 'base': {'from': 'dataframe', 'value': 'df1'}}
+        analyzer = UsageAnalyzer(self.data_config, {'fig1': self.figure, 't1': table})
+        self.assertIsNone(analyzer.used_columns('df1'))
+        self.assertIsNone(UsageAnalyzer(self.data_config).used_columns('df1'))
+
+        data_config = {**self.data_config}
+        data_config['dataframes'] = {
+            **self.data_config['dataframes'],
+            'df2': {'id': 'df2', 'base': {'type': 'expression', 'value': 'df_head(df1, 5)'}},
+        }
+        analyzer = UsageAnalyzer(data_config, {'fig1': self.figure})
+        self.assertIsNone(analyzer.used_columns('df1'))
+
+
+class TestOptimizedBuild(NoofaTest):
+    """
+    Тесты построения датафреймов по csv-файлу с оптимизацией чтения.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        path = os.path.join(self.tmp.name, 'data.csv')
+        lines = ['id;city;amount;code']
+        for n in range(50):
+            lines.append(f'{n};city{n % 5};{n};{n % 3}')
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines))
+
+        self.conf = {
+            'data_config': {
+                'sources': {
+                    'csv': {
+                        'id': 'csv', 'name': 'csv', 'type': 'csv', 'from': 'json',
+                        'value': {'path': path, 'chunksize': 20},
+                    },
+                },
+                'dataframes': {
+                    'df1': {
+                        'id': 'df1',
+                        'name': 'df1',
+                        'base': {'type': 'source', 'source': 'csv', 'value': 'csv'},
+                        'dtypes': [{'col': 'city', 'dtype': 'category'}],
+                        'filters': [
+                            {'from': 'json', 'value': {'is_q': False, 'col_name': 'amount', 'op': '>=', 'value': 25}},
+                        ],
+                        'ordering': [],
+                    },
+                },
+            },
+            'components_config': {
+                'fig1': {
+                    'id': 'fig1',
+                    'type': 'figure',
+                    'figure_type': 'bar',
+                    'base': {'from': 'dataframe', 'value': {'dataframe': 'df1'}, 'x': 'city', 'y': 'amount'},
+                },
+            },
+        }
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_pushable_filters(self):
+        rb = ReportBuilder(**self.conf)
+        filters = pushable_filters(rb.get_dataframe('df1'))
+        self.assertEqual([f['col_name'] for f in filters], ['amount'])
+
+    def test_optimized_build(self):
+        expected = ReportBuilder(**self.conf).get_or_build_dataframe('df1')
+        df = ReportBuilder(optimize=True, **self.conf).get_or_build_dataframe('df1')
+        self.assertEqual(list(df.columns), ['city', 'amount'])
+        self.assertEqual(str(df['city'].dtype), 'category')
+        assert_frame_equal(df, expected[['city', 'amount']])
+
+    def test_str_dtypes(self):
+        path = os.path.join(self.tmp.name, 'codes.csv')
+        with open(path, 'w') as f:
+            f.write('code;price;n\n007;1.50;1\n010;2.25;2')
+        conf = deepcopy(self.conf)
+        conf['data_config']['sources']['csv']['value'] = {'path': path}
+        conf['data_config']['dataframes']['df1'].update({
+            'dtypes': [
+                {'col': 'code', 'dtype': 'str'},
+                {'col': 'price', 'dtype': 'str'},
+                {'col': 'n', 'dtype': 'category'},
+            ],
+            'filters': [],
+        })
+        conf['components_config'] = {}
+        expected = ReportBuilder(**deepcopy(conf)).get_or_build_dataframe('df1')
+        self.assertEqual(expected.iloc[0][['code', 'price']].tolist(), ['7', '1.5'])
+        self.assertEqual(expected['n'].cat.categories.tolist(), [1, 2])
+        for cache in (False, True):
+            conf['data_config']['sources']['csv']['value']['cache'] = cache
+            df = ReportBuilder(optimize=True, **deepcopy(conf)).get_or_build_dataframe('df1')
+            assert_frame_equal(df, expected)
+
+
+class TestQueryPushdown(NoofaTest):
+    """
+    Тесты переноса фильтров датафреймов в sql-запросы.
+    """
+    def setUp(self):
+        self.filters = [
+            {'is_q': False, 'col_name': 'tracks.GenreId', 'op': 'in', 'value': [1, 3]},
+            {'is_q': True, 'op': 'or', 'filters': [
+                {'is_q': False, 'col_name': 'albums.Title', 'op': 'contains', 'value': 'Live'},
+                {'is_q': False, 'col_name': 'tracks.Milliseconds', 'op': '>', 'value': 400000},
+            ]},
+            {'is_q': False, 'col_name': 'tracks.Name', 'op': 'startswith', 'value': 'a'},
+        ]
+        conf = _chinook_conf()
+        conf['dataframes']['tracks']['filters'] = [
+            {'from': 'json', 'value': f} for f in self.filters
+        ]
+        self.conf = {'data_config': conf}
+
+    def test_query_filters(self):
+        query = _chinook_conf()['queries']['tracks']['value']
+        result = query_filters(query, self.filters)
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['table'], 'tracks')
+        self.assertEqual(result[1]['op'], 'or')
+        self.assertEqual(result[1]['filters'][0]['field'], 'Title')
+        self.assertEqual(query_filters({**query, 'limit': 10}, self.filters), [])
+
+        regex = [{'is_q': False, 'col_name': 'albums.Title', 'op': 'contains', 'value': 'Li.e'}]
+        self.assertEqual(query_filters(query, regex), [])
+
+    def test_query_filters_values(self):
+        query = {
+            'base': 'tracks',
+            'values': [
+                {'table': 'tracks', 'field': 'TrackId', 'alias': 'id'},
+                {'table': 'tracks', 'field': 'Name'},
+            ],
+        }
+        filters = [
+            {'is_q': False, 'col_name': 'id', 'op': '<', 'value': 5},
+            {'is_q': False, 'col_name': 'tracks.Name', 'op': '==', 'value': 'x'},
+            {'is_q': False, 'col_name': 'tracks.GenreId', 'op': '==', 'value': 1},
+        ]
+        result = query_filters(query, filters)
+        self.assertEqual([(f['table'], f['field']) for f in result], [('tracks', 'TrackId'), ('tracks', 'Name')])
+
+        #  сравнения строк выполняются только в датафрейме
+        ranges = [{'is_q': False, 'col_name': 'tracks.Name', 'op': op, 'value': 'b'} for op in ('>', '<=')]
+        self.assertEqual(query_filters(query, ranges), [])
+        ranges = [{'is_q': True, 'op': 'or', 'filters': [filters[0], ranges[0]]}]
+        self.assertEqual(query_filters(query, ranges), [])
+
+    def test_pushdown_build(self):
+        expected = ReportBuilder(**self.conf).get_or_build_dataframe('tracks')
+        rb = ReportBuilder(optimize=True, **self.conf)
+        df = rb.get_or_build_dataframe('tracks')
+        assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True))
+        self.assertNotIn('tracks', rb._results)
+
+        query = _chinook_conf()['queries']['tracks']['value']
+        key = filtered_key('tracks', query_filters(query, self.filters))
+        self.assertLess(len(rb._results[key]), 3503)
+        self.assertIn('WHERE', str(rb._compiled_queries[key]))
+
+    def test_pushdown_streaming(self):
+        expected = ReportBuilder(**self.conf).get_or_build_dataframe('tracks')
+        rb = ReportBuilder(optimize=True, fetch_batch_size=100, **self.conf)
+        df = rb.get_or_build_dataframe('tracks')
+        assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True))
+
+    def test_unknown_field(self):
+        conf = _chinook_conf()
+        conf['dataframes']['tracks']['filters'] = [
+            {'from': 'json', 'value': {'is_q': False, 'col_name': 'tracks.Nothing', 'op': '==', 'value': 1}},
+        ]
+        rb = ReportBuilder(optimize=True, data_config=conf)
+        with self.assertRaises(KeyError):
+            rb.get_or_build_dataframe('tracks')
+        self.assertIn('tracks', rb._results)
+
+
+class TestQueryProjection(NoofaTest):
+    """
+    Тесты запроса только используемых столбцов.
+    """
+    def setUp(self):
+        self.conf = {
+            'data_config': _chinook_conf(),
+            'components_config': {
+                'fig1': {
+                    'id': 'fig1',
+                    'type': 'figure',
+                    'figure_type': 'bar',
+                    'base': {
+                        'from': 'dataframe',
+                        'value': {'dataframe': 'tracks'},
+                        'x': 'albums.Title',
+                        'y': 'tracks.Milliseconds',
+                    },
+                },
+            },
+        }
+
+    def test_query_columns(self):
+        analyzer = UsageAnalyzer(self.conf['data_config'], self.conf['components_config'])
+        self.assertTrue({'albums.Title', 'tracks.Milliseconds'} <= analyzer.query_columns('tracks'))
+        self.assertIsNone(analyzer.query_columns('artists'))
+
+    def test_projected_build(self):
+        expected = ReportBuilder(**self.conf).get_or_build_dataframe('tracks')
+        rb = ReportBuilder(optimize=True, **self.conf)
+        df = rb.get_or_build_dataframe('tracks')
+        self.assertEqual(list(df.columns), ['tracks.Milliseconds', 'albums.Title'])
+        assert_frame_equal(df, expected[list(df.columns)])
+        self.assertEqual(rb.get_or_build_dataframe('artists').shape, (275, 2))
+
+    def test_shared_query(self):
+        conf = self.conf['data_config']
+        conf['dataframes']['tracks2'] = {
+            'id': 'tracks2',
+            'name': 'tracks2',
+            'base': {'type': 'query', 'source': 'chinook', 'value': 'tracks'},
+            'ordering': [],
+        }
+        rb = ReportBuilder(optimize=True, **self.conf)
+        self.assertEqual(rb.get_or_build_dataframe('tracks').shape, (3503, 12))
+
+
+class TestAggregationPushdown(NoofaTest):
+    """
+    Тесты выполнения группировки в sql-запросах.
+    """
+    def setUp(self):
+        self.data_config = _chinook_conf()
+        self.data_config['dataframes']['tracks']['filters'] = [
+            {'from': 'json', 'value': {'is_q': False, 'col_name': 'tracks.GenreId', 'op': 'in', 'value': [1, 2, 3, 4]}},
+        ]
+        self.components_config = {
+            'pivot1': {
+                'id': 'pivot1',
+                'type': 'pivot_table',
+                'base': {'from': 'dataframe', 'value': 'tracks'},
+                'pivot_conf': {
+                    'index': ['albums.ArtistId'],
+                    'columns': ['tracks.GenreId'],
+                    'aggfunc': {'tracks.Milliseconds': ['count'], 'tracks.Bytes': ['max']},
+                    'fill_value': 0,
+                    'margins': True,
+                },
+            },
+            'bar1': {
+                'id': 'bar1',
+                'type': 'figure',
+                'figure_type': 'bar',
+                'base': {
+                    'from': 'agg',
+                    'value': {
+                        'dataframe': 'tracks',
+                        'groupby': ['tracks.GenreId'],
+                        'on': 'tracks.Milliseconds',
+                        'func': 'mean',
+                    },
+                    'barmode': 'group',
+                },
+            },
+        }
+
+    def _builders(self):
+        #  конфигурация компонентов изменяется при добавлении в схему
+        conf = {'data_config': self.data_config, 'components_config': self.components_config}
+        return ReportBuilder(**deepcopy(conf)), ReportBuilder(optimize=True, **deepcopy(conf))
+
+    def test_aggregate(self):
+        rb, optimized = self._builders()
+        df = rb.get_or_build_dataframe('tracks')
+        for func in ('count', 'sum', 'mean', 'min', 'max'):
+            with self.subTest(func):
+                groupby = ['albums.ArtistId', 'tracks.GenreId']
+                expected = df.groupby(groupby).agg({'tracks.Milliseconds': func})
+                grouped = optimized.aggregate('tracks', groupby, {'tracks.Milliseconds': func})
+                assert_frame_equal(grouped, expected, check_dtype=False)
+        self.assertNotIn('tracks', optimized._built_dataframes)
+        self.assertNotIn('tracks', optimized._results)
+        self.assertIsNone(rb.aggregate('tracks', ['tracks.GenreId'], {'tracks.Bytes': 'sum'}))
+
+    def test_not_applicable(self):
+        _, optimized = self._builders()
+        self.assertIsNone(optimized.aggregate('tracks', ['tracks.GenreId'], {'tracks.Bytes': 'median'}))
+        self.assertIsNone(optimized.aggregate('tracks', ['tracks.GenreId'], {'tracks.GenreId': 'count'}))
+        self.data_config['dataframes']['tracks']['filters'].append(
+            {'from': 'json', 'value': {'is_q': False, 'col_name': 'albums.Title', 'op': '==', 'value': 'x'}},
+        )
+        _, optimized = self._builders()
+        self.assertIsNone(optimized.aggregate('tracks', ['tracks.GenreId'], {'tracks.Bytes': 'sum'}))
+
+    def test_grouped_frame(self):
+        df = DataFrame({
+            'g': [1, 2],
+            'total': [Decimal('10'), Decimal('3')],
+            'avg': [Decimal('2.5'), 3],
+            'top': [Decimal('1.5'), Decimal('2')],
+        })
+        grouped = grouped_frame(df, ['g'], {'total': 'sum', 'avg': 'mean', 'top': 'max'})
+        self.assertEqual(str(grouped['total'].dtype), 'int64')
+        self.assertEqual(str(grouped['avg'].dtype), 'float64')
+        self.assertEqual(grouped['top'].tolist(), [1.5, 2.0])
+
+        #  строки сравниваются по правилам источника - группировка в pandas
+        df = DataFrame({'g': [1], 'name': ['b']})
+        self.assertIsNone(grouped_frame(df, ['g'], {'name': 'max'}))
+
+    def test_pivot_table(self):
+        rb, optimized = self._builders()
+        expected = rb.build_table('pivot1').pivot_df
+        pivot = optimized.build_table('pivot1')
+        assert_frame_equal(pivot.pivot_df, expected, check_dtype=False)
+        self.assertNotIn('tracks', optimized._built_dataframes)
+
+    def test_bar(self):
+        rb, optimized = self._builders()
+        expected = rb.build_component('bar1').figure.to_dict()['data']
+        figure = optimized.build_component('bar1').figure.to_dict()['data']
+        self.assertEqual(list(figure[0]['x']), list(expected[0]['x']))
+        self.assertEqual(list(figure[0]['y']), list(expected[0]['y']))
+        self.assertNotIn('tracks', optimized._built_dataframes)
@@ -3,6 +3,11 @@ from noofa.tests.func.interpreter import (
     TestInterpreter,
     TestOperators,
     TestOperatorsClasses,
+    TestSyntaxTreeCache,
+    TestFormulaCompiler,
+    TestVectorizedApply,
+    TestFormulaLexer,
+    TestParser,
 )
 from noofa.tests.func.context import TestContext
 from noofa.tests.func.math import TestMathFunctions
@@ -22,6 +27,11 @@ def func_suite():
     suite.add(TestOperators)
     suite.add(TestOperatorsClasses)
     suite.add(TestInterpreter)
+    suite.add(TestSyntaxTreeCache)
+    suite.add(TestFormulaCompiler)
+    suite.add(TestVectorizedApply)
+    suite.add(TestFormulaLexer)
+    suite.add(TestParser)
     suite.add(TestContext)
     suite.add(TestMathFunctions)
     suite.add(TestDatastructFunctions)
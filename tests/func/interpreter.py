@@ -1,7 +1,21 @@
+import random
+
 from pandas import DataFrame
 
 from noofa.tests.base import NoofaTest, NoofaInterpreterTest
 from noofa.core.func import operators as O
+from noofa.core.func import interpreter as interpreter_module
+from noofa.core.func.interpreter import Interpreter
+from noofa.core.func.base import Func, MandatoryArg
+from noofa.core.func.parser import FormulaLexer, RuleLexer, parse
+from noofa.core.func.vectorize import Vectorizer, NotVectorizable
+from noofa.core.func.tree_cache import (
+    SyntaxTreeCache,
+    get_tree_cache,
+    set_tree_cache,
+    get_compiled_cache,
+    set_compiled_cache,
+)
 from noofa.core.func.errors import (
     NotEnoughArguments,
     ArgumentTypeError,
@@ -370,3 +384,346 @@ class TestOperatorsClasses(NoofaTest):
     def test_or_raises_nea(self):
         op = O.Or(True)
         self.assertRaises(NotEnoughArguments, op)
+
+
+class TestSyntaxTreeCache(NoofaTest):
+    """
+    Тестирование кэша синтаксических деревьев формул.
+    """
+    def setUp(self):
+        self._default_cache = get_tree_cache()
+        self._default_compiled_cache = get_compiled_cache()
+        self.cache = SyntaxTreeCache(max_entries=2)
+        set_tree_cache(self.cache)
+        set_compiled_cache(None)
+
+    def tearDown(self):
+        set_tree_cache(self._default_cache)
+        set_compiled_cache(self._default_compiled_cache)
+
+    def test_shared(self):
+        calls = []
+        parse = interpreter_module.parse
+
+        def counting_parse(expression):
+            calls.append(expression)
+            return parse(expression)
+
+        interpreter_module.parse = counting_parse
+        try:
+            self.assertEqual(Interpreter().evaluate('2 + 3 * 5'), 17)
+            self.assertEqual(Interpreter().evaluate('2 + 3 * 5'), 17)
+            self.assertEqual(Interpreter().evaluate('2 + 3 * 5;'), 17)
+        finally:
+            interpreter_module.parse = parse
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.cache.stats, {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3, 'size': 1})
+
+    def test_apply(self):
+        df = DataFrame({'a': [1, 2, 3]})
+        result = Interpreter().apply(df, 'row["a"] * idx', vectorize=False)
+        self.assertEqual(result, [0, 2, 6])
+        self.assertEqual(self.cache.stats['misses'], 1)
+        self.assertEqual(self.cache.stats['hits'], 2)
+
+    def test_lru(self):
+        interpreter = Interpreter()
+        for expression in ('1', '2', '1', '3'):
+            interpreter.evaluate(expression)
+        self.assertIsNotNone(self.cache.get('1;'))
+        self.assertIsNone(self.cache.get('2;'))
+        self.assertEqual(self.cache.stats['size'], 2)
+
+    def test_errors_not_cached(self):
+        interpreter = Interpreter()
+        for _ in range(2):
+            self.assertRaises(ExpressionSyntaxError, interpreter.evaluate, '1..2')
+        self.assertEqual(self.cache.stats['size'], 0)
+
+    def test_disabled(self):
+        set_tree_cache(None)
+        self.assertEqual(Interpreter().evaluate('(2 + 3) * 5'), 25)
+
+
+class TestFormulaCompiler(NoofaTest):
+    """
+    Тестирование компиляции формул.
+    """
+    def setUp(self):
+        self._default_cache = get_compiled_cache()
+        self.cache = SyntaxTreeCache()
+        set_compiled_cache(self.cache)
+        self.interpreter = Interpreter(df=DataFrame({'a': [1, 2]}))
+
+    def tearDown(self):
+        set_compiled_cache(self._default_cache)
+
+    def test_same_results(self):
+        cases = [
+            '2 + 3 * 5 - 1',
+            '-5 + (-1)',
+            '(2 + 3) / 5',
+            '1 <= 2 & 2 > 1 | false()',
+            '"a" + concat("b", "c")',
+            'round(sum(1.25, 2, 3), 1)',
+            'df["a"]',
+            'len(upper("abc"))',
+        ]
+        for case in cases:
+            with self.subTest(i=case):
+                expression = f'{case};'
+                stree = self.interpreter._get_tree(expression)
+                expected = self.interpreter._eval(stree)()
+                result = self.interpreter.evaluate(case)
+                if isinstance(expected, DataFrame):
+                    self.assertTrue(result.equals(expected))
+                else:
+                    self.assertEqual(result, expected)
+
+    def test_cached(self):
+        formula = self.interpreter.compile('1 + 2;')
+        self.assertIs(Interpreter().compile('1 + 2;'), formula)
+        self.assertEqual(self.cache.stats['size'], 1)
+        self.assertEqual(self.interpreter.evaluate('1 + 2'), 3)
+
+    def test_errors(self):
+        #  количество аргументов проверяется при компиляции
+        self.assertRaises(NotEnoughArguments, self.interpreter.compile, 'concat();')
+        self.assertEqual(self.cache.stats['size'], 0)
+        formula = self.interpreter.compile('upper(x);')
+        self.interpreter.add_to_global('x', 1)
+        self.assertRaises(ArgumentTypeError, formula, self.interpreter._context)
+        self.interpreter.add_to_global('x', 'a')
+        self.assertEqual(formula(self.interpreter._context), 'A')
+        self.assertRaises(ArgumentTypeError, self.interpreter.evaluate, '"a" * 2')
+
+    def test_custom_call(self):
+        class Twice(Func):
+            description = 'Удвоение'
+            args_description = [MandatoryArg('x', 0, [int])]
+
+            def __call__(self):
+                return self._args[0] * 2
+
+        interpreter = Interpreter()
+        interpreter._functions_dict['twice'] = Twice
+        self.assertEqual(interpreter.compile('twice(2 + 1);')(interpreter._context), 6)
+
+    def test_custom_functions_not_shared(self):
+        class Triple(Func):
+            description = 'Утроение'
+            args_description = [MandatoryArg('x', 0, [int])]
+            operation = lambda x: x * 3
+
+        custom = Interpreter()
+        custom._functions_dict['abs'] = Triple
+        self.assertEqual(custom.evaluate('abs(-2)'), -6)
+        self.assertEqual(Interpreter().evaluate('abs(-2)'), 2)
+        self.assertEqual(custom.evaluate('abs(-2)'), -6)
+        self.assertEqual(self.cache.stats['size'], 1)
+
+        #  формулы со стандартным словарём функций - в общем кэше
+        formula = Interpreter().compile('abs(-2);')
+        self.assertIs(Interpreter().compile('abs(-2);'), formula)
+
+
+class TestVectorizedApply(NoofaTest):
+    """
+    Тестирование векторного вычисления формул в Interpreter.apply.
+    """
+    def setUp(self):
+        self.df = DataFrame({
+            'price': [1.5, 2.0, 0.25, 10.0],
+            'qty': [2, 0, 4, -3],
+            'name': ['Abc', 'de', 'xyZ', ''],
+            'flag': [True, False, True, False],
+            'mixed': [1, 'a', None, 2.5],
+        })
+        self.interpreter = Interpreter(k=10)
+
+    def assertSameAsRows(self, expr):
+        expected = self.interpreter.apply(self.df, expr, vectorize=False)
+        result = self.interpreter.apply(self.df, expr)
+        self.assertEqual(result, expected, expr)
+        self.assertEqual([type(v) for v in result], [type(v) for v in expected], expr)
+        return expected
+
+    def vectorize(self, expr):
+        stree = self.interpreter._get_tree(expr + ';')
+        vectorizer = Vectorizer(self.interpreter._functions_dict, self.interpreter._operators_dict)
+        return vectorizer.evaluate(stree, self.df, self.interpreter._context)
+
+    def test_vectorized(self):
+        expressions = (
+            'row["price"] * row["qty"] + 1',
+            '-row["qty"] + k * idx',
+            'row["price"] / 2 - row["qty"]',
+            'if(row["qty"] > 0, row["price"], 0.0)',
+            'if(row["qty"] > 0, row["qty"], 0)',
+            'if(row["flag"] & row["qty"] >= 2, "yes", "no")',
+            'row["name"] == "de" | row["qty"] < 0',
+            'concat(upper(row["name"]), "_", to_str(idx))',
+            'len(row["name"]) + abs(row["qty"])',
+            'startswith(lower(row["name"]), "a")',
+            'contains(row["name"], "y")',
+            'floor(row["price"]) + ceil(row["price"])',
+            'sqrt(row["price"])',
+            'to_int(row["price"]) + to_float(row["qty"])',
+            'k + 1',
+        )
+        for expr in expressions:
+            self.vectorize(expr)
+            self.assertSameAsRows(expr)
+        self.assertEqual(
+            self.assertSameAsRows('if(row["qty"] > 0, row["price"], 0)'),
+            [1.5, 0, 0.25, 0],
+        )
+        result = self.assertSameAsRows('if(row["qty"] > 0, row["qty"], 0.5)')
+        self.assertEqual([type(v) for v in result], [int, float, int, float])
+
+    def test_fallback(self):
+        expressions = (
+            'row["mixed"] + 1',
+            'row["price"] / row["qty"]',
+            'round(row["price"], 1)',
+            'to_str(row["price"])',
+            'row',
+            'sqrt(0 - row["qty"])',
+            'if(row["qty"] > 0, row["qty"], 0.5)',
+            'if(row["qty"] > 0, row["flag"], 1)',
+        )
+        for expr in expressions:
+            self.assertRaises(NotVectorizable, self.vectorize, expr)
+        self.assertEqual(
+            self.interpreter.apply(self.df, 'round(row["price"], 1)'),
+            [1.5, 2.0, 0.2, 10.0],
+        )
+        self.assertRaises(ZeroDivisionError, self.interpreter.apply, self.df, 'row["price"] / row["qty"]')
+        self.assertRaises(ArgumentTypeError, self.interpreter.apply, self.df, 'row["name"] * 2')
+        self.assertRaises(InterpreterContextError, self.interpreter.apply, self.df, 'row["price"] + unknown')
+
+    def test_int64_overflow(self):
+        self.df = DataFrame({'i': [10 ** 18, 3], 'm': [-2 ** 63, 1]})
+        expressions = (
+            'row["i"] * row["i"]',
+            'row["i"] + row["i"] * 9',
+            '0 - row["i"] * 10',
+            '-row["m"]',
+            'abs(row["m"])',
+        )
+        for expr in expressions:
+            self.assertRaises(NotVectorizable, self.vectorize, expr)
+            self.assertSameAsRows(expr)
+        self.assertEqual(self.interpreter.apply(self.df, 'row["i"] * row["i"]'), [10 ** 36, 9])
+        self.assertEqual(self.interpreter.apply(self.df, 'row["i"] + row["i"] * 9'), [10 ** 19, 30])
+        self.assertEqual(self.vectorize('row["i"] * 2 + 1'), [2 * 10 ** 18 + 1, 7])
+
+    def test_custom_function(self):
+        class Negate(Func):
+            description = 'Смена знака'
+            args_description = [MandatoryArg('x', 0, [int, float])]
+            operation = lambda x: -x
+
+        self.interpreter._functions_dict['abs'] = Negate
+        self.assertRaises(NotVectorizable, self.vectorize, 'abs(row["qty"])')
+        self.assertEqual(self.interpreter.apply(self.df, 'abs(row["qty"])'), [-2, 0, -4, 3])
+
+    def test_context(self):
+        self.interpreter.apply(self.df, 'row["qty"] + idx')
+        self.assertRaises(InterpreterContextError, self.interpreter.evaluate, 'row')
+        self.assertEqual(self.interpreter.apply(self.df.iloc[:0], 'row["qty"]'), [])
+
+
+class TestFormulaLexer(NoofaTest):
+    """
+    Сравнение результатов FormulaLexer и посимвольного RuleLexer.
+    """
+    def lex(self, lexer_cls, formula):
+        try:
+            return [tok for tok in lexer_cls(formula).lex()]
+        except ExpressionParsingError as e:
+            return str(e)
+
+    def assertSameTokens(self, formula):
+        self.assertEqual(
+            self.lex(FormulaLexer, formula),
+            self.lex(RuleLexer, formula),
+            formula,
+        )
+
+    def test_formulas(self):
+        formulas = (
+            '2 + 3 * 5;',
+            'sql_select("t", sql_join("t", "t2", "inner", sql_on("a", "==", "b")));',
+            "concat('a b', \"c'd\", x_1)",
+            'if(row["qty"] >= 10 & x != 2, 1.5, .5)',
+            'a >b; a<= b;\nc == 1 | d < 2',
+            '1.2.3abc',
+            'a ! b',
+            'a = b',
+            'x !',
+            'x >',
+            '"unclosed',
+            'a {b}',
+            'a\tb',
+            'строка',
+            '',
+        )
+        for formula in formulas:
+            self.assertSameTokens(formula)
+
+    def test_random(self):
+        alphabet = 'ab_Z09. \n(),;[]+-*/<>!=&|"\'\t{'
+        rnd = random.Random(24)
+        for _ in range(2000):
+            formula = ''.join(rnd.choice(alphabet) for _ in range(rnd.randint(0, 20)))
+            self.assertSameTokens(formula)
+
+
+class TestParser(NoofaTest):
+    """
+    Тестирование упорядочивания операторов при разборе формул.
+    """
+    def tree(self, formula):
+        def dump(stree):
+            if stree is None:
+                return None
+            if stree['type'] == 'operator':
+                return (dump(stree['left']), stree['value'], dump(stree['right']))
+            if stree['type'] == 'call':
+                return [dump(arg) for arg in stree['args']]
+            return stree['value']
+        return dump(parse(formula + ';')[0])
+
+    def test_priority(self):
+        self.assertEqual(self.tree('1 + 2 * 3 - 4'), (('1', '+', ('2', '*', '3')), '-', '4'))
+        self.assertEqual(self.tree('1 - 2 - 3'), (('1', '-', '2'), '-', '3'))
+        self.assertEqual(self.tree('a & b | c & d'), (('a', '&', 'b'), '|', ('c', '&', 'd')))
+        self.assertEqual(
+            self.tree('a > 1 & b == 2 + c'),
+            (('a', '>', '1'), '&', ('b', '==', ('2', '+', 'c'))),
+        )
+        self.assertEqual(self.tree('-a * b'), (None, '-', ('a', '*', 'b')))
+        self.assertEqual(self.tree('(1 + 2) * 3'), ([('1', '+', '2')], '*', '3'))
+        self.assertEqual(self.tree('a +'), ('a', '+', None))
+
+    def test_nested(self):
+        interpreter = Interpreter(x={7: 'seven'})
+        self.assertEqual(interpreter.evaluate('1 + abs(2 * 3 + 1)'), 8)
+        self.assertEqual(interpreter.evaluate('x[2 * 3 + 1] + "!"'), 'seven!')
+        self.assertEqual(interpreter.evaluate('2 * (3 + 1) - 1'), 7)
+
+    def test_random(self):
+        interpreter = Interpreter()
+        rnd = random.Random(25)
+        for _ in range(500):
+            formula = str(rnd.randint(1, 9))
+            for _ in range(rnd.randint(1, 12)):
+                formula += f' {rnd.choice("+-*/")} {rnd.randint(1, 9)}'
+            self.assertEqual(interpreter.evaluate(formula), eval(formula), formula)
+
+    def test_long_chain(self):
+        formula = ' + '.join(f'{i} * 2' for i in range(300))
+        self.assertEqual(Interpreter().evaluate(formula), sum(range(300)) * 2)
+        formula = ' | '.join(f'x == {i}' for i in range(300))
+        self.assertTrue(Interpreter(x=299).evaluate(formula))
@@ -1,5 +1,19 @@
 from noofa.tests.base import NoofaSuite, NoofaRunner
-from noofa.tests.sources.conn import TestParseConnString
+from noofa.tests.sources.conn import TestParseConnString, TestSqliteSource
+from noofa.tests.sources.pool import TestConnectionPool
+from noofa.tests.sources.metadata import TestMetadataCache
+from noofa.tests.sources.plan_cache import TestQueryPlanCache
+from noofa.tests.sources.result_cache import TestResultCache
+from noofa.tests.sources.trace import TestQueryTrace
+from noofa.tests.sources.aio import TestAsyncSources
+from noofa.tests.sources.redis_source import TestRedisSource
+from noofa.tests.sources.json_source import TestJsonSource
+from noofa.tests.sources.file_sources import (
+    TestCSVSource,
+    TestFileCache,
+    TestExcelSource,
+    TestArrowSources,
+)
 from noofa.tests.sources.query_build import (
     TestQueryComponents,
     TestQueryPreparation,
@@ -11,10 +25,23 @@ from noofa.tests.sources.query_build import (
 def sources_suite():
     suite = NoofaSuite()
     suite.add(TestParseConnString)
+    suite.add(TestSqliteSource)
     suite.add(TestQueryComponents)
     suite.add(TestQueryPreparation)
     suite.add(TestQueryBuild)
     suite.add(TestQueryFilters)
+    suite.add(TestConnectionPool)
+    suite.add(TestMetadataCache)
+    suite.add(TestQueryPlanCache)
+    suite.add(TestResultCache)
+    suite.add(TestQueryTrace)
+    suite.add(TestAsyncSources)
+    suite.add(TestRedisSource)
+    suite.add(TestJsonSource)
+    suite.add(TestCSVSource)
+    suite.add(TestFileCache)
+    suite.add(TestExcelSource)
+    suite.add(TestArrowSources)
     return suite
 
 
@@ -0,0 +1,104 @@
+import json
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import SqliteSource, RedisSource, JsonSource
+from noofa.examples.examples import _chinook_db_file
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+_JSON_DATA = [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = json.dumps(_JSON_DATA).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAsyncSources(NoofaTest):
+    """
+    Тестирование асинхронного интерфейса источников.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), _JsonHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = f'http://127.0.0.1:{cls.server.server_port}/data'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_json_source(self):
+        async def get_data():
+            async with JsonSource(self.url) as source:
+                return await source.aget_data()
+
+        res = asyncio.run(get_data())
+        self.assertEqual(res.data, _JSON_DATA)
+
+    @patch('noofa.core.sources.conn._import_aiohttp', return_value=None)
+    def test_json_source_without_aiohttp(self, _):
+        async def get_data():
+            async with JsonSource(self.url) as source:
+                return await source.aget_data()
+
+        res = asyncio.run(get_data())
+        self.assertEqual(res.data, _JSON_DATA)
+
+    def test_json_source_concurrent(self):
+        async def get_data():
+            async with JsonSource(self.url) as source:
+                return await source.aget_data()
+
+        async def gather():
+            return await asyncio.gather(*[get_data() for _ in range(5)])
+
+        results = asyncio.run(gather())
+        self.assertEqual([r.data for r in results], [_JSON_DATA] * 5)
+
+    def test_sqlite_source(self):
+        async def get_data(source):
+            async with source:
+                table = source.get_table('artists')
+                return await source.aget_data(query=table.select())
+
+        res = asyncio.run(get_data(SqliteSource(dbname=_chinook_db_file)))
+        self.assertEqual(len(res.data), 275)
+
+    @unittest.skipIf(fakeredis is None, 'fakeredis не установлен')
+    def test_redis_source(self):
+        server = fakeredis.FakeServer()
+        sync_conn = fakeredis.FakeRedis(server=server)
+        for n, value in enumerate(_JSON_DATA):
+            sync_conn.hset('h', n, json.dumps(value))
+
+        source = RedisSource(source='h')
+        source.get_async_connection = lambda: fakeredis.FakeAsyncRedis(server=server)
+
+        async def get_data():
+            async with source:
+                return await source.aget_data()
+
+        res = asyncio.run(get_data())
+        self.assertCountEqual(res.data, _JSON_DATA)
+        self.assertEqual(res.columns, ['a', 'b'])
+        self.assertIsNone(source._aconnection)
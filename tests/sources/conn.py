@@ -1,5 +1,11 @@
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
 from noofa.tests.base import NoofaTest
-from noofa.core.sources.conn import _parse_conn_str
+from noofa.core.sources.conn import _parse_conn_str, SqliteSource, ColumnarQueryResult
+from noofa.core.sources.query import InFilter, NotInFilter
+from noofa.core.dataframes import panda_builder
+from noofa.examples.examples import _chinook_db_file
 
 
 class TestParseConnString(NoofaTest):
@@ -24,3 +30,67 @@ class TestParseConnString(NoofaTest):
 
     def test_bad_conn_str(self):
         self.assertRaises(Exception, _parse_conn_str, self.bad_conn_str)
+
+
+class TestSqliteSource(NoofaTest):
+    """
+    Тестирование получения данных из sqlite.
+    """
+    def setUp(self):
+        self.source = SqliteSource(dbname=_chinook_db_file)
+        self.source.open()
+        table = self.source.get_table('albums')
+        self.query = table.select().order_by((['"albums"."AlbumId"'], 'asc'))
+
+    def tearDown(self):
+        self.source.close()
+
+    def test_get_data(self):
+        res = self.source.get_data(query=self.query)
+        self.assertEqual(len(res.data), 347)
+        self.assertEqual(res.columns, ['albums.AlbumId', 'albums.Title', 'albums.ArtistId'])
+        self.assertEqual(res.data[0]['albums.AlbumId'], 1)
+
+    def test_iter_data(self):
+        chunks = list(self.source.iter_data(query=self.query, batch_size=100))
+        self.assertEqual([len(c.data) for c in chunks], [100, 100, 100, 47])
+        data = [row for c in chunks for row in c.data]
+        self.assertEqual(data, self.source.get_data(query=self.query).data)
+
+    def test_large_in(self):
+        table = self.source.get_table('tracks')
+        ids = list(range(1, 40001))
+        f = InFilter('tracks.TrackId', ids, '?', dialect='sqlite')
+        query = table.select().where(f)
+        self.assertEqual(len(self.source.get_data(query=query)), 3503)
+        chunks = list(self.source.iter_data(query=query, batch_size=1000))
+        self.assertEqual(sum(len(c) for c in chunks), 3503)
+
+        f = NotInFilter('tracks.TrackId', ids[10:], '?', dialect='sqlite')
+        res = self.source.get_data(query=table.select().where(f))
+        self.assertEqual(sorted(r['tracks.TrackId'] for r in res.data), ids[:10])
+
+        cursor = self.source.connection.cursor()
+        cursor.execute("SELECT name FROM sqlite_temp_master WHERE type = 'table'")
+        self.assertEqual(cursor.fetchall(), [])
+
+    def test_iter_empty_data(self):
+        query = self.query.limit(0)
+        chunks = list(self.source.iter_data(query=query, batch_size=100))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].data, [])
+        self.assertEqual(len(chunks[0].columns), 3)
+
+    def test_columnar_result(self):
+        res = self.source.get_data(query=self.query)
+        self.assertIsInstance(res, ColumnarQueryResult)
+        self.assertEqual(res.rows[0], (1, 'For Those About To Rock We Salute You', 1))
+        self.assertEqual(len(res), 347)
+        df = panda_builder.from_result(res)
+        assert_frame_equal(df, DataFrame(res.data, columns=res.columns))
+
+    def test_empty_columnar_result(self):
+        res = self.source.get_data(query=self.query.limit(0))
+        df = panda_builder.from_result(res)
+        self.assertEqual(df.shape, (0, 3))
+        self.assertEqual(list(df.columns), res.columns)
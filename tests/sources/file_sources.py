@@ -0,0 +1,253 @@
+import os
+import tempfile
+import unittest
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.file_sources import (
+    CSVSource,
+    ExcelSource,
+    ParquetSource,
+    FeatherSource,
+    ArrowSource,
+)
+from noofa.core.sources.file_cache import FileCache
+from noofa.core.dataframes import panda_builder
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+class TestCSVSource(NoofaTest):
+    """
+    Тестирование чтения csv-файлов.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'data.csv')
+        lines = ['id;city;amount;code']
+        for n in range(100):
+            lines.append(f'{n};city{n % 7};{n * 1.5};{n % 3}')
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(lines))
+        self.filters = [{'is_q': False, 'col_name': 'amount', 'op': '>', 'value': 90}]
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_params_not_mutated(self):
+        read_params = {}
+        source = CSVSource(self.path, read_params=read_params)
+        self.assertEqual(source.get_data().shape, (100, 4))
+        self.assertEqual(read_params, {})
+
+    def test_chunked_filters(self):
+        expected = panda_builder.filter(CSVSource(self.path).get_data(), self.filters)
+        source = CSVSource(self.path, chunksize=30)
+        df = source.get_data(filters=self.filters)
+        assert_frame_equal(df, expected)
+
+    def test_chunked_skips_unknown_columns(self):
+        filters = self.filters + [{'is_q': False, 'col_name': 'joined.col', 'op': '==', 'value': 1}]
+        df = CSVSource(self.path, chunksize=30).get_data(filters=filters)
+        self.assertEqual(len(df), 39)
+
+    def test_usecols(self):
+        df = CSVSource(self.path).get_data(usecols={'id', 'amount', 'no_such_col'})
+        self.assertEqual(list(df.columns), ['id', 'amount'])
+
+    def test_dtypes(self):
+        df = CSVSource(self.path).get_data(dtypes={'city': 'category', 'code': 'str'})
+        self.assertEqual(str(df['city'].dtype), 'category')
+        self.assertEqual(df['code'].tolist()[:3], ['0', '1', '2'])
+
+    def test_dtypes_fallback(self):
+        df = CSVSource(self.path).get_data(dtypes={'city': 'int64'})
+        self.assertEqual(df['city'].tolist()[0], 'city0')
+
+
+class TestFileCache(NoofaTest):
+    """
+    Тестирование кэша разобранных файлов.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'data.csv')
+        self._write(50)
+        self.cache = FileCache(os.path.join(self.tmp.name, 'cache'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, n_rows):
+        lines = ['id;city;amount']
+        for n in range(n_rows):
+            lines.append(f'{n};city{n % 7};{n * 1.5}')
+        with open(self.path, 'w') as f:
+            f.write('\n'.join(lines))
+
+    def test_cached_read(self):
+        expected = CSVSource(self.path).get_data()
+        source = CSVSource(self.path, cache=self.cache)
+        assert_frame_equal(source.get_data(), expected)
+        assert_frame_equal(source.get_data(), expected)
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 1})
+
+    def test_read_options(self):
+        source = CSVSource(self.path, cache=self.cache)
+        source.get_data()
+        filters = [{'is_q': False, 'col_name': 'amount', 'op': '>', 'value': 30}]
+        df = source.get_data(usecols={'id', 'amount'}, filters=filters)
+        self.assertEqual(list(df.columns), ['id', 'amount'])
+        self.assertEqual(len(df), 29)
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+    def test_changed_file(self):
+        source = CSVSource(self.path, cache=self.cache)
+        source.get_data()
+        self._write(60)
+        os.utime(self.path, ns=(1, 1))
+        self.assertEqual(len(source.get_data()), 60)
+        self.assertEqual(self.cache.stats, {'hits': 0, 'misses': 2})
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp.name, 'cache'))), 1)
+
+    def test_memory(self):
+        cache = FileCache(path=None, memory_size=2)
+        source = CSVSource(self.path, cache=cache)
+        df = source.get_data()
+        df['id'] = 0
+        self.assertEqual(source.get_data()['id'].tolist()[:3], [0, 1, 2])
+        self.assertEqual(cache.stats['hits'], 1)
+
+
+@unittest.skipIf(openpyxl is None, 'openpyxl не установлен')
+class TestExcelSource(NoofaTest):
+    """
+    Тестирование построчного чтения excel-файлов.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'data.xlsx')
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = 'first'
+        sheet.append(['x'])
+        sheet = workbook.create_sheet('sales')
+        sheet.append(['id', 'city', 'amount'])
+        for n in range(25):
+            sheet.append([n, f'city{n % 3}', n * 1.5])
+        workbook.save(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_streaming_equals_read_excel(self):
+        expected = ExcelSource(self.path, sheet='sales').get_data()
+        df = ExcelSource(self.path, sheet='sales', streaming=True, chunksize=7).get_data()
+        assert_frame_equal(df, expected)
+
+    def test_streaming_columns(self):
+        workbook = openpyxl.load_workbook(self.path)
+        sheet = workbook.create_sheet('headers')
+        sheet.append(['a', 'a', 1, 2.5, None, 'a.1', 'a', 3.0])
+        sheet.append([1, 2, 3, 4, 5, 6, 7, 8])
+        workbook.save(self.path)
+        expected = ExcelSource(self.path, sheet='headers').get_data()
+        df = ExcelSource(self.path, sheet='headers', streaming=True).get_data()
+        self.assertEqual(list(df.columns), list(expected.columns))
+        self.assertEqual(df.columns.map(type).tolist(), expected.columns.map(type).tolist())
+        assert_frame_equal(df, expected)
+
+    def test_sheet_index(self):
+        df = ExcelSource(self.path, sheet=1, streaming=True).get_data()
+        self.assertEqual(list(df.columns), ['id', 'city', 'amount'])
+        df = ExcelSource(self.path, streaming=True).get_data()
+        self.assertEqual(list(df.columns), ['x'])
+
+    def test_cell_range(self):
+        df = ExcelSource(self.path, sheet='sales', cell_range='B1:C6').get_data()
+        self.assertEqual(list(df.columns), ['city', 'amount'])
+        self.assertEqual(df['amount'].tolist(), [0.0, 1.5, 3.0, 4.5, 6.0])
+
+    def test_read_options(self):
+        source = ExcelSource(self.path, sheet='sales', streaming=True, chunksize=4)
+        filters = [{'is_q': False, 'col_name': 'id', 'op': '>=', 'value': 20}]
+        df = source.get_data(
+            usecols={'id', 'city'},
+            filters=filters,
+            dtypes={'city': 'category', 'id': 'int32'},
+        )
+        self.assertEqual(list(df.columns), ['id', 'city'])
+        self.assertEqual(df['id'].tolist(), [20, 21, 22, 23, 24])
+        self.assertEqual(str(df['city'].dtype), 'category')
+        self.assertEqual(str(df['id'].dtype), 'int32')
+
+
+@unittest.skipIf(pyarrow is None, 'pyarrow не установлен')
+class TestArrowSources(NoofaTest):
+    """
+    Тестирование чтения файлов parquet, feather и arrow.
+    """
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.df = DataFrame({
+            'id': list(range(100)),
+            'city': [f'city{n % 7}' if n % 10 else None for n in range(100)],
+            'amount': [n * 1.5 for n in range(100)],
+        })
+        table = pyarrow.Table.from_pandas(self.df, preserve_index=False)
+        self.paths = {}
+        self.paths['parquet'] = os.path.join(self.tmp.name, 'data.parquet')
+        pyarrow.parquet.write_table(table, self.paths['parquet'], row_group_size=20)
+        self.paths['feather'] = os.path.join(self.tmp.name, 'data.feather')
+        pyarrow.feather.write_feather(table, self.paths['feather'])
+        self.paths['arrow'] = os.path.join(self.tmp.name, 'data.arrow')
+        pyarrow.feather.write_feather(table, self.paths['arrow'], compression='uncompressed')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _sources(self):
+        return [
+            ParquetSource(self.paths['parquet']),
+            FeatherSource(self.paths['feather']),
+            ArrowSource(self.paths['arrow']),
+        ]
+
+    def test_read(self):
+        for source in self._sources():
+            with self.subTest(source.source_type):
+                assert_frame_equal(source.get_data(), self.df)
+
+    def test_pushdown(self):
+        filters = [
+            {'is_q': False, 'col_name': 'amount', 'op': '>=', 'value': 30},
+            {'is_q': True, 'op': 'or', 'filters': [
+                {'is_q': False, 'col_name': 'city', 'op': '!=', 'value': 'city1'},
+                {'is_q': False, 'col_name': 'id', 'op': 'in', 'value': [29, 43]},
+            ]},
+            {'is_q': False, 'col_name': 'city', 'op': 'contains', 'value': 'city'},
+        ]
+        expected = panda_builder.filter(self.df, filters)[['id', 'city']]
+        for source in self._sources():
+            with self.subTest(source.source_type):
+                df = source.get_data(usecols={'id', 'city'}, filters=filters)
+                self.assertEqual(list(df.columns), ['id', 'city'])
+                df = panda_builder.filter(df.assign(amount=0), filters[1:])[['id', 'city']]
+                assert_frame_equal(df.reset_index(drop=True), expected.reset_index(drop=True))
+
+    def test_not_applicable_filter(self):
+        filters = [{'is_q': False, 'col_name': 'city', 'op': '>', 'value': 5}]
+        df = ParquetSource(self.paths['parquet']).get_data(filters=filters)
+        self.assertEqual(len(df), 100)
@@ -0,0 +1,158 @@
+import json
+import tempfile
+import threading
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import JsonSource
+from noofa.core.sources.response_cache import ResponseCache, response_cache_key
+from noofa.core.sources.exceptions import UnknownPaginationType
+from noofa.core.dataframes import panda_builder
+
+
+_RECORDS = [{'id': n, 'value': n * 10} for n in range(7)]
+
+
+class _ApiHandler(BaseHTTPRequestHandler):
+    """
+    Заглушка api с постраничной выдачей записей.
+    """
+    full_responses = 0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        headers = {}
+        if url.path == '/page':
+            page, size = int(q['page']), int(q['per_page'])
+            body = _RECORDS[(page - 1) * size:page * size]
+        elif url.path == '/offset':
+            offset, limit = int(q['offset']), int(q['limit'])
+            body = {'data': {'items': _RECORDS[offset:offset + limit]}}
+        elif url.path == '/cursor':
+            start = int(q.get('cursor', 0))
+            next_cursor = start + 3 if start + 3 < len(_RECORDS) else None
+            body = {'items': _RECORDS[start:start + 3], 'next': next_cursor}
+        elif url.path == '/link':
+            page = int(q.get('p', 0))
+            body = _RECORDS[page * 4:(page + 1) * 4]
+            if (page + 1) * 4 < len(_RECORDS):
+                port = self.server.server_port
+                headers['Link'] = f'<http://127.0.0.1:{port}/link?p={page + 1}>; rel="next"'
+        elif url.path == '/etag':
+            if self.headers.get('If-None-Match') == '"v1"':
+                self.send_response(304)
+                self.end_headers()
+                return
+            headers['ETag'] = '"v1"'
+            body = _RECORDS
+        _ApiHandler.full_responses += 1
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestJsonSource(NoofaTest):
+    """
+    Тестирование постраничного получения данных и кэша ответов json-источника.
+    """
+    @classmethod
+    def setUpClass(cls):
+        cls.server = HTTPServer(('127.0.0.1', 0), _ApiHandler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _get_data(self, path, **kwargs):
+        source = JsonSource(self.base_url + path, **kwargs)
+        source.open()
+        return source.get_data()
+
+    def test_page(self):
+        res = self._get_data('/page', pagination={'type': 'page', 'size': 3})
+        self.assertEqual(res.data, _RECORDS)
+        self.assertEqual(res.columns, ['id', 'value'])
+
+    def test_offset(self):
+        res = self._get_data(
+            '/offset',
+            items_path='data.items',
+            pagination={'type': 'offset', 'size': 2},
+        )
+        self.assertEqual(res.data, _RECORDS)
+
+    def test_cursor(self):
+        res = self._get_data('/cursor', items_path='items', pagination={'type': 'cursor'})
+        self.assertEqual(res.data, _RECORDS)
+
+    def test_link(self):
+        res = self._get_data('/link', pagination={'type': 'link'})
+        self.assertEqual(res.data, _RECORDS)
+
+    def test_max_pages(self):
+        res = self._get_data('/page', pagination={'type': 'page', 'size': 2, 'max_pages': 2})
+        self.assertEqual(res.data, _RECORDS[:4])
+
+    def test_iter_pages(self):
+        source = JsonSource(self.base_url + '/page', pagination={'type': 'page', 'size': 3})
+        source.open()
+        chunks = list(source.iter_data())
+        self.assertEqual([len(c.data) for c in chunks], [3, 3, 1])
+        df = panda_builder.from_chunks(chunks)
+        self.assertEqual(df['id'].tolist(), list(range(7)))
+
+    def test_unknown_pagination(self):
+        self.assertRaises(
+            UnknownPaginationType,
+            JsonSource, self.base_url, pagination={'type': 'unknown'},
+        )
+
+    def test_conditional_requests(self):
+        cache = ResponseCache()
+        first = self._get_data('/etag', response_cache=cache)
+        served = _ApiHandler.full_responses
+        second = self._get_data('/etag', response_cache=cache)
+        self.assertEqual(_ApiHandler.full_responses, served)
+        self.assertEqual(first.data, second.data)
+        self.assertEqual(second.data, _RECORDS)
+
+    def test_response_cache_on_disk(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self._get_data('/etag', response_cache=ResponseCache(tmp))
+            served = _ApiHandler.full_responses
+            res = self._get_data('/etag', response_cache=ResponseCache(tmp))
+            self.assertEqual(_ApiHandler.full_responses, served)
+            self.assertEqual(res.data, _RECORDS)
+
+    def test_response_cache_identity(self):
+        cache = ResponseCache()
+        self._get_data('/etag', response_cache=cache, headers={'Authorization': 'token a'})
+        served = _ApiHandler.full_responses
+        self._get_data('/etag', response_cache=cache, headers={'Authorization': 'token b'})
+        self.assertEqual(_ApiHandler.full_responses, served + 1)
+        self._get_data('/etag', response_cache=cache, auth=('user', 'secret'))
+        self.assertEqual(_ApiHandler.full_responses, served + 2)
+        self._get_data('/etag', response_cache=cache, auth=('user', 'secret'))
+        self.assertEqual(_ApiHandler.full_responses, served + 2)
+
+        key = response_cache_key('/etag', auth=('user', 'secret'))
+        self.assertNotIn('secret', key)
+        self.assertNotEqual(key, response_cache_key('/etag', auth=('user', 'other')))
+        self.assertEqual(
+            response_cache_key('/etag', headers={'X-Token': 'a'}),
+            response_cache_key('/etag', headers={'x-token': 'a'}),
+        )
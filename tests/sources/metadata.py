@@ -0,0 +1,97 @@
+import os
+import tempfile
+from unittest.mock import patch
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import SqliteSource
+from noofa.core.sources.metadata import (
+    MetadataCache,
+    FileMetadataStorage,
+)
+from noofa.examples.examples import _chinook_db_file
+
+
+class TestMetadataCache(NoofaTest):
+    """
+    Тестирование кэша метаданных источников.
+    """
+    def setUp(self):
+        self.cache = MetadataCache()
+        self.source = SqliteSource(dbname=_chinook_db_file, metadata_cache=self.cache)
+        self.source.open()
+
+    def tearDown(self):
+        self.source.close()
+
+    def test_fields_cached(self):
+        fields = self.source.get_fields('albums')
+        with patch.object(SqliteSource, '_fetch_fields') as fetch:
+            self.assertEqual(self.source.get_fields('albums'), fields)
+            self.source.get_table_multiple(['albums'])
+            fetch.assert_not_called()
+        self.assertEqual(self.cache.stats, {'hits': 2, 'misses': 1})
+
+    def test_table_multiple(self):
+        tables = self.source.get_table_multiple(['albums', 'artists'])
+        with patch.object(SqliteSource, '_fetch_fields') as fetch:
+            cached = self.source.get_table_multiple(['albums', 'artists'])
+            fetch.assert_not_called()
+        for name in ['albums', 'artists']:
+            self.assertEqual(cached[name]._fields_names, tables[name]._fields_names)
+
+    def test_invalidate(self):
+        self.source.get_fields('albums')
+        self.source.get_fields('artists')
+        self.source.invalidate_metadata('albums')
+        key = self.source.source_key
+        self.assertIsNone(self.cache.get_fields(key, 'albums'))
+        self.assertIsNotNone(self.cache.get_fields(key, 'artists'))
+        self.source.invalidate_metadata()
+        self.assertIsNone(self.cache.get_fields(key, 'artists'))
+
+    def test_invalidate_prefix(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            storages = [None, FileMetadataStorage(os.path.join(tmp, 'metadata.json'))]
+            for storage in storages:
+                cache = MetadataCache(storage)
+                for table in ('album', 'albums', 'album_tracks'):
+                    cache.set_fields('src', table, [table])
+                cache.invalidate('src', 'album')
+                self.assertIsNone(cache.get_fields('src', 'album'))
+                self.assertEqual(cache.get_fields('src', 'albums'), ['albums'])
+                self.assertEqual(cache.get_fields('src', 'album_tracks'), ['album_tracks'])
+
+    def test_copies(self):
+        structure = {'tables': {'t': ['a']}, 'relations': []}
+        self.cache.set_structure('src', structure)
+        structure['tables']['t'].append('b')
+        cached = self.cache.get_structure('src')
+        cached['tables'].clear()
+        self.assertEqual(self.cache.get_structure('src'), {'tables': {'t': ['a']}, 'relations': []})
+
+        self.cache.set_fields('src', 't', ['a'])
+        self.cache.get_fields('src', 't').append('b')
+        self.assertEqual(self.cache.get_fields('src', 't'), ['a'])
+
+    def test_ttl(self):
+        cache = MetadataCache(ttl=10)
+        with patch('noofa.core.sources.metadata.time.time', return_value=100):
+            cache.set_fields('src', 't', ['a'])
+        with patch('noofa.core.sources.metadata.time.time', return_value=105):
+            self.assertEqual(cache.get_fields('src', 't'), ['a'])
+        with patch('noofa.core.sources.metadata.time.time', return_value=111):
+            self.assertIsNone(cache.get_fields('src', 't'))
+
+    def test_disabled(self):
+        source = SqliteSource(dbname=_chinook_db_file, metadata_cache=False)
+        self.assertIsNone(source.metadata_cache)
+
+    def test_file_storage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'metadata.json')
+            cache = MetadataCache(FileMetadataStorage(path))
+            cache.set_fields('src', 't', ['a', 'b'])
+            cache.set_structure('src', {'tables': {}, 'relations': []})
+            restored = MetadataCache(FileMetadataStorage(path))
+            self.assertEqual(restored.get_fields('src', 't'), ['a', 'b'])
+            self.assertEqual(restored.get_structure('src'), {'tables': {}, 'relations': []})
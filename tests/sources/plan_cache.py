@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from pandas.testing import assert_frame_equal
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import SqliteSource
+from noofa.core.sources.plan_cache import (
+    CompiledQuery,
+    QueryPlanCache,
+    get_plan_cache,
+    set_plan_cache,
+)
+from noofa.builders.builders import ReportBuilder
+from noofa.tests.builders.builder import _chinook_conf
+
+
+class TestQueryPlanCache(NoofaTest):
+    """
+    Тестирование кэша сформированных запросов.
+    """
+    def setUp(self):
+        self._default_cache = get_plan_cache()
+        self.cache = QueryPlanCache(max_entries=2)
+        set_plan_cache(self.cache)
+
+    def tearDown(self):
+        set_plan_cache(self._default_cache)
+
+    def test_lru(self):
+        compiled = CompiledQuery('SELECT 1', [1], ['a'])
+        keys = [self.cache.key({'base': f't{n}'}, 'src') for n in range(3)]
+        for key in keys:
+            self.cache.set(key, compiled)
+        self.assertIsNone(self.cache.get(keys[0]))
+        self.assertIs(self.cache.get(keys[2]), compiled)
+        self.assertEqual(self.cache.stats, {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'size': 2})
+
+    def test_ttl(self):
+        compiled = CompiledQuery('SELECT 1')
+        self.cache.set('a', compiled, ttl=0)
+        self.assertIsNone(self.cache.get('a'))
+        self.assertEqual(self.cache.stats['size'], 0)
+        self.cache.set('b', compiled)
+        self.assertIs(self.cache.get('b'), compiled)
+        self.cache.ttl = 0
+        self.cache.set('c', compiled)
+        self.assertIsNone(self.cache.get('c'))
+
+    def test_key(self):
+        key = self.cache.key({'base': 't', 'limit': 1}, 'src', wildcard='?')
+        self.assertEqual(key, self.cache.key({'limit': 1, 'base': 't'}, 'src', wildcard='?'))
+        self.assertNotEqual(key, self.cache.key({'base': 't', 'limit': 1}, 'src2', wildcard='?'))
+        self.assertNotEqual(key, self.cache.key({'base': 't', 'limit': '1'}, 'src', wildcard='?'))
+        self.cache.invalidate('src')
+        self.assertNotEqual(key, self.cache.key({'base': 't', 'limit': 1}, 'src', wildcard='?'))
+
+    def test_repeated_build(self):
+        self.cache.max_entries = 10
+        conf = {'data_config': _chinook_conf()}
+        expected = ReportBuilder(**conf).get_or_build_dataframe('tracks')
+        with patch.object(SqliteSource, 'get_table_multiple') as get_tables:
+            df = ReportBuilder(**conf).get_or_build_dataframe('tracks')
+            get_tables.assert_not_called()
+        assert_frame_equal(df, expected)
+        self.assertEqual(self.cache.stats['hits'], 1)
+
+        SqliteSource(dbname=_chinook_conf()['sources']['chinook']['value']['dbname']).invalidate_metadata()
+        ReportBuilder(**conf).get_or_build_dataframe('tracks')
+        self.assertEqual(self.cache.stats['misses'], 2)
@@ -0,0 +1,100 @@
+import gc
+import sqlite3
+import weakref
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import SqliteSource
+from noofa.core.sources.exceptions import PoolTimeoutError, PoolConfigError
+from noofa.core.sources.pool import ConnectionPool, pools_stats, close_pools
+from noofa.examples.examples import _chinook_db_file
+
+
+def _connect():
+    return sqlite3.connect(':memory:', check_same_thread=False)
+
+
+class TestConnectionPool(NoofaTest):
+    """
+    Тестирование пула соединений.
+    """
+    def setUp(self):
+        self.pool = ConnectionPool(_connect, test_query='SELECT 1', max_size=2, timeout=0.1)
+
+    def tearDown(self):
+        self.pool.clear()
+        close_pools()
+
+    def test_hit_and_miss(self):
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIs(self.pool.acquire(), conn)
+        stats = self.pool.stats
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['size'], 1)
+
+    def test_max_size(self):
+        conn1, conn2 = self.pool.acquire(), self.pool.acquire()
+        self.assertRaises(PoolTimeoutError, self.pool.acquire)
+        self.assertEqual(self.pool.stats['waits'], 1)
+        self.pool.release(conn1)
+        self.assertIs(self.pool.acquire(), conn1)
+
+    def test_discard(self):
+        conn = self.pool.acquire()
+        self.pool.release(conn, discard=True)
+        stats = self.pool.stats
+        self.assertEqual(stats['size'], 0)
+        self.assertEqual(stats['discarded'], 1)
+
+    def test_recycle_idle(self):
+        self.pool.max_idle = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        self.assertIsNot(self.pool.acquire(), conn)
+        self.assertEqual(self.pool.stats['discarded'], 1)
+
+    def test_health_check(self):
+        self.pool.check_interval = 0
+        conn = self.pool.acquire()
+        self.pool.release(conn)
+        conn.close()
+        self.assertIsNot(self.pool.acquire(), conn)
+        self.assertEqual(self.pool.stats['hits'], 0)
+
+    def test_source_uses_pool(self):
+        source = SqliteSource(dbname=_chinook_db_file)
+        for _ in range(3):
+            with source:
+                self.assertTrue(source.test())
+        stats = pools_stats()[source.source_key]
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+
+    def test_source_without_pool(self):
+        source = SqliteSource(dbname=_chinook_db_file, pooled=False)
+        with source:
+            self.assertTrue(source.test())
+        self.assertIsNone(source.pool)
+        self.assertNotIn(source.source_key, pools_stats())
+
+    def test_pool_does_not_keep_source(self):
+        source = SqliteSource(dbname=_chinook_db_file)
+        with source:
+            self.assertTrue(source.test())
+        ref = weakref.ref(source)
+        del source
+        gc.collect()
+        self.assertIsNone(ref())
+        with SqliteSource(dbname=_chinook_db_file) as source:
+            self.assertTrue(source.test())
+
+    def test_conflicting_options(self):
+        close_pools()
+        source = SqliteSource(dbname=_chinook_db_file, pool_size=2)
+        with source:
+            self.assertTrue(source.test())
+        with SqliteSource(dbname=_chinook_db_file) as same:
+            self.assertTrue(same.test())
+        other = SqliteSource(dbname=_chinook_db_file, pool_size=5)
+        self.assertRaises(PoolConfigError, lambda: other.pool)
@@ -353,6 +353,111 @@ class TestQueryBuild(NoofaTest):
         ])
         self.assertEqual(str(query), expected_text)
 
+    def test_group_by(self):
+        group = {
+            'group_by': [{'table': 'table1', 'field': 'col1'}],
+            'aggregates': [
+                {'table': 'table1', 'field': 'col2', 'func': 'sum', 'alias': 'total'},
+                {'table': 'table1', 'field': 'col3', 'func': 'avg'},
+            ],
+        }
+        qb = utils.Qbuilder(self.mock_tables,
+            {**self.simple_json_query, **self.simple_filter, **group})
+        query = qb.parse_query()
+        expected_text = ''.join([
+            'SELECT "table1"."col1", SUM("table1"."col2"), AVG("table1"."col3") FROM table1 ',
+            'WHERE "table1"."col1" > %s GROUP BY "table1"."col1"'
+        ])
+        self.assertEqual(str(query), expected_text)
+        self.assertEqual(query.requested, ['"table1"."col1"', 'total', 'avg(table1.col3)'])
+
+        bad = {'aggregates': [{'table': 'table1', 'field': 'col2', 'func': 'median'}]}
+        qb = utils.Qbuilder(self.mock_tables, {**self.simple_json_query, **bad})
+        self.assertRaises(AssertionError, qb.parse_query)
+
+    def test_group_by_dialects(self):
+        group = {
+            'group_by': [{'table': 'table1', 'field': 'col1'}],
+            'aggregates': [
+                {'table': 'table1', 'field': 'col2', 'func': 'sum'},
+                {'table': 'table1', 'field': 'col3', 'func': 'avg'},
+            ],
+        }
+        float_types = {
+            'postgres': 'DOUBLE PRECISION',
+            'mysql': 'DOUBLE',
+            'mssql': 'FLOAT',
+            'sqlite': 'REAL',
+        }
+        for dialect, float_type in float_types.items():
+            qb = utils.Qbuilder(self.mock_tables, {**self.simple_json_query, **group}, dialect=dialect)
+            expected_text = ''.join([
+                'SELECT "table1"."col1", SUM("table1"."col2"), ',
+                f'AVG(CAST("table1"."col3" AS {float_type})) FROM table1 ',
+                'GROUP BY "table1"."col1"',
+            ])
+            self.assertEqual(str(qb.parse_query()), expected_text)
+
+    def test_pagination(self):
+        page = {'order_by': self.orderby['order_by'], 'limit': 10, 'offset': 20}
+        qb = utils.Qbuilder(self.mock_tables, {**self.simple_json_query, **page})
+        expected_text = ''.join([
+            'SELECT "table1"."col1", "table1"."col2", "table1"."col3" FROM table1 ',
+            'ORDER BY "table1"."col1" ASC LIMIT 10 OFFSET 20'
+        ])
+        self.assertEqual(str(qb.parse_query()), expected_text)
+
+        qb = utils.Qbuilder(self.mock_tables, {**self.simple_json_query, **page}, mssql=True)
+        expected_text = ''.join([
+            'SELECT "table1"."col1", "table1"."col2", "table1"."col3" FROM table1 ',
+            'ORDER BY "table1"."col1" ASC OFFSET 20 ROWS FETCH NEXT 10 ROWS ONLY'
+        ])
+        self.assertEqual(str(qb.parse_query()), expected_text)
+
+        query = utils.Qbuilder(self.mock_tables, self.simple_json_query, mssql=True).parse_query()
+        query.mssql_limit(10).offset(10)
+        self.assertTrue(str(query).endswith('ORDER BY (SELECT NULL) OFFSET 10 ROWS FETCH NEXT 10 ROWS ONLY'))
+
+        query = utils.Qbuilder(self.mock_tables, self.simple_json_query).parse_query()
+        self.assertTrue(str(query.paginate(3, 25)).endswith('LIMIT 25 OFFSET 50'))
+        self.assertTrue(str(query.paginate(1, 25)).endswith('LIMIT 25'))
+
+    def test_seek(self):
+        ordering = {
+            'order_by': [
+                {'table': 'table1', 'fields': ['col1'], 'type': 'asc'},
+                {'table': 'table1', 'fields': ['col2'], 'type': 'desc'},
+            ],
+            'seek': [5, 'x'],
+            'limit': 10,
+        }
+        qb = utils.Qbuilder(self.mock_tables, {**self.simple_json_query, **ordering}, '?')
+        q, params = qb.parse_query().str_and_params()
+        expected_text = ''.join([
+            'SELECT "table1"."col1", "table1"."col2", "table1"."col3" FROM table1 ',
+            'WHERE ("table1"."col1" > ? OR ("table1"."col1" = ? AND "table1"."col2" < ?)) ',
+            'ORDER BY "table1"."col1" ASC, "table1"."col2" DESC LIMIT 10'
+        ])
+        self.assertEqual(q, expected_text)
+        self.assertEqual(params, [5, 5, 'x'])
+
+    def test_count_query(self):
+        qb = utils.Qbuilder(self.mock_tables,
+            {**self.simple_json_query, **self.simple_filter, **self.orderby, **self.limit})
+        q, params = qb.parse_query().count_query().str_and_params()
+        self.assertEqual(q, 'SELECT COUNT(*) FROM table1 WHERE "table1"."col1" > %s')
+        self.assertEqual(params, [100])
+
+        group = {'group_by': [{'table': 'table1', 'field': 'col1'}]}
+        qb = utils.Qbuilder(self.mock_tables, {**self.simple_json_query, **group})
+        count = qb.parse_query().count_query()
+        expected_text = ''.join([
+            'SELECT COUNT(*) FROM (SELECT "table1"."col1" FROM table1 ',
+            'GROUP BY "table1"."col1") AS noofa_count'
+        ])
+        self.assertEqual(str(count), expected_text)
+        self.assertEqual(count.requested, ['count'])
+
     @property
     def mock_tables(self):
         mt = {}
@@ -425,3 +530,44 @@ class TestQueryFilters(NoofaTest):
         f = NotInFilter(self.col, [1, 2], self.wildcard)
         self.assertEqual(str(f), 'col NOT IN (%s, %s)')
         self._params = [1, 2]
+
+    def test_large_in(self):
+        values = list(range(2500))
+        f = InFilter(self.col, values, self.wildcard, dialect='mysql')
+        parts = str(f)[1:-1].split(' OR ')
+        self.assertEqual(len(parts), 3)
+        self.assertEqual(parts[2], f'col IN ({", ".join(["%s"]*500)})')
+        self.assertEqual(f._params, values)
+        f = NotInFilter(self.col, values, self.wildcard, dialect='mysql')
+        self.assertEqual(len(str(f).split(' AND ')), 3)
+
+        f = InFilter(self.col, values, self.wildcard, dialect='postgres')
+        self.assertEqual(str(f), 'col = ANY(%s)')
+        self.assertEqual(f._params, [values])
+        f = NotInFilter(self.col, values, self.wildcard, dialect='postgres')
+        self.assertEqual(str(f), 'col <> ALL(%s)')
+
+        f = InFilter(self.col, values + [1], '?', dialect='mssql')
+        table = f._temp_table
+        self.assertTrue(table.startswith('#noofa_in_'))
+        self.assertEqual(str(f), f'col IN (SELECT v FROM {table})')
+        self.assertEqual(f._params, [])
+        (drop, _), (create, _), (insert, rows) = f._prepare
+        self.assertEqual(create, f'CREATE TABLE {table} (v BIGINT)')
+        self.assertEqual(insert, f'INSERT INTO {table} (v) VALUES (?)')
+        self.assertEqual(rows, [(v, ) for v in values])
+
+        #  в mssql части IN вместе превысили бы ограничение количества параметров
+        f = InFilter(self.col, values[:1500], '?', dialect='mssql')
+        self.assertEqual(f._strategy, 'temp_table')
+        self.assertEqual(f._params, [])
+        self.assertEqual(InFilter(self.col, values[:1500], '?', dialect='sqlite')._strategy, 'batches')
+
+        query = SelectQuery(Table('t', ['col'])).where(Q(f))
+        self.assertEqual(query.prepare, f._prepare)
+        self.assertEqual(query.count_query().cleanup, f._cleanup)
+
+        #  без типа источника и при небольшом количестве значений - как раньше
+        self.assertEqual(InFilter(self.col, values, self.wildcard)._params, values)
+        f = InFilter(self.col, [1, 2], self.wildcard, dialect='postgres')
+        self.assertEqual(str(f), 'col IN (%s, %s)')
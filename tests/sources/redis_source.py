@@ -0,0 +1,63 @@
+import json
+import unittest
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import RedisSource
+from noofa.core.dataframes import panda_builder
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+
+@unittest.skipIf(fakeredis is None, 'fakeredis не установлен')
+class TestRedisSource(NoofaTest):
+    """
+    Тестирование источника redis.
+    """
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        conn = fakeredis.FakeRedis(server=self.server)
+        self.records = [{'id': n, 'name': f'name{n}'} for n in range(250)]
+        for record in self.records:
+            conn.hset('h', record['id'], json.dumps(record))
+
+    def _source(self, **kwargs):
+        source = RedisSource(source='h', **kwargs)
+        source.connection = fakeredis.FakeRedis(server=self.server)
+        return source
+
+    def test_get_data(self):
+        res = self._source().get_data()
+        self.assertCountEqual(res.data, self.records)
+        self.assertEqual(res.columns, ['id', 'name'])
+
+    def test_iter_data(self):
+        chunks = list(self._source().iter_data(batch_size=100))
+        self.assertEqual(sum(len(c.data) for c in chunks), 250)
+        self.assertTrue(all(len(c.data) <= 100 for c in chunks))
+        df = panda_builder.from_chunks(chunks)
+        self.assertCountEqual(df['id'].tolist(), list(range(250)))
+
+    def test_iter_empty(self):
+        source = self._source()
+        source.source = 'no_such_hash'
+        chunks = list(source.iter_data(batch_size=100))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].data, [])
+
+    def test_get_fields(self):
+        self.assertEqual(self._source().get_fields(), ['id', 'name'])
+        source = self._source()
+        source.source = 'no_such_hash'
+        self.assertEqual(source.get_fields(), [])
+
+    def test_orjson_decoder(self):
+        res = self._source(json_decoder='orjson').get_data()
+        self.assertCountEqual(res.data, self.records)
+
+    def test_invalid_value(self):
+        fakeredis.FakeRedis(server=self.server).hset('h', 'bad', '1,2')
+        for decoder in ('json', 'orjson'):
+            self.assertRaises(ValueError, self._source(json_decoder=decoder).get_data)
@@ -0,0 +1,88 @@
+import time
+import threading
+from unittest.mock import patch
+
+from pandas.testing import assert_frame_equal
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import SqliteSource
+from noofa.core.sources.result_cache import ResultCache, result_key
+from noofa.builders.builders import ReportBuilder
+from noofa.tests.builders.builder import _chinook_conf
+
+
+class TestResultCache(NoofaTest):
+    """
+    Тестирование кэша результатов запросов.
+    """
+    def test_key(self):
+        key = result_key('src', 'SELECT 1 WHERE a = ?', [1])
+        self.assertEqual(key, result_key('src', 'SELECT 1 WHERE a = ?', (1, )))
+        self.assertNotEqual(key, result_key('src', 'SELECT 1 WHERE a = ?', ['1']))
+        self.assertNotEqual(key, result_key('src2', 'SELECT 1 WHERE a = ?', [1]))
+
+    def test_ttl(self):
+        cache = ResultCache(ttl=0.05)
+        calls = []
+        execute = lambda: calls.append(1) or len(calls)
+        self.assertEqual(cache.get_or_execute('k', execute), 1)
+        self.assertEqual(cache.get_or_execute('k', execute), 1)
+        time.sleep(0.06)
+        self.assertEqual(cache.get_or_execute('k', execute), 2)
+
+    def test_coalescing(self):
+        cache = ResultCache()
+        started, calls, results = threading.Event(), [], []
+
+        def execute():
+            calls.append(1)
+            started.set()
+            time.sleep(0.1)
+            return 'data'
+
+        def worker():
+            results.append(cache.get_or_execute('k', execute))
+
+        threads = [threading.Thread(target=worker) for _ in range(5)]
+        threads[0].start()
+        started.wait()
+        for t in threads[1:]:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['data'] * 5)
+        self.assertEqual(cache.stats, {'hits': 0, 'misses': 1, 'coalesced': 4})
+
+    def test_error_not_cached(self):
+        cache = ResultCache()
+
+        def fail():
+            raise ValueError
+
+        self.assertRaises(ValueError, cache.get_or_execute, 'k', fail)
+        self.assertEqual(cache.get_or_execute('k', lambda: 1), 1)
+
+    def test_duplicate_queries(self):
+        conf = _chinook_conf()
+        conf['queries']['tracks2'] = {**conf['queries']['tracks'], 'id': 'tracks2', 'name': 'tracks2'}
+        conf['dataframes']['tracks2'] = {
+            'id': 'tracks2',
+            'name': 'tracks2',
+            'base': {'type': 'query', 'source': 'chinook', 'value': 'tracks2'},
+            'ordering': [],
+        }
+        rb = ReportBuilder(data_config=conf)
+        with patch.object(SqliteSource, 'get_data', wraps=rb.get_source('chinook').connection.get_data) as get_data:
+            df = rb.get_or_build_dataframe('tracks')
+            df2 = rb.get_or_build_dataframe('tracks2')
+            self.assertEqual(get_data.call_count, 1)
+        assert_frame_equal(df, df2)
+
+    def test_shared_cache(self):
+        cache = ResultCache()
+        conf = {'data_config': _chinook_conf(), 'result_cache': cache}
+        ReportBuilder(**conf).prefetch()
+        ReportBuilder(**conf).prefetch()
+        self.assertEqual(cache.stats['misses'], 2)
+        self.assertEqual(cache.stats['hits'], 2)
@@ -0,0 +1,102 @@
+import json
+
+from noofa.tests.base import NoofaTest
+from noofa.core.sources.conn import SqliteSource
+from noofa.core.sources.trace import QueryTrace, TraceSpan, TRACE_STAGES
+from noofa.builders.builders import ReportBuilder
+from noofa.examples.examples import _chinook_db_file
+from noofa.tests.builders.builder import _chinook_conf
+
+
+class TestQueryTrace(NoofaTest):
+    """
+    Тестирование трассировки выполнения запросов.
+    """
+    def test_span(self):
+        trace = QueryTrace()
+        with trace.span('q', 'src') as span:
+            with span.timer('execute'):
+                pass
+            span.add_rows([(1, 'a'), (2, 'b')])
+        self.assertEqual(len(trace.spans), 1)
+        self.assertEqual(span.rows, 2)
+        self.assertGreater(span.bytes, 0)
+        self.assertGreater(span.timings['execute'], 0)
+        self.assertIsNone(span.error)
+
+        with self.assertRaises(ValueError):
+            with trace.span('q2') as span:
+                raise ValueError('bad value')
+        self.assertEqual(span.error, 'ValueError: bad value')
+        self.assertEqual(trace.totals['errors'], 1)
+        self.assertEqual(trace.totals['queries'], 2)
+
+        #  без трассировки значения никуда не сохраняются
+        with TraceSpan('q') as span:
+            span.add_rows([(1, )])
+        self.assertEqual((span.rows, span.bytes), (1, 0))
+
+    def test_rows_size_sample(self):
+        trace = QueryTrace()
+        with trace.span('q') as span:
+            span.add_rows([(1, 'a')] * 10)
+        small = span.bytes
+        with trace.span('q') as span:
+            span.add_rows([(1, 'a')] * 10000)
+        self.assertEqual(span.rows, 10000)
+        self.assertEqual(span.bytes, small * 1000)
+
+    def test_source(self):
+        source = SqliteSource(dbname=_chinook_db_file)
+        source.open()
+        try:
+            query = source.get_table('albums').select()
+            trace = QueryTrace(slow_threshold=0, explain=True)
+            with trace.span('albums', source.source_key) as span:
+                res = source.get_data(query=query, span=span)
+            self.assertEqual(span.rows, len(res))
+            self.assertIn('SCAN', span.plan)
+            self.assertEqual(trace.slow_queries, [span])
+
+            with trace.span('albums') as span:
+                chunks = list(source.iter_data(query=query, batch_size=100, span=span))
+            self.assertEqual(span.rows, 347)
+            self.assertEqual(len(chunks), 4)
+        finally:
+            source.close()
+
+    def test_builder(self):
+        rb = ReportBuilder(data_config=_chinook_conf(), trace=True)
+        rb.get_or_build_dataframe('tracks')
+        rb.get_or_build_dataframe('artists')
+        trace = rb.trace
+        self.assertEqual([s.query_id for s in trace.spans], ['tracks', 'artists'])
+        tracks = trace.spans[0]
+        self.assertEqual(tracks.rows, 3503)
+        self.assertTrue(tracks.sql.startswith('SELECT'))
+        self.assertTrue(tracks.source_key.startswith('sqlite://'))
+        self.assertIsNone(tracks.plan)
+        for stage in TRACE_STAGES:
+            self.assertGreaterEqual(tracks.timings[stage], 0)
+        self.assertGreater(tracks.timings['fetch'], 0)
+
+        data = json.loads(json.dumps(trace.to_dict()))
+        self.assertEqual(data['totals']['rows'], 3503 + 275)
+        self.assertEqual(len(data['queries']), 2)
+
+        #  результат из кэша результатов
+        rb = ReportBuilder(data_config=_chinook_conf(), trace=QueryTrace())
+        query = rb.get_query('artists')
+        rb._prepare_query(query)
+        query.execute()
+        query.execute()
+        first, second = rb.trace.spans
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        self.assertEqual(second.rows, 275)
+
+        rb = ReportBuilder(data_config=_chinook_conf(), fetch_batch_size=1000, trace=True)
+        rb.get_or_build_dataframe('tracks')
+        self.assertEqual(rb.trace.spans[0].rows, 3503)
+
+        self.assertIsNone(ReportBuilder(data_config=_chinook_conf()).trace)